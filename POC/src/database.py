@@ -0,0 +1,231 @@
+"""Capa de acceso a la base de datos SQLite `DB_WorldMarket`.
+
+Sustituye a los `to_sql(if_exists='replace')` sin índices y a las consultas
+ejecutadas dos veces (`cursor.execute` + `pd.read_sql`) de `DB_Create.ipynb`:
+
+- cada tabla se crea con un esquema tipado y con índices en sus claves de unión
+  y en `sales.SalesDate`, creados después de la carga;
+- la carga es masiva, en una única transacción y con WAL;
+- la consulta de `processed_data` empuja a SQL los filtros de fechas y de
+  categoría y puede devolver el resultado en chunks.
+"""
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_DIR = os.path.join(CURRENT_DIR, "../data/raw")
+DB_PATH = os.path.join(CURRENT_DIR, "../data/DB/DB_WorldMarket.db")
+
+# Esquemas tipados: tabla -> [(columna, tipo SQLite)] en el orden de los CSV
+SCHEMAS = {
+    "categories": [("CategoryID", "INTEGER"), ("CategoryName", "TEXT")],
+    "cities": [("CityID", "INTEGER"), ("CityName", "TEXT"), ("Zipcode", "INTEGER"), ("CountryID", "INTEGER")],
+    "countries": [("CountryID", "INTEGER"), ("CountryName", "TEXT"), ("CountryCode", "TEXT")],
+    "customers": [
+        ("CustomerID", "INTEGER"), ("FirstName", "TEXT"), ("MiddleInitial", "TEXT"), ("LastName", "TEXT"),
+        ("CityID", "INTEGER"), ("Address", "TEXT"),
+    ],
+    "employees": [
+        ("EmployeeID", "INTEGER"), ("FirstName", "TEXT"), ("MiddleInitial", "TEXT"), ("LastName", "TEXT"),
+        ("BirthDate", "TEXT"), ("Gender", "TEXT"), ("CityID", "INTEGER"), ("HireDate", "TEXT"),
+    ],
+    "products": [
+        ("ProductID", "INTEGER"), ("ProductName", "TEXT"), ("Price", "REAL"), ("CategoryID", "INTEGER"),
+        ("Class", "TEXT"), ("ModifyDate", "TEXT"), ("Resistant", "TEXT"), ("IsAllergic", "TEXT"),
+        ("VitalityDays", "REAL"),
+    ],
+    "sales": [
+        ("SalesID", "INTEGER"), ("SalesPersonID", "INTEGER"), ("CustomerID", "INTEGER"), ("ProductID", "INTEGER"),
+        ("Quantity", "INTEGER"), ("Discount", "REAL"), ("TotalPrice", "REAL"), ("SalesDate", "TEXT"),
+        ("TransactionNumber", "TEXT"),
+    ],
+}
+
+# Índices de cada tabla (claves de las uniones y filtros habituales): nombre -> columnas
+TABLE_INDEXES = {
+    "categories": {"idx_categories_id": ["CategoryID"]},
+    "cities": {"idx_cities_id": ["CityID"], "idx_cities_country": ["CountryID"]},
+    "countries": {"idx_countries_id": ["CountryID"]},
+    "customers": {"idx_customers_id": ["CustomerID"], "idx_customers_city": ["CityID"]},
+    "employees": {"idx_employees_id": ["EmployeeID"], "idx_employees_city": ["CityID"]},
+    "products": {"idx_products_id": ["ProductID"], "idx_products_category": ["CategoryID"]},
+    "sales": {
+        "idx_sales_date": ["SalesDate"],
+        "idx_sales_product": ["ProductID"],
+        "idx_sales_customer": ["CustomerID"],
+        "idx_sales_salesperson": ["SalesPersonID"],
+    },
+}
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -262144,  # 256 MB
+}
+
+# Columnas de la consulta múltiple de `processed_data`, con el alias de su tabla
+PROCESSED_COLUMNS = [
+    "ca.CategoryID", "ca.CategoryName",
+    "p.ProductName", "p.Price", "p.Class", "p.ModifyDate", "p.Resistant", "p.IsAllergic", "p.VitalityDays",
+    "s.SalesID", "s.CustomerID", "s.Quantity", "s.ProductID", "s.Discount", "s.TotalPrice", "s.SalesDate",
+    "s.TransactionNumber",
+    "cu.FirstName", "cu.MiddleInitial", "cu.LastName", "cu.CityID", "cu.Address",
+    "ci.CityName", "ci.Zipcode", "ci.CountryID",
+    "co.CountryName", "co.CountryCode",
+]
+
+PROCESSED_JOINS = """
+    FROM sales AS s
+    INNER JOIN products AS p ON p.ProductID = s.ProductID
+    INNER JOIN categories AS ca ON ca.CategoryID = p.CategoryID
+    INNER JOIN customers AS cu ON cu.CustomerID = s.CustomerID
+    INNER JOIN cities AS ci ON ci.CityID = cu.CityID
+    INNER JOIN countries AS co ON co.CountryID = ci.CountryID
+"""
+
+
+def connect(db_path=DB_PATH):
+    """Abre la base de datos con los pragmas del proyecto en modo autocommit."""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, isolation_level=None)
+    for name, value in PRAGMAS.items():
+        con.execute(f"PRAGMA {name} = {value}")
+    return con
+
+
+def _column_values(series):
+    # Pasar una columna a valores nativos de Python que sqlite3 sabe enlazar
+    return series.astype(object).where(series.notna(), None).tolist()
+
+
+def bulk_load(con, table, data, schema=None, indexes=None, batch_size=100_000):
+    """Carga `data` (un DataFrame o un iterable de DataFrames) en `table`.
+
+    La tabla se recrea con su esquema tipado, las filas se insertan en una sola
+    transacción con `executemany` y los índices se crean al final. Devuelve el
+    número de filas insertadas.
+    """
+    schema = SCHEMAS[table] if schema is None else schema
+    indexes = TABLE_INDEXES.get(table, {}) if indexes is None else indexes
+    frames = [data] if isinstance(data, pd.DataFrame) else data
+
+    columns = [col for col, _ in schema]
+    column_sql = ", ".join(f'"{col}" {sql_type}' for col, sql_type in schema)
+    insert_sql = (
+        f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})'
+    )
+
+    rows = 0
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("BEGIN")
+    try:
+        con.execute(f'DROP TABLE IF EXISTS "{table}"')
+        con.execute(f'CREATE TABLE "{table}" ({column_sql})')
+        for frame in frames:
+            for start in range(0, len(frame), batch_size):
+                part = frame.iloc[start:start + batch_size]
+                con.executemany(insert_sql, zip(*[_column_values(part[col]) for col in columns]))
+                rows += len(part)
+        for name, index_columns in indexes.items():
+            con.execute(f'CREATE INDEX "{name}" ON "{table}" ({", ".join(index_columns)})')
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.execute(f"PRAGMA synchronous = {PRAGMAS['synchronous']}")
+    con.execute(f'ANALYZE "{table}"')
+    return rows
+
+
+def load_world_market_db(raw_dir=RAW_DIR, db_path=DB_PATH, chunk_size=1_000_000):
+    """Crea `DB_WorldMarket` a partir de los CSV de `data/raw`.
+
+    `sales.csv` se lee y se inserta por chunks. Devuelve un diccionario
+    tabla -> filas cargadas.
+    """
+    loaded = {}
+    with closing(connect(db_path)) as con:
+        for table in SCHEMAS:
+            csv_path = os.path.join(raw_dir, f"{table}.csv")
+            if not os.path.exists(csv_path):
+                raise FileNotFoundError(f"No se encontró el archivo {table}.csv en: {raw_dir}")
+            data = pd.read_csv(csv_path, chunksize=chunk_size) if table == "sales" else pd.read_csv(csv_path)
+            loaded[table] = bulk_load(con, table, data)
+    return loaded
+
+
+def list_tables(db_path=DB_PATH):
+    """Nombres de las tablas de la base de datos."""
+    with closing(connect(db_path)) as con:
+        rows = con.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+        return [row[0] for row in rows]
+
+
+def _read(sql, params, chunksize, db_path):
+    # Una sola ejecución de la consulta; con chunksize se devuelve un generador
+    if chunksize is None:
+        with closing(connect(db_path)) as con:
+            return pd.read_sql(sql, con, params=params)
+    return _read_chunks(sql, params, chunksize, db_path)
+
+
+def _read_chunks(sql, params, chunksize, db_path):
+    with closing(connect(db_path)) as con:
+        yield from pd.read_sql(sql, con, params=params, chunksize=chunksize)
+
+
+def read_table(table, columns=None, chunksize=None, db_path=DB_PATH, limit=None):
+    """Lee una tabla completa (o solo algunas columnas), opcionalmente en chunks.
+
+    Con `limit` solo se leen las primeras `limit` filas (`LIMIT` en SQL), para
+    echar un vistazo a una tabla sin cargarla entera.
+    """
+    column_sql = "*" if columns is None else ", ".join(f'"{col}"' for col in columns)
+    sql = f'SELECT {column_sql} FROM "{table}"'
+    if limit is not None:
+        return _read(f"{sql} LIMIT ?", [int(limit)], chunksize, db_path)
+    return _read(sql, [], chunksize, db_path)
+
+
+def query_processed_data(start=None, end=None, categories=None, columns=None, chunksize=None, db_path=DB_PATH):
+    """Consulta múltiple de ventas con producto, categoría, cliente, ciudad y país.
+
+    `start` y `end` filtran `SalesDate` (ambos incluidos, el día de `end`
+    completo) usando el índice de fechas y `categories` es una lista de
+    `CategoryName`. `columns` permite pedir solo algunas columnas de
+    `PROCESSED_COLUMNS` (por su nombre sin alias).
+    """
+    selected = PROCESSED_COLUMNS
+    if columns is not None:
+        by_name = {col.split(".", 1)[1]: col for col in PROCESSED_COLUMNS}
+        selected = [by_name[col] for col in columns]
+
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("s.SalesDate >= ?")
+        params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end is not None:
+        conditions.append("s.SalesDate < ?")
+        params.append((pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+    if categories is not None:
+        categories = list(categories)
+        conditions.append(f"ca.CategoryName IN ({', '.join('?' * len(categories))})")
+        params.extend(categories)
+
+    sql = f"SELECT {', '.join(selected)}{PROCESSED_JOINS}"
+    if conditions:
+        sql += "WHERE " + " AND ".join(conditions)
+    return _read(sql, params, chunksize, db_path)
+
+
+def explain(sql, params=(), db_path=DB_PATH):
+    """Plan de ejecución de SQLite, útil para comprobar que una consulta usa un índice."""
+    with closing(connect(db_path)) as con:
+        return [row[-1] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}", list(params))]
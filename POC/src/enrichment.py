@@ -0,0 +1,259 @@
+"""Enriquecimiento de las ventas con los macrodatos por estado de `data/raw/macrodata`.
+
+Sustituye a las búsquedas fila a fila de `data.ipynb`:
+
+- `sales.apply(obtener_pib, axis=1)` y `sales.apply(obtener_rpc, axis=1)`,
+  que para cada venta filtraban la tabla completa por estado y buscaban la
+  columna del nombre del mes;
+- la conversión de los meses del desempleo con
+  `td["Month"].apply(lambda x: list(calendar.month_name).index(x))`;
+- los `merge` sucesivos con desempleo, densidad, renta personal y crecimiento.
+
+Las tablas estado x mes (PIB y riqueza per cápita) se pasan a formato largo una
+sola vez y todas las fuentes se indexan por un código entero de estado (el FIPS
+de la columna `cp` del PIB) y, si dependen del tiempo, por el mes. Las ventas
+calculan su código de estado y su mes una vez y cada columna se obtiene con un
+acceso indexado sobre un array denso, sin `apply` ni `merge`. El resultado es
+el mismo que el del notebook (`timing_comparison` lo comprueba y mide ambos).
+
+Uso desde la línea de comandos:
+
+    python enrichment.py --sales ../data/raw/processed_data.csv --sample 20000
+"""
+import argparse
+import calendar
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+MACRO_DIR = os.path.join(CURRENT_DIR, "../data/raw/macrodata")
+
+# Columnas que se añaden a las ventas, en el orden del notebook
+ENRICHMENT_COLUMNS = ["pib", "rpc", "Unemployment Rate", "Population_2018", "personal_income", "Crecimiento (%)"]
+
+MONTH_NUMBERS = {name: number for number, name in enumerate(calendar.month_name) if name}
+
+US_STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California", "CO": "Colorado",
+    "CT": "Connecticut", "DE": "Delaware", "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho",
+    "IL": "Illinois", "IN": "Indiana", "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana",
+    "ME": "Maine", "MD": "Maryland", "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota",
+    "MS": "Mississippi", "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York", "NC": "North Carolina",
+    "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma", "OR": "Oregon", "PA": "Pennsylvania",
+    "RI": "Rhode Island", "SC": "South Carolina", "SD": "South Dakota", "TN": "Tennessee", "TX": "Texas",
+    "UT": "Utah", "VT": "Vermont", "VA": "Virginia", "WA": "Washington", "WV": "West Virginia",
+    "WI": "Wisconsin", "WY": "Wyoming", "DC": "District of Columbia",
+}
+
+
+def _read(macro_dir, name, **kwargs):
+    return pd.read_csv(os.path.join(macro_dir, f"{name}.csv"), **kwargs)
+
+
+def _monthly_long(wide, codes, value_name):
+    # Tabla estado x mes (columnas `january`...) -> (state_code, month, valor)
+    month_columns = [col for col in wide.columns if col.capitalize() in MONTH_NUMBERS]
+    long = wide[month_columns].set_axis(codes, axis=0).stack().rename(value_name).reset_index()
+    long.columns = ["state_code", "month", value_name]
+    long["month"] = long["month"].str.capitalize().map(MONTH_NUMBERS).astype(int)
+    return long
+
+
+def load_sources(macro_dir=MACRO_DIR):
+    """Lee y normaliza las seis fuentes una sola vez.
+
+    Devuelve `(state_codes, sources)`: `state_codes` es una Serie nombre de
+    estado -> código entero y `sources` un diccionario columna -> DataFrame en
+    formato largo con `state_code`, opcionalmente `year` / `month`, y el valor.
+    Cada fuente conserva la limpieza de nombres del notebook (por ejemplo, el
+    PIB se busca por el nombre tal cual y la densidad sin los puntos).
+    """
+    pib = _read(macro_dir, "pib_por_estados", dtype={"cp": str})
+    rpc = _read(macro_dir, "riqueza_per_capita", dtype={"cp": str})
+    td = _read(macro_dir, "tasa_desempleo_por_estados")
+    density = _read(macro_dir, "population_density")
+    income = _read(macro_dir, "personal_income")
+    growth = _read(macro_dir, "population_growth")
+
+    # Códigos: el FIPS de `cp` para los nombres del PIB y códigos nuevos para el resto
+    fips = pd.Series(pib["cp"].astype(int).to_numpy() // 1000, index=pib["estado"].to_numpy())
+    fips = fips[~fips.index.duplicated()]
+    td_states = td["Place"]
+    density_states = density["State"].str.replace(".", "", regex=False)
+    growth_states = growth["Estado"].str.replace(".", "", regex=False)
+    income_states = income["Estado"].str.split(",").str[1].str.strip().map(US_STATE_NAMES)
+    others = pd.Index(pd.concat([td_states, density_states, growth_states, income_states]).dropna().unique())
+    others = others.difference(fips.index)
+    state_codes = pd.concat([fips, pd.Series(fips.max() + 1 + np.arange(len(others)), index=others)])
+
+    def code(names):
+        return state_codes.reindex(names.to_numpy()).fillna(-1).astype(int).to_numpy()
+
+    # PIB y riqueza por estado y mes (sin año); la riqueza se busca en la fila del PIB del mismo estado
+    pib_codes = code(pib["estado"])
+    sources = {
+        "pib": _monthly_long(pib, pib_codes, "pib"),
+        "rpc": _monthly_long(rpc, pib_codes, "rpc"),
+    }
+
+    # Desempleo por estado, año y mes
+    sources["Unemployment Rate"] = pd.DataFrame({
+        "state_code": code(td_states),
+        "year": td["Year"].to_numpy(),
+        "month": td["Month"].map(MONTH_NUMBERS).to_numpy(),
+        "Unemployment Rate": td["Unemployment Rate"].to_numpy(),
+    })
+
+    # Densidad, renta personal (media de los condados de cada estado) y crecimiento por estado
+    sources["Population_2018"] = pd.DataFrame(
+        {"state_code": code(density_states), "Population_2018": density["Population_2018"].to_numpy()}
+    )
+    income_values = pd.to_numeric(income["Ingresos_personales_2018"], errors="coerce")
+    income_mean = income_values.groupby(income_states.to_numpy()).mean()
+    sources["personal_income"] = pd.DataFrame(
+        {"state_code": code(income_mean.index.to_series()), "personal_income": income_mean.to_numpy()}
+    )
+    sources["Crecimiento (%)"] = pd.DataFrame(
+        {"state_code": code(growth_states), "Crecimiento (%)": growth["Crecimiento (%)"].to_numpy()}
+    )
+    return state_codes, sources
+
+
+def _dense(source, column, n_states, periods=None):
+    # Array (estado[, periodo]) con el valor de cada clave; la primera aparición gana, como en el notebook
+    source = source[source["state_code"] >= 0]
+    values = np.full((n_states, 1 if periods is None else len(periods)), np.nan)
+    rows = source["state_code"].to_numpy()
+    cols = 0 if periods is None else periods.get_indexer(source["period"])
+    first = ~pd.DataFrame({"row": rows, "col": cols}).duplicated().to_numpy()
+    values[rows[first], np.broadcast_to(cols, rows.shape)[first]] = source[column].to_numpy(dtype=np.float64)[first]
+    return values
+
+
+def enrich_sales(sales, sources=None, date_col="Date", state_col="State", macro_dir=MACRO_DIR):
+    """Añade a `sales` las columnas de `ENRICHMENT_COLUMNS` en una sola pasada.
+
+    Las claves de las ventas (código de estado, mes y año) se calculan una vez;
+    cada columna es un acceso indexado sobre el array denso de su fuente. Las
+    ventas sin estado conocido o sin dato para su periodo quedan a NaN.
+    `sources` permite reutilizar el resultado de `load_sources`. Devuelve un
+    DataFrame nuevo con las mismas filas y en el mismo orden que `sales`.
+    """
+    state_codes, sources = sources or load_sources(macro_dir)
+    n_states = int(state_codes.max()) + 1
+    dates = pd.to_datetime(sales[date_col])
+    codes = state_codes.reindex(sales[state_col].to_numpy()).fillna(-1).astype(int).to_numpy()
+    month = dates.dt.month.fillna(0).astype(int).to_numpy()
+    period = (dates.dt.year.fillna(0).astype(int) * 12 + month).to_numpy()
+    known = codes >= 0
+    safe_codes = np.where(known, codes, 0)
+
+    def gather(values, index):
+        found = known & (index >= 0)
+        return np.where(found, values[safe_codes, np.where(found, index, 0)], np.nan)
+
+    columns = {}
+    months = pd.Index(np.arange(1, 13))
+    for name in ("pib", "rpc"):
+        source = sources[name].assign(period=sources[name]["month"])
+        columns[name] = gather(_dense(source, name, n_states, months), months.get_indexer(month))
+
+    unemployment = sources["Unemployment Rate"]
+    unemployment = unemployment.assign(period=unemployment["year"] * 12 + unemployment["month"])
+    periods = pd.Index(np.sort(unemployment["period"].unique()))
+    columns["Unemployment Rate"] = gather(
+        _dense(unemployment, "Unemployment Rate", n_states, periods), periods.get_indexer(period)
+    )
+
+    for name in ("Population_2018", "personal_income", "Crecimiento (%)"):
+        columns[name] = gather(_dense(sources[name], name, n_states), np.zeros(len(sales), dtype=int))
+    return sales.assign(**columns)
+
+
+def _rowwise_reference(sales, macro_dir=MACRO_DIR):
+    # Proceso original de data.ipynb (apply fila a fila + merges), para comparar resultado y tiempo
+    sales = sales.copy()
+    pib = _read(macro_dir, "pib_por_estados").rename(columns={"estado": "State"})
+    rpc = _read(macro_dir, "riqueza_per_capita").rename(columns={"estado": "State"})
+    sales["Date"] = pd.to_datetime(sales["Date"])
+    sales["mes_nombre"] = sales["Date"].dt.month_name().str.lower()
+
+    def obtener_pib(row):
+        fila_pib = pib[pib["State"] == row["State"]]
+        if not fila_pib.empty and row["mes_nombre"] in fila_pib.columns:
+            return fila_pib.iloc[0][row["mes_nombre"]]
+        return None
+
+    def obtener_rpc(row):
+        fila_rpc = rpc[pib["State"] == row["State"]]
+        if not fila_rpc.empty and row["mes_nombre"] in fila_rpc.columns:
+            return fila_rpc.iloc[0][row["mes_nombre"]]
+        return None
+
+    sales["pib"] = sales.apply(obtener_pib, axis=1)
+    sales["rpc"] = sales.apply(obtener_rpc, axis=1)
+    sales = sales.drop(columns="mes_nombre")
+
+    td = _read(macro_dir, "tasa_desempleo_por_estados").rename(columns={"Place": "State"})
+    td["Month"] = td["Month"].apply(lambda x: list(calendar.month_name).index(x))
+    td["Date"] = pd.to_datetime(td[["Year", "Month"]].assign(Day=1)).dt.to_period("M")
+    sales["Month"] = sales["Date"].dt.to_period("M")
+    sales = sales.merge(td[["State", "Date", "Unemployment Rate"]], left_on=["State", "Month"],
+                        right_on=["State", "Date"], how="left")
+    sales = sales.drop(columns=["Date_y", "Month"]).rename(columns={"Date_x": "Date"})
+
+    density = _read(macro_dir, "population_density")
+    density["State"] = density["State"].str.replace(".", "", regex=False)
+    sales = sales.merge(density, on="State", how="left")
+
+    pincome = _read(macro_dir, "personal_income")
+    pincome["State"] = pincome["Estado"].str.split(",").str[1].str.strip().map(US_STATE_NAMES)
+    pincome["personal_income"] = pd.to_numeric(pincome["Ingresos_personales_2018"], errors="coerce")
+    pincome_media_estados = pincome.dropna(subset=["personal_income"]).groupby("State")["personal_income"].mean()
+    sales = sales.merge(pincome_media_estados.reset_index(), on="State", how="left")
+
+    growth = _read(macro_dir, "population_growth")
+    growth["State"] = growth["Estado"].str.replace(".", "", regex=False)
+    return sales.merge(growth[["State", "Crecimiento (%)"]], on="State", how="left")
+
+
+def timing_comparison(sales, macro_dir=MACRO_DIR, sample=None, random_state=42):
+    """Tiempo del proceso fila a fila frente a `enrich_sales` y comprobación de que coinciden.
+
+    Con `sample` se usa una muestra de ese tamaño (el `apply` sobre todas las
+    ventas tarda mucho). Devuelve un DataFrame con los segundos de cada
+    método y la aceleración; lanza AssertionError si las columnas difieren.
+    """
+    if sample is not None and sample < len(sales):
+        sales = sales.sample(n=sample, random_state=random_state)
+    sales = sales.reset_index(drop=True).assign(Date=pd.to_datetime(sales["Date"].to_numpy()))
+
+    start = time.perf_counter()
+    reference = _rowwise_reference(sales, macro_dir)
+    rowwise_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    enriched = enrich_sales(sales, macro_dir=macro_dir)
+    vectorized_seconds = time.perf_counter() - start
+
+    for column in ENRICHMENT_COLUMNS:
+        pd.testing.assert_series_equal(enriched[column], reference[column].astype(np.float64), check_names=False)
+    return pd.DataFrame({
+        "method": ["apply + merge", "enrich_sales"],
+        "rows": len(sales),
+        "seconds": [rowwise_seconds, vectorized_seconds],
+        "speedup": [1.0, rowwise_seconds / vectorized_seconds],
+    })
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compara el enriquecimiento fila a fila con el vectorizado.")
+    parser.add_argument("--sales", required=True, help="CSV de ventas con las columnas Date y State")
+    parser.add_argument("--macro-dir", default=MACRO_DIR)
+    parser.add_argument("--sample", type=int, default=20_000, help="Filas de la muestra (0 para todas)")
+    args = parser.parse_args()
+
+    print(timing_comparison(pd.read_csv(args.sales), args.macro_dir, args.sample or None).to_string(index=False))
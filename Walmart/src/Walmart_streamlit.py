@@ -1,18 +1,19 @@
 import streamlit as st
+import atexit
 import os
 from datetime import datetime
 import pandas as pd
-import joblib
-import re
 import plotly.graph_objects as go
 import plotly.express as px
-import numpy as np
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-import io
-import matplotlib.pyplot as plt
+
+from pipeline.forecast import load_history
+from pipeline.forecast_store import read_forecasts, refresh_forecasts
+from pipeline.horizon import MAX_HORIZON, recursive_forecast
+from pipeline.model_cache import ModelCache, registry_footprint
+from pipeline.paths import MODEL_USAGE_PATH
+from pipeline.registry import open_registry
+from pipeline.report import build_report_pdf
+from pipeline.series_index import SeriesIndex
 
 ##############################
 # Paso 0: Configuración inicial
@@ -21,59 +22,99 @@ import matplotlib.pyplot as plt
 # Determinar el directorio base de manera robusta
 current_dir = os.path.abspath(os.path.dirname(__file__))
 
-# Función para cargar datos con caché
-@st.cache_data
-def load_data():
-    csv_path = os.path.join(current_dir, "..", "data", "raw", "Final_XGBoost_data_processed.csv")
+# Mes que se predice y se compara con la demanda real (Mayo 2016)
+FORECAST_MONTH = "2016-05"
+
+# Memoria máxima para los modelos cargados (MB) y política de desalojo ('lru' o 'lfu')
+MODEL_CACHE_MB = float(os.environ.get("WALMART_MODEL_CACHE_MB", 256))
+MODEL_CACHE_POLICY = os.environ.get("WALMART_MODEL_CACHE_POLICY", "lru")
+
+# Registro de modelos: manifiesto en memoria y modelos empaquetados (ver pipeline.registry)
+@st.cache_resource
+def get_registry():
     try:
-        data = pd.read_csv(csv_path)
-        # Convertir la columna 'month' de timestamp a número de mes
-        if 'month' in data.columns:
-            data['month'] = pd.to_datetime(data['month']).dt.month
-        return data
-    except FileNotFoundError:
-        st.error("No se encontró el archivo CSV. Asegúrate de que esté en la ruta correcta.")
+        return open_registry()
+    except Exception as e:
+        st.error(f"Error al abrir el registro de modelos: {str(e)}")
         return None
 
-# Función para cargar modelo con caché
+# Caché de modelos con presupuesto de memoria (ver pipeline.model_cache): se comparte entre
+# sesiones, al arrancar precarga los modelos más consultados y al parar el servidor guarda los
+# accesos pendientes (solo se escriben cada USAGE_SAVE_EVERY accesos)
 @st.cache_resource
+def get_model_cache():
+    registry = get_registry()
+    if registry is None:
+        return None
+    cache = ModelCache(registry.load_predictor, int(MODEL_CACHE_MB * 2**20), MODEL_CACHE_POLICY,
+                       sizeof=registry_footprint(registry), usage_path=MODEL_USAGE_PATH)
+    cache.warm()
+    atexit.register(cache.save_usage)
+    return cache
+
+# Función para cargar modelo a través de la caché
 def load_model(product_id, store_id):
-    model_path = os.path.join(current_dir, "..", "models", f"Final_model_XGBOOST_{product_id}_{store_id}.sav")
-    if not os.path.exists(model_path):
-        st.error(f"No se encontró el modelo en: {model_path}")
+    registry = get_registry()
+    cache = get_model_cache()
+    if registry is None or cache is None:
+        return None
+    if (product_id, store_id) not in registry:
+        st.error(f"No hay modelo en el registro para el producto {product_id} en la tienda {store_id}")
         return None
     try:
-        model = joblib.load(model_path)
-        return model
+        return cache.get(product_id, store_id)
     except Exception as e:
         st.error(f"Error al cargar el modelo: {str(e)}")
         return None
 
-# Función para obtener productos y sus tiendas asociadas desde los nombres de los modelos
+# Predicciones materializadas en SQLite (ver pipeline.forecast_store): se recalculan por lotes
+# solo si cambian los datos o algún modelo y se leen con una consulta indexada
+def get_forecasts(pairs=None):
+    registry = get_registry()
+    if registry is None:
+        return None
+    try:
+        refresh_forecasts(FORECAST_MONTH, registry=registry, load_model=load_model)
+        return read_forecasts(FORECAST_MONTH, pairs)
+    except Exception as e:
+        st.error(f"Error al obtener las predicciones: {str(e)}")
+        return None
+
+# Histórico mensual con características (Final_XGBoost_data_processed.csv), con los tipos de pipeline.schema
 @st.cache_data
-def get_available_models():
-    model_dir = os.path.join(current_dir, "..", "models")
-    product_to_stores = {}
-    products = set()
-    model_pattern = re.compile(r"Final_model_XGBOOST_(.+)_([A-Z]{2}_\d+)\.sav")
-    
+def get_history():
     try:
-        for filename in os.listdir(model_dir):
-            match = model_pattern.match(filename)
-            if match:
-                product_id = match.group(1)
-                store_id = match.group(2)
-                products.add(product_id)
-                if product_id not in product_to_stores:
-                    product_to_stores[product_id] = set()
-                product_to_stores[product_id].add(store_id)
-        return sorted(products), product_to_stores
-    except FileNotFoundError:
-        st.error(f"No se encontró la carpeta de modelos en: {model_dir}")
-        return [], {}
+        return load_history()
     except Exception as e:
-        st.error(f"Error al escanear modelos: {str(e)}")
+        st.error(f"Error al cargar el histórico: {str(e)}")
+        return None
+
+# Histórico indexado por (producto, tienda) (ver pipeline.series_index): se construye una vez y cada
+# consulta de una serie es una búsqueda en un diccionario, sin recorrer todo el histórico
+@st.cache_resource
+def get_series_index():
+    history = get_history()
+    if history is None:
+        return None
+    return SeriesIndex(history)
+
+# Predicción recursiva de los próximos meses de una serie (ver pipeline.horizon)
+@st.cache_data
+def get_forecast_path(product_id, store_id, horizon):
+    history = get_history()
+    registry = get_registry()
+    if history is None or registry is None:
+        return None
+    return recursive_forecast(history, horizon, pairs=[(product_id, store_id)], registry=registry,
+                              load_model=load_model)
+
+# Función para obtener productos y sus tiendas asociadas desde el manifiesto del registro
+@st.cache_data
+def get_available_models():
+    registry = get_registry()
+    if registry is None:
         return [], {}
+    return registry.catalog()
 
 ##################################
 # Paso 1: Autenticación con nombre
@@ -195,6 +236,22 @@ if st.session_state["username"] is not None:
         selected_month = st.sidebar.selectbox("Mes", ["Mayo"], disabled=True, key="month_select")
         selected_year = st.sidebar.selectbox("Año", [2016], disabled=True, key="year_select")
 
+        # Horizonte de la predicción recursiva (meses siguientes al último mes conocido)
+        selected_horizon = st.sidebar.slider("Horizonte (meses desde junio 2016)", 1, MAX_HORIZON, 6,
+                                             key="horizon_select")
+
+        # Métricas de la caché de modelos
+        model_cache = get_model_cache()
+        if model_cache is not None:
+            cache_stats = model_cache.stats()
+            with st.sidebar.expander("Caché de modelos"):
+                st.write(f"Modelos en memoria: {cache_stats['models']} "
+                         f"({cache_stats['bytes'] / 2**20:.1f} / {cache_stats['max_bytes'] / 2**20:.0f} MB)")
+                st.write(f"Aciertos: {cache_stats['hits']} · Fallos: {cache_stats['misses']} "
+                         f"({cache_stats['hit_rate']:.0%} de aciertos)")
+                st.write(f"Desalojos: {cache_stats['evictions']}")
+                st.write(f"Tiempo medio de carga: {cache_stats['mean_load_ms']:.1f} ms")
+
         ##################################
         # Paso 4: Mapa interactivo de EEUU
         ##################################
@@ -273,60 +330,17 @@ if st.session_state["username"] is not None:
         ##################################
 
         if selected_store:
-            # Cargar el modelo correspondiente
-            model = load_model(selected_product, selected_store)
-            if model is not None:
-                # Cargar datos del CSV
-                data = load_data()
-                if data is None:
-                    st.stop()
-
-                # Preparar datos para la predicción (Mayo de 2016)
+            # Leer la predicción materializada de Mayo 2016 para la tienda y producto seleccionados
+            forecast = get_forecasts([(selected_product, selected_store)])
+            if forecast is not None:
                 try:
-                    # Filtrar datos para la tienda y producto seleccionados
-                    filtered_data = data[(data['store_id'] == selected_store) & (data['item_id'] == selected_product)].copy()
-                    
-                    if filtered_data.empty:
-                        st.warning("No se encontraron datos para la combinación de tienda y producto seleccionada en el CSV.")
+                    if forecast.empty:
+                        st.warning("No se encontró la predicción para la combinación de tienda y producto seleccionada.")
                     else:
-                        # Definir las columnas de características esperadas por el modelo
-                        feature_columns = [
-                            'event_name_1', 'snap', 'sell_price', 'lag_1', 'lag_2', 'lag_3', 
-                            'lag_6', 'lag_12', 'rolling_mean_3', 'year', 
-                            'month_1', 'month_2', 'month_3', 'month_4', 'month_5', 'month_6', 
-                            'month_7', 'month_8', 'month_9', 'month_10', 'month_11', 'month_12'
-                        ]
-                        
-                        # Verificar que todas las columnas requeridas estén presentes
-                        missing_columns = [col for col in feature_columns if col not in filtered_data.columns]
-                        if missing_columns:
-                            st.error(f"Faltan las siguientes columnas en los datos: {missing_columns}")
-                            st.stop()
-                        
-                        # Preparar datos para la predicción de Mayo 2016
-                        last_row = filtered_data.iloc[-1]
-                        prediction_data = pd.DataFrame({
-                            'event_name_1': [last_row['event_name_1']],
-                            'snap': [last_row['snap']],
-                            'sell_price': [last_row['sell_price']],
-                            'lag_1': [last_row['sales']],
-                            'lag_2': [filtered_data['sales'].iloc[-2] if len(filtered_data) >= 2 else filtered_data['sales'].mean()],
-                            'lag_3': [filtered_data['sales'].iloc[-3] if len(filtered_data) >= 3 else filtered_data['sales'].mean()],
-                            'lag_6': [filtered_data['sales'].iloc[-6] if len(filtered_data) >= 6 else filtered_data['sales'].mean()],
-                            'lag_12': [filtered_data['sales'].iloc[-12] if len(filtered_data) >= 12 else filtered_data['sales'].mean()],
-                            'rolling_mean_3': [filtered_data['sales'].tail(3).mean()],
-                            'year': [2016],
-                            'month_1': [0], 'month_2': [0], 'month_3': [0], 'month_4': [0], 'month_5': [0],
-                            'month_6': [1], 'month_7': [0], 'month_8': [0], 'month_9': [0], 'month_10': [0],
-                            'month_11': [0], 'month_12': [0]
-                        })
-                        
-                        # Realizar la predicción para Mayo 2016
-                        predicted_log = model.predict(prediction_data[feature_columns])[0]
-                        predicted_demand = np.expm1(predicted_log)
+                        predicted_demand = forecast['predicted_sales'].iloc[0]
                         
-                        # Obtener demanda real (usamos el último mes disponible, e.g., Mayo 2016)
-                        real_demand = last_row['sales']
+                        # Obtener demanda real de Mayo 2016
+                        real_demand = forecast['real_sales'].iloc[0]
                         
                         # Crear gráfico de barras 2D con efecto pseudo-3D
                         fig = go.Figure()
@@ -454,6 +468,47 @@ if st.session_state["username"] is not None:
                         )
 
                         st.plotly_chart(fig, use_container_width=True)
+
+                        # Trayectoria de la predicción recursiva para el horizonte seleccionado
+                        forecast_path = get_forecast_path(selected_product, selected_store, selected_horizon)
+                        series_index = get_series_index()
+                        if forecast_path is not None and not forecast_path.empty and series_index is not None:
+                            series = series_index.frame(selected_product, selected_store, ['month', 'sales']).tail(24)
+                            path_fig = go.Figure()
+                            path_fig.add_trace(go.Scatter(
+                                x=series['month'],
+                                y=series['sales'],
+                                mode='lines+markers',
+                                name='Demanda real',
+                                line=dict(color='rgb(55, 83, 109)', width=3)
+                            ))
+                            path_fig.add_trace(go.Scatter(
+                                x=[series['month'].iloc[-1]] + list(forecast_path['month']),
+                                y=[series['sales'].iloc[-1]] + list(forecast_path['predicted_sales']),
+                                mode='lines+markers',
+                                name=f'Demanda predicha ({selected_horizon} meses)',
+                                line=dict(color='rgb(255, 140, 0)', width=3, dash='dash')
+                            ))
+                            path_fig.update_layout(
+                                title={
+                                    'text': f"Predicción de los próximos {selected_horizon} meses",
+                                    'y': 0.95,
+                                    'x': 0.5,
+                                    'xanchor': 'center',
+                                    'yanchor': 'top',
+                                    'font': dict(size=20, color='white', family="Arial, sans-serif")
+                                },
+                                plot_bgcolor='rgba(0,0,0,0)',
+                                paper_bgcolor='rgba(30,30,60,1)',
+                                font=dict(color='white', family="Arial, sans-serif"),
+                                xaxis=dict(title=dict(text="Mes", font=dict(size=16)), gridcolor='rgba(255,255,255,0.1)'),
+                                yaxis=dict(title=dict(text="Demanda", font=dict(size=16)), gridcolor='rgba(255,255,255,0.1)'),
+                                legend=dict(x=0.6, y=1.1, font=dict(size=12, color='white'), bgcolor='rgba(0,0,0,0)',
+                                            orientation='h'),
+                                height=500,
+                                margin=dict(l=50, r=50, t=100, b=50)
+                            )
+                            st.plotly_chart(path_fig, use_container_width=True)
                         
                 except Exception as e:
                     st.error(f"Error al realizar la predicción: {str(e)}")
@@ -538,202 +593,31 @@ if st.session_state["username"] is not None:
             if not selected_state_full or not selected_stores or not selected_products:
                 st.error("Por favor, selecciona un estado, al menos una tienda y al menos un producto.")
             else:
-                import tempfile
-                import time
-                import matplotlib.pyplot as plt
-
-                # Crear directorio temporal para imágenes
-                with tempfile.TemporaryDirectory() as tmpdirname:
-                    # Crear buffer para el PDF
-                    buffer = io.BytesIO()
-                    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
-                    story = []
-                    styles = getSampleStyleSheet()
-
-                    # Estilos personalizados
-                    title_style = ParagraphStyle(
-                        'Title',
-                        parent=styles['Title'],
-                        fontSize=16,
-                        textColor=colors.HexColor('#0071CE'),
-                        spaceAfter=20,
-                        alignment=1  # Centrado
-                    )
-                    heading_style = ParagraphStyle(
-                        'Heading2',
-                        parent=styles['Heading2'],
-                        fontSize=12,
-                        spaceAfter=10
+                # Pares válidos: el producto tiene modelo en la tienda y la tienda es del estado seleccionado
+                pairs = [
+                    (product, store)
+                    for product in selected_products
+                    for store in selected_stores
+                    if store in product_to_stores.get(product, []) and store.split('_')[0] == state_code
+                ]
+
+                # Predicciones de todos los pares en una única consulta a la tabla materializada
+                forecasts = get_forecasts(pairs)
+                if forecasts is not None:
+                    forecasts = forecasts.dropna(subset=['predicted_sales', 'real_sales'])
+
+                if forecasts is not None and not forecasts.empty:
+                    # PDF en memoria con los gráficos dibujados en paralelo (ver pipeline.report)
+                    with st.spinner("Generando informe..."):
+                        pdf_bytes = build_report_pdf(forecasts, selected_state_full, st.session_state['username'])
+
+                    # Descargar PDF directamente
+                    st.download_button(
+                        label="Descargar informe",
+                        data=pdf_bytes,
+                        file_name=f"Informe_predicciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                        mime="application/pdf",
+                        key="download_pdf"
                     )
-                    normal_style = styles['Normal']
-
-                    # Título del informe
-                    story.append(Paragraph(f"Informe de predicciones - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", title_style))
-                    story.append(Paragraph(f"Usuario: {st.session_state['username']}", normal_style))
-                    story.append(Spacer(1, 12))
-
-                    # Tabla de predicciones
-                    table_data = [['Producto', 'Estado', 'Tienda', 'Demanda real (mayo 2016)', 'Demanda predicha (Mayo 2016)', '% Error']]
-                    image_paths = []
-
-                    for product in selected_products:
-                        for store in selected_stores:
-                            # Verificar si el producto se vende en la tienda
-                            if store not in product_to_stores.get(product, []):
-                                continue  # Ignorar combinación inválida
-
-                            # Verificar que la tienda pertenece al estado seleccionado
-                            store_state_code = store.split('_')[0]
-                            if store_state_code != state_code:
-                                continue  # Ignorar si la tienda no coincide con el estado
-
-                            # Cargar modelo
-                            model = load_model(product, store)
-                            if model is None:
-                                continue
-
-                            # Cargar datos
-                            data = load_data()
-                            if data is None:
-                                continue
-
-                            # Preparar datos para la predicción
-                            filtered_data = data[(data['store_id'] == store) & (data['item_id'] == product)].copy()
-                            if filtered_data.empty:
-                                continue
-
-                            # Definir columnas de características
-                            feature_columns = [
-                                'event_name_1', 'snap', 'sell_price', 'lag_1', 'lag_2', 'lag_3',
-                                'lag_6', 'lag_12', 'rolling_mean_3', 'year',
-                                'month_1', 'month_2', 'month_3', 'month_4', 'month_5', 'month_6',
-                                'month_7', 'month_8', 'month_9', 'month_10', 'month_11', 'month_12'
-                            ]
-                            missing_columns = [col for col in feature_columns if col not in filtered_data.columns]
-                            if missing_columns:
-                                continue
-
-                            # Preparar datos para predicción
-                            last_row = filtered_data.iloc[-1]
-                            prediction_data = pd.DataFrame({
-                                'event_name_1': [last_row['event_name_1']],
-                                'snap': [last_row['snap']],
-                                'sell_price': [last_row['sell_price']],
-                                'lag_1': [last_row['sales']],
-                                'lag_2': [filtered_data['sales'].iloc[-2] if len(filtered_data) >= 2 else filtered_data['sales'].mean()],
-                                'lag_3': [filtered_data['sales'].iloc[-3] if len(filtered_data) >= 3 else filtered_data['sales'].mean()],
-                                'lag_6': [filtered_data['sales'].iloc[-6] if len(filtered_data) >= 6 else filtered_data['sales'].mean()],
-                                'lag_12': [filtered_data['sales'].iloc[-12] if len(filtered_data) >= 12 else filtered_data['sales'].mean()],
-                                'rolling_mean_3': [filtered_data['sales'].tail(3).mean()],
-                                'year': [2016],
-                                'month_1': [0], 'month_2': [0], 'month_3': [0], 'month_4': [0], 'month_5': [0],
-                                'month_6': [1], 'month_7': [0], 'month_8': [0], 'month_9': [0], 'month_10': [0],
-                                'month_11': [0], 'month_12': [0]
-                            })
-
-                            # Realizar predicción
-                            try:
-                                predicted_log = model.predict(prediction_data[feature_columns])[0]
-                                predicted_demand = np.expm1(predicted_log)
-                                real_demand = last_row['sales']
-                            except Exception:
-                                continue
-
-                            # Calcular % de error
-                            error_percent = abs(real_demand - predicted_demand) / real_demand * 100 if real_demand != 0 else 0
-
-                            # Añadir a la tabla
-                            table_data.append([
-                                product,
-                                selected_state_full,
-                                f"Tienda {store.split('_')[1]}",
-                                f"{real_demand:.2f}",
-                                f"{predicted_demand:.2f}",
-                                f"{error_percent:.2f}%"
-                            ])
-
-                            # Generar gráfico con matplotlib
-                            fig, ax = plt.subplots(figsize=(8, 6), facecolor='#1E1E3C')
-                            ax.set_facecolor('#1E1E3C')
-                            bar_width = 0.35
-                            x = [0, 1]
-                            bars = ax.bar([i - bar_width/2 for i in x], [real_demand, predicted_demand], 
-                                         bar_width, color=['#37536D', '#FF8C00'], edgecolor='#08306B')
-                            
-                            # Añadir texto encima de las barras
-                            for bar in bars:
-                                height = bar.get_height()
-                                ax.text(bar.get_x() + bar.get_width()/2., height,
-                                       f'{height:.2f}', ha='center', va='bottom', color='white')
-
-                            # Configurar ejes
-                            ax.set_xticks(x)
-                            ax.set_xticklabels(['Demanda real', 'Demanda predicha'], color='white')
-                            ax.set_ylabel('Demanda', color='white')
-                            ax.set_title(f'Demanda Real vs. Predicha - {product}, {selected_state_full}, Tienda {store.split("_")[1]}', 
-                                        color='white', pad=20)
-                            ax.tick_params(axis='y', colors='white')
-                            ax.spines['bottom'].set_color('white')
-                            ax.spines['left'].set_color('white')
-                            ax.spines['top'].set_visible(False)
-                            ax.spines['right'].set_visible(False)
-
-                            # Guardar gráfico como imagen
-                            img_path = os.path.join(tmpdirname, f"plot_{product}_{store}_{len(image_paths)}.png")
-                            try:
-                                plt.savefig(img_path, format='png', bbox_inches='tight', facecolor='#1E1E3C', edgecolor='none')
-                                time.sleep(1)
-                                if os.path.exists(img_path):
-                                    image_paths.append(img_path)
-                                else:
-                                    st.warning(f"No se generó la imagen para {product}, {selected_state_full}, Tienda {store.split('_')[1]}")
-                            except Exception as e:
-                                st.warning(f"Error al generar imagen para {product}, {selected_state_full}, Tienda {store.split('_')[1]}: {str(e)}")
-                            finally:
-                                plt.close(fig)
-
-                    # Crear tabla en PDF
-                    if len(table_data) > 1:  # Si hay datos
-                        table = Table(table_data)
-                        table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#0071CE')),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('FONTSIZE', (0, 0), (-1, 0), 10),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                            ('FONTSIZE', (0, 1), (-1, -1), 8),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE')
-                        ]))
-                        story.append(Paragraph("Resumen de predicciones", heading_style))
-                        story.append(table)
-                        story.append(Spacer(1, 12))
-
-                        # Añadir gráficos
-                        if image_paths:
-                            story.append(Paragraph("Gráficos de Demanda", heading_style))
-                            for img_path in image_paths:
-                                if os.path.exists(img_path):
-                                    img = Image(img_path, width=450, height=300)
-                                    img.hAlign = 'CENTER'
-                                    story.append(img)
-                                    story.append(Spacer(1, 12))
-
-                        # Generar PDF
-                        doc.build(story)
-                        buffer.seek(0)
-
-                        # Descargar PDF directamente
-                        st.download_button(
-                            label="Descargar informe",
-                            data=buffer,
-                            file_name=f"Informe_predicciones_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                            mime="application/pdf",
-                            key="download_pdf"
-                        )
-                    else:
-                        st.warning("No se encontraron datos válidos para las combinaciones seleccionadas.")
\ No newline at end of file
+                else:
+                    st.warning("No se encontraron datos válidos para las combinaciones seleccionadas.")
\ No newline at end of file
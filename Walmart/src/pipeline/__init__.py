@@ -0,0 +1,6 @@
+"""Módulos reutilizables del pipeline de predicción de demanda de Walmart.
+
+Los notebooks de `Walmart/src` y la app de Streamlit importan desde aquí
+(`from pipeline.store import read_sales`) en lugar de repetir en cada celda
+la lectura y el procesamiento de `total_data.csv`.
+"""
@@ -0,0 +1,409 @@
+"""Agregación de `total_data` por producto y tienda a varias granularidades.
+
+Sustituye a los bucles `iter_sales(...)` + `groupby(...).agg(...)` por chunk +
+segundo `groupby` global repetidos en `models_data_monthly.ipynb` y a la
+preparación trimestral/diaria de los notebooks de LSTM. Con una sola lectura
+del almacén columnar (cada partición de tienda se lee una vez) se obtienen los
+agregados diarios, semanales, mensuales y trimestrales:
+
+- los trimestres se calculan a partir de los agregados parciales mensuales
+  (sumas y recuentos), de modo que la media de `sell_price` es la media real de
+  los días del periodo y no una media de medias por chunk;
+- `first` toma el primer valor no nulo por fecha dentro de cada periodo.
+
+Los resultados se guardan en Parquet bajo `AGGREGATES_CACHE_DIR`, en una
+carpeta cuyo nombre es la huella del almacén de origen y de la especificación
+de agregación; si ninguna de las dos cambia, las siguientes ejecuciones solo
+leen la caché (con filtros de tienda y producto).
+
+`append_aggregates` añade un mes nuevo sin recalcular el histórico: escribe
+sus filas diarias en el almacén, enlaza los ficheros ya agregados en la
+carpeta de la nueva huella y agrega solo el mes nuevo en ficheros adicionales
+(`monthly-<fecha>.parquet`), que `load_aggregates` lee junto al principal.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from pipeline.paths import AGGREGATES_CACHE_DIR, SALES_STORE_DIR
+from pipeline.store import SALES_SCHEMA, _chunk_to_table, _to_pandas, append_sales, list_stores, read_sales
+
+# Misma especificación que usaban los notebooks mensuales y trimestrales
+AGG_SPEC = {
+    "sales": "sum",
+    "event_name_1": "first",
+    "snap_CA": "first",
+    "snap_TX": "first",
+    "snap_WI": "first",
+    "sell_price": "mean",
+}
+
+# Granularidad -> (columna de periodo, frecuencia de pandas). Las semanas son
+# las de Walmart (`wm_yr_wk`), de sábado a viernes.
+GRANULARITIES = {
+    "daily": ("date", None),
+    "weekly": ("week", "W-FRI"),
+    "monthly": ("month", "M"),
+    "quarterly": ("quarter", "Q"),
+}
+
+# Granularidades que un mes nuevo amplía sin tocar periodos ya agregados (una
+# semana o un trimestre pueden quedar a caballo entre lo antiguo y lo nuevo)
+APPENDABLE_GRANULARITIES = ("daily", "monthly")
+
+KEY_COLUMNS = ["item_id", "store_id"]
+SUPPORTED_FUNCTIONS = ("sum", "mean", "first", "min", "max")
+
+# Se incrementa cuando cambia el formato de la caché para invalidar las anteriores
+CACHE_VERSION = 1
+
+
+def _validate_spec(spec):
+    for col, func in spec.items():
+        if col not in SALES_SCHEMA.names or col in KEY_COLUMNS or col == "date":
+            raise ValueError(f"Columna no válida en la especificación de agregación: {col}")
+        if func not in SUPPORTED_FUNCTIONS:
+            raise ValueError(f"Función de agregación no soportada para {col}: {func}")
+
+
+def source_fingerprint(store_dir=SALES_STORE_DIR):
+    """Huella del almacén columnar a partir de la ruta, tamaño y fecha de modificación de cada fichero."""
+    if not os.path.isdir(store_dir):
+        raise FileNotFoundError(f"No se encontró el almacén columnar en: {store_dir}")
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(store_dir):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            digest.update(f"{os.path.relpath(path, store_dir)}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def cache_key(spec=AGG_SPEC, store_dir=SALES_STORE_DIR):
+    """Clave de la caché: huella del origen + especificación de agregación."""
+    payload = json.dumps(
+        {"source": source_fingerprint(store_dir), "spec": spec, "version": CACHE_VERSION}, sort_keys=True
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _partial_aggregations(spec):
+    # Agregaciones parciales (combinables entre periodos): nombre -> (columna, función)
+    partial = {"n_days": ("date", "size")}
+    for col, func in spec.items():
+        if func == "mean":
+            partial[f"{col}__sum"] = (col, "sum")
+            partial[f"{col}__count"] = (col, "count")
+        else:
+            partial[col] = (col, func)
+    return partial
+
+
+def _combine_aggregations(partial):
+    # Cómo se combinan los parciales de periodos pequeños en uno mayor
+    combine = {}
+    for name, (_, func) in partial.items():
+        combine[name] = (name, "sum" if func in ("size", "count") else func)
+    return combine
+
+
+def _finalize(df, spec):
+    # Pasar de parciales a la especificación final (media = suma / recuento)
+    for col, func in spec.items():
+        if func == "mean":
+            total, count = df.pop(f"{col}__sum"), df.pop(f"{col}__count")
+            df[col] = total / count.where(count > 0)
+    return df
+
+
+def _group(df, period_col, aggregations):
+    return df.groupby(KEY_COLUMNS + [period_col], observed=True, sort=True).agg(**aggregations).reset_index()
+
+
+def _aggregate_store(df, spec, granularities):
+    # Todos los agregados de una tienda a partir de sus filas diarias
+    if isinstance(df["item_id"].dtype, pd.CategoricalDtype):
+        df["item_id"] = df["item_id"].cat.reorder_categories(sorted(df["item_id"].cat.categories))
+    df = df.sort_values(["item_id", "date"], kind="stable").reset_index(drop=True)
+    partial = _partial_aggregations(spec)
+    result = {}
+
+    if "daily" in granularities:
+        daily = df[KEY_COLUMNS + ["date"] + list(spec)].copy()
+        daily["n_days"] = np.int32(1)
+        for col, func in spec.items():
+            if func == "mean":
+                daily[col] = daily[col].astype("float64")
+        result["daily"] = daily
+
+    if "weekly" in granularities:
+        df["week"] = df["date"].dt.to_period("W-FRI").dt.start_time
+        result["weekly"] = _finalize(_group(df, "week", partial), spec)
+
+    if "monthly" in granularities or "quarterly" in granularities:
+        df["month"] = df["date"].dt.to_period("M").dt.to_timestamp()
+        monthly = _group(df, "month", partial)
+        if "quarterly" in granularities:
+            monthly["quarter"] = monthly["month"].dt.to_period("Q").dt.to_timestamp()
+            quarterly = _group(monthly, "quarter", _combine_aggregations(partial))
+            result["quarterly"] = _finalize(quarterly, spec)
+        if "monthly" in granularities:
+            result["monthly"] = _finalize(monthly.drop(columns="quarter", errors="ignore"), spec)
+
+    return result
+
+
+def _output_schema(granularity, spec):
+    period_col = GRANULARITIES[granularity][0]
+    fields = [pa.field(col, pa.string()) for col in KEY_COLUMNS] + [pa.field(period_col, pa.timestamp("ns"))]
+    for col, func in spec.items():
+        source_type = SALES_SCHEMA.field(col).type
+        if func == "mean" or (func == "sum" and pa.types.is_floating(source_type)):
+            fields.append(pa.field(col, pa.float64()))
+        elif func == "sum":
+            fields.append(pa.field(col, pa.int64()))
+        else:
+            fields.append(pa.field(col, source_type))
+    fields.append(pa.field("n_days", pa.int32()))
+    return pa.schema(fields)
+
+
+def _to_table(df, schema):
+    df = df[schema.names].copy()
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+    return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def build_aggregates(spec=AGG_SPEC, granularities=tuple(GRANULARITIES), store_dir=SALES_STORE_DIR,
+                     cache_dir=AGGREGATES_CACHE_DIR, overwrite=False):
+    """Calcula y guarda en caché los agregados de todas las granularidades pedidas.
+
+    Cada tienda se lee una sola vez (solo las columnas de la especificación) y
+    se agrega a todas las granularidades antes de pasar a la siguiente, así que
+    la memoria queda acotada por el tamaño de una tienda. Devuelve la carpeta
+    de la caché; si ya existe y `overwrite` es False no se recalcula nada.
+    """
+    _validate_spec(spec)
+    unknown = set(granularities) - set(GRANULARITIES)
+    if unknown:
+        raise ValueError(f"Granularidades no soportadas: {sorted(unknown)}")
+
+    target_dir = os.path.join(cache_dir, cache_key(spec, store_dir))
+    if os.path.isdir(target_dir) and not overwrite:
+        missing = [g for g in granularities if not os.path.exists(os.path.join(target_dir, f"{g}.parquet"))]
+        if not missing:
+            return target_dir
+        granularities = tuple(dict.fromkeys(list(granularities) + _cached_granularities(target_dir)))
+
+    tmp_dir = f"{target_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    columns = KEY_COLUMNS + ["date"] + list(spec)
+    schemas = {g: _output_schema(g, spec) for g in granularities}
+    writers = {
+        g: pq.ParquetWriter(os.path.join(tmp_dir, f"{g}.parquet"), schemas[g], compression="zstd")
+        for g in granularities
+    }
+    rows = {g: 0 for g in granularities}
+    dates = set()
+    try:
+        for store_id in list_stores(store_dir):
+            store_data = read_sales(columns=columns, stores=[store_id], store_dir=store_dir)
+            dates.update(store_data["date"].unique())
+            for granularity, frame in _aggregate_store(store_data, spec, granularities).items():
+                writers[granularity].write_table(_to_table(frame, schemas[granularity]))
+                rows[granularity] += len(frame)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    meta = {
+        "spec": spec,
+        "source": os.path.abspath(store_dir),
+        "source_fingerprint": source_fingerprint(store_dir),
+        "version": CACHE_VERSION,
+        "n_dates": len(dates),
+        "last_date": str(pd.Timestamp(max(dates)).date()) if dates else None,
+        "rows": rows,
+        "created": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    # Sustitución atómica: nunca queda una caché a medio escribir con la clave final
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(tmp_dir, target_dir)
+    return target_dir
+
+
+def _cached_granularities(target_dir):
+    return [g for g in GRANULARITIES if os.path.exists(os.path.join(target_dir, f"{g}.parquet"))]
+
+
+def _granularity_files(target_dir, granularity):
+    # Fichero principal de la granularidad y, detrás, los de los meses añadidos con `append_aggregates`
+    parts = sorted(name for name in os.listdir(target_dir) if name.startswith(f"{granularity}-"))
+    return [os.path.join(target_dir, name) for name in [f"{granularity}.parquet"] + parts]
+
+
+def _read_meta(target_dir):
+    with open(os.path.join(target_dir, "meta.json")) as f:
+        return json.load(f)
+
+
+def _link_or_copy(source, target):
+    # Los ficheros ya agregados no cambian: basta un enlace duro (o una copia si no se puede enlazar)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)
+
+
+def append_aggregates(new_sales, spec=AGG_SPEC, store_dir=SALES_STORE_DIR, cache_dir=AGGREGATES_CACHE_DIR):
+    """Añade un mes nuevo de filas diarias al almacén y a la caché de agregados.
+
+    `new_sales` tiene las columnas de total_data y empieza el día 1 de un mes
+    posterior al último del almacén. Las filas se escriben con `append_sales`;
+    la caché de la nueva huella reutiliza (enlaza) los ficheros de la anterior
+    y solo se agrega el mes nuevo, para las granularidades de
+    `APPENDABLE_GRANULARITIES` ya calculadas. Las semanales y trimestrales no
+    se copian y se recalculan completas la próxima vez que se pidan. Si el
+    proceso se interrumpe tras escribir en el almacén, la huella ya no
+    coincide y `build_aggregates` recalcula la caché desde cero.
+
+    Devuelve `(carpeta de la caché, agregados mensuales del mes nuevo)`.
+    """
+    _validate_spec(spec)
+    first = pd.to_datetime(new_sales["date"]).min()
+    old_dir = build_aggregates(spec, ("monthly",), store_dir, cache_dir)
+    meta = _read_meta(old_dir)
+    if meta.get("last_date"):
+        last_date = pd.Timestamp(meta["last_date"])
+    else:
+        last_date = read_sales(columns=["date"], store_dir=store_dir)["date"].max()
+    if first <= last_date or first.day != 1:
+        raise ValueError(
+            f"El periodo nuevo debe empezar el día 1 de un mes posterior a {last_date.date()} (empieza {first.date()}). "
+            "Para corregir datos ya cargados, vuelve a crear el almacén y usa build_aggregates(overwrite=True)."
+        )
+    granularities = [g for g in APPENDABLE_GRANULARITIES if g in _cached_granularities(old_dir)]
+
+    append_sales(new_sales, store_dir)
+    target_dir = os.path.join(cache_dir, cache_key(spec, store_dir))
+    tmp_dir = f"{target_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    for granularity in granularities:
+        for path in _granularity_files(old_dir, granularity):
+            _link_or_copy(path, os.path.join(tmp_dir, os.path.basename(path)))
+
+    typed = _to_pandas(_chunk_to_table(new_sales, SALES_SCHEMA))[KEY_COLUMNS + ["date"] + list(spec)]
+    schemas = {g: _output_schema(g, spec) for g in granularities}
+    suffix = f"{first:%Y%m%d}"
+    writers = {
+        g: pq.ParquetWriter(os.path.join(tmp_dir, f"{g}-{suffix}.parquet"), schemas[g], compression="zstd")
+        for g in granularities
+    }
+    rows = {g: 0 for g in granularities}
+    monthly = []
+    try:
+        for _, store_data in typed.groupby("store_id", observed=True, sort=True):
+            for granularity, frame in _aggregate_store(store_data.reset_index(drop=True), spec, granularities).items():
+                table = _to_table(frame, schemas[granularity])
+                writers[granularity].write_table(table)
+                rows[granularity] += len(frame)
+                if granularity == "monthly":
+                    monthly.append(table)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    meta.update(
+        source_fingerprint=source_fingerprint(store_dir),
+        n_dates=meta["n_dates"] + typed["date"].nunique(),
+        last_date=str(pd.to_datetime(new_sales["date"]).max().date()),
+        rows={g: meta["rows"][g] + rows[g] for g in granularities},
+        appended=meta.get("appended", []) + [suffix],
+        updated=datetime.now().isoformat(timespec="seconds"),
+    )
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.replace(tmp_dir, target_dir)
+
+    new_monthly = pa.concat_tables(monthly).to_pandas()
+    new_monthly["month"] = new_monthly["month"].astype("datetime64[ns]")
+    return target_dir, new_monthly
+
+
+def load_aggregates(granularity, columns=None, stores=None, items=None, spec=AGG_SPEC,
+                    store_dir=SALES_STORE_DIR, cache_dir=AGGREGATES_CACHE_DIR):
+    """Devuelve los agregados de `granularity` ('daily', 'weekly', 'monthly' o 'quarterly').
+
+    Si la granularidad no está en la caché se construyen todas las
+    granularidades en una sola pasada, así que pedir después otra no vuelve a
+    recorrer el almacén. `stores` e `items` se aplican como filtros al leer el
+    Parquet. La columna de periodo (`date`, `week`, `month` o `quarter`) es la
+    fecha de inicio del periodo y las filas salen ordenadas por tienda, producto
+    y periodo.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidad no soportada: {granularity}")
+    target_dir = os.path.join(cache_dir, cache_key(spec, store_dir))
+    if not os.path.exists(os.path.join(target_dir, f"{granularity}.parquet")):
+        # Una sola pasada por el almacén para todas las granularidades: las siguientes lecturas ya no lo recorren
+        target_dir = build_aggregates(spec, tuple(GRANULARITIES), store_dir, cache_dir)
+
+    filters = []
+    if stores is not None:
+        filters.append(("store_id", "in", list(stores)))
+    if items is not None:
+        filters.append(("item_id", "in", list(items)))
+    files = _granularity_files(target_dir, granularity)
+    table = pq.ParquetDataset(files, filters=filters or None).read(columns=columns)
+    df = table.to_pandas()
+    period_col = GRANULARITIES[granularity][0]
+    if period_col in df.columns:
+        df[period_col] = df[period_col].astype("datetime64[ns]")
+    order = [col for col in ["store_id", "item_id", period_col] if col in df.columns]
+    if len(files) > 1 and order:
+        # Los meses añadidos van en ficheros aparte: se recupera el orden por tienda, producto y periodo
+        df = df.sort_values(order, kind="stable").reset_index(drop=True)
+    return df
+
+
+def aggregates_info(spec=AGG_SPEC, store_dir=SALES_STORE_DIR, cache_dir=AGGREGATES_CACHE_DIR):
+    """Metadatos de la caché para la especificación dada (número de fechas, filas por granularidad...)."""
+    target_dir = build_aggregates(spec, tuple(GRANULARITIES), store_dir, cache_dir)
+    with open(os.path.join(target_dir, "meta.json")) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcula y guarda en caché los agregados de total_data.")
+    parser.add_argument("--store-dir", default=SALES_STORE_DIR)
+    parser.add_argument("--cache-dir", default=AGGREGATES_CACHE_DIR)
+    parser.add_argument("--granularity", action="append", choices=list(GRANULARITIES),
+                        help="Granularidad a calcular (se puede repetir; por defecto todas)")
+    parser.add_argument("--overwrite", action="store_true", help="Recalcular aunque exista la caché")
+    args = parser.parse_args()
+
+    path = build_aggregates(
+        granularities=tuple(args.granularity or GRANULARITIES), store_dir=args.store_dir,
+        cache_dir=args.cache_dir, overwrite=args.overwrite,
+    )
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    print(f"Agregados en {path}: " + ", ".join(f"{g}={n:,}" for g, n in meta["rows"].items()))
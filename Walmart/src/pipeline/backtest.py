@@ -0,0 +1,325 @@
+"""Backtest en paralelo de modelos estadísticos (SARIMAX y Prophet) con caché de ajustes.
+
+Los notebooks trimestrales (`models_10p_10s_cuartiles.ipynb`,
+`models_20p_10s_cuartiles.ipynb`) y el mensual (`models_data_monthly.ipynb`)
+recorren `df.groupby(['item_id', 'store_id'])` y ajustan un SARIMAX o un Prophet
+por serie, uno detrás de otro y con los avisos silenciados. `run_backtest`:
+
+- reparte las series entre procesos (`ProcessPoolExecutor`);
+- guarda los parámetros ajustados de cada serie en una caché por modelo y
+  configuración (`data/cache/backtest`), con la huella de los datos de
+  entrenamiento: si los datos no cambian, no se vuelve a ajustar;
+- si la serie solo tiene periodos nuevos al final (el prefijo coincide con lo
+  ajustado), parte de los parámetros anteriores (`start_params` en SARIMAX,
+  `init` en Prophet) en lugar de optimizar desde cero;
+- registra por serie el tiempo, si convergió y los errores, en lugar de
+  silenciarlos.
+
+Devuelve la misma tabla de comparación (`item_store`, periodo, `real_sales`,
+`predicted_sales`) y las mismas métricas que construían los notebooks.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+import warnings
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from pipeline.paths import DATA_DIR
+from pipeline.training import _limit_threads
+
+BACKTEST_CACHE_DIR = os.path.join(DATA_DIR, "cache", "backtest")
+RUN_COLUMNS = ["item_id", "store_id", "status", "converged", "warnings", "seconds", "error"]
+
+
+def _hash_values(*arrays):
+    digest = hashlib.sha256()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+class StatsModel(ABC):
+    """Interfaz común de los modelos del backtest.
+
+    `fit(ds, y, exog, init)` ajusta una serie (partiendo de `init` si no es
+    None) y devuelve `(estado, converged, n_warnings)`, donde `estado` es
+    serializable en JSON; `forecast(ds, y, exog, estado, future_ds,
+    future_exog)` predice los periodos de `future_ds` a partir de ese estado
+    sin volver a ajustar; `warm_start(estado)` extrae del estado los valores
+    iniciales para un nuevo ajuste.
+    """
+
+    name = "model"
+
+    def config(self):
+        return {}
+
+    def fingerprint(self):
+        payload = json.dumps({"model": self.name, **self.config()}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+    @abstractmethod
+    def fit(self, ds, y, exog=None, init=None):
+        ...
+
+    @abstractmethod
+    def forecast(self, ds, y, exog, state, future_ds, future_exog=None):
+        ...
+
+    def warm_start(self, state):
+        return state
+
+
+class SarimaxModel(StatsModel):
+    """SARIMAX de statsmodels; el estado son los parámetros estimados."""
+
+    name = "sarimax"
+
+    def __init__(self, order=(1, 1, 1), seasonal_order=(1, 1, 1, 4), log=False):
+        self.order = tuple(order)
+        self.seasonal_order = tuple(seasonal_order)
+        self.log = log
+
+    def config(self):
+        return {"order": self.order, "seasonal_order": self.seasonal_order, "log": self.log}
+
+    def _model(self, y, exog):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        target = np.log1p(y) if self.log else y
+        return SARIMAX(target, exog=exog, order=self.order, seasonal_order=self.seasonal_order)
+
+    def fit(self, ds, y, exog=None, init=None):
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            result = self._model(y, exog).fit(start_params=None if init is None else np.asarray(init), disp=False)
+        converged = bool(result.mle_retvals.get("converged", True)) if result.mle_retvals else True
+        return {"params": result.params.tolist()}, converged, len(caught)
+
+    def forecast(self, ds, y, exog, state, future_ds, future_exog=None):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            result = self._model(y, exog).smooth(np.asarray(state["params"]))
+            predicted = np.asarray(result.forecast(steps=len(future_ds), exog=future_exog))
+        return np.expm1(predicted) if self.log else predicted
+
+    def warm_start(self, state):
+        return state["params"]
+
+
+class ProphetModel(StatsModel):
+    """Prophet; el estado es el modelo serializado (`model_to_json`) y sus parámetros de Stan."""
+
+    name = "prophet"
+
+    def __init__(self, seasonality_mode="additive", regressors=(), log=False, yearly_seasonality=True):
+        self.seasonality_mode = seasonality_mode
+        self.regressors = tuple(regressors)
+        self.log = log
+        self.yearly_seasonality = yearly_seasonality
+
+    def config(self):
+        return {"seasonality_mode": self.seasonality_mode, "regressors": self.regressors, "log": self.log,
+                "yearly_seasonality": self.yearly_seasonality}
+
+    def _frame(self, ds, y=None, exog=None):
+        frame = pd.DataFrame({"ds": pd.to_datetime(ds)})
+        if y is not None:
+            frame["y"] = np.log1p(y) if self.log else y
+        for i, name in enumerate(self.regressors):
+            frame[name] = exog[:, i]
+        return frame
+
+    def fit(self, ds, y, exog=None, init=None):
+        from prophet import Prophet
+        from prophet.serialize import model_to_json
+
+        model = Prophet(yearly_seasonality=self.yearly_seasonality, weekly_seasonality=False,
+                        daily_seasonality=False, seasonality_mode=self.seasonality_mode)
+        for name in self.regressors:
+            model.add_regressor(name)
+        frame = self._frame(ds, y, exog)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            try:
+                model.fit(frame, init=init) if init is not None else model.fit(frame)
+            except (RuntimeError, ValueError):
+                if init is None:
+                    raise
+                # Los valores iniciales no encajan (p. ej. cambia el número de changepoints): ajuste desde cero
+                return self.fit(ds, y, exog)
+        # Valores iniciales para un ajuste posterior (el `init` de Stan que acepta `Prophet.fit`)
+        init_params = {name: float(np.asarray(model.params[name]).ravel()[0]) for name in ("k", "m", "sigma_obs")}
+        init_params.update({name: np.asarray(model.params[name])[0].tolist() for name in ("delta", "beta")})
+        return {"model": model_to_json(model), "init": init_params}, True, len(caught)
+
+    def forecast(self, ds, y, exog, state, future_ds, future_exog=None):
+        from prophet.serialize import model_from_json
+
+        model = model_from_json(state["model"])
+        predicted = model.predict(self._frame(future_ds, exog=future_exog))["yhat"].to_numpy()
+        return np.expm1(predicted) if self.log else predicted
+
+    def warm_start(self, state):
+        return state["init"]
+
+
+def _cache_path(model, cache_dir):
+    return os.path.join(cache_dir, f"{model.name}-{model.fingerprint()}.json")
+
+
+def load_fit_cache(model, cache_dir=BACKTEST_CACHE_DIR):
+    """Caché de ajustes del modelo y configuración: 'item|store' -> entrada (vacía si no existe)."""
+    path = _cache_path(model, cache_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_fit_cache(model, cache, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(model, cache_dir)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(cache, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def _backtest_series(model, item_id, store_id, ds, y, exog, holdout, cached):
+    # Ajuste (o reutilización) y predicción de los últimos `holdout` periodos de una serie
+    start = time.perf_counter()
+    n_train = len(y) - holdout
+    train_ds, train_y = ds[:n_train], y[:n_train]
+    train_exog = None if exog is None else exog[:n_train]
+    future_exog = None if exog is None else exog[n_train:]
+    data_hash = _hash_values(train_ds.astype("datetime64[ns]").astype(np.int64), train_y,
+                             *([] if exog is None else [train_exog]))
+
+    run = {"item_id": item_id, "store_id": store_id, "converged": True, "warnings": 0, "error": None}
+    entry = None
+    try:
+        if cached is not None and cached["data_hash"] == data_hash:
+            state, run["status"], run["converged"] = cached["state"], "cached", cached["converged"]
+            entry = cached
+        else:
+            init = None
+            if cached is not None and cached["n_obs"] < n_train:
+                prefix = _hash_values(train_ds[:cached["n_obs"]].astype("datetime64[ns]").astype(np.int64),
+                                      train_y[:cached["n_obs"]],
+                                      *([] if exog is None else [train_exog[:cached["n_obs"]]]))
+                if prefix == cached["data_hash"]:
+                    init = model.warm_start(cached["state"])
+            state, run["converged"], run["warnings"] = model.fit(train_ds, train_y, train_exog, init)
+            run["status"] = "fitted" if init is None else "warm_start"
+            entry = {"data_hash": data_hash, "n_obs": n_train, "state": state, "converged": run["converged"]}
+        predicted = model.forecast(train_ds, train_y, train_exog, state, ds[n_train:], future_exog)
+    except Exception as e:
+        run.update(status="failed", converged=False, error=f"{type(e).__name__}: {e}")
+        predicted = None
+    run["seconds"] = time.perf_counter() - start
+    return run, entry, predicted
+
+
+def _metrics(real, predicted):
+    mse = mean_squared_error(real, predicted)
+    return {"MSE": mse, "RMSE": float(np.sqrt(mse)), "MAE": mean_absolute_error(real, predicted),
+            "R2": r2_score(real, predicted)}
+
+
+def run_backtest(df, model, period_col, value_col="sales", regressors=(), holdout=1, min_length=5, workers=None,
+                 cache_dir=BACKTEST_CACHE_DIR, use_cache=True, verbose=True):
+    """Ajusta `model` a cada serie de `df` sin sus últimos `holdout` periodos y los predice.
+
+    `regressors` son columnas de `df` que se pasan como exógenas (sus valores
+    en los periodos de prueba se usan para predecir, como en los notebooks).
+    Las series con menos de `min_length` periodos se omiten.
+
+    Devuelve `(comparison_df, metrics, runs)`: la tabla de los notebooks
+    (`item_store`, `period_col`, `real_sales`, `predicted_sales`), un
+    diccionario con MSE, RMSE, MAE y R² y una fila por serie con su estado
+    ('fitted', 'warm_start', 'cached' o 'failed'), si convergió, los avisos,
+    el tiempo y el error.
+    """
+    regressors = list(regressors)
+    df = df.sort_values(["item_id", "store_id", period_col], kind="stable")
+    cache = load_fit_cache(model, cache_dir) if use_cache else {}
+
+    tasks, holdout_rows = [], {}
+    for (item_id, store_id), group in df.groupby(["item_id", "store_id"], sort=True, observed=True):
+        if len(group) < max(min_length, holdout + 1):
+            continue
+        ds = pd.to_datetime(group[period_col].astype(str)).to_numpy()
+        y = group[value_col].to_numpy(dtype=np.float64)
+        exog = group[regressors].to_numpy(dtype=np.float64) if regressors else None
+        tasks.append((item_id, store_id, ds, y, exog, cache.get(f"{item_id}|{store_id}")))
+        holdout_rows[(item_id, store_id)] = (group[period_col].to_numpy()[-holdout:], y[-holdout:])
+
+    workers = workers or os.cpu_count() or 1
+    results = []
+    if workers == 1:
+        for item_id, store_id, ds, y, exog, cached in tasks:
+            results.append(_backtest_series(model, item_id, store_id, ds, y, exog, holdout, cached))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads, initargs=(1,)) as pool:
+            futures = [
+                pool.submit(_backtest_series, model, item_id, store_id, ds, y, exog, holdout, cached)
+                for item_id, store_id, ds, y, exog, cached in tasks
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+
+    rows, runs = [], []
+    for run, entry, predicted in results:
+        runs.append(run)
+        key = f"{run['item_id']}|{run['store_id']}"
+        if entry is not None:
+            cache[key] = entry
+        if predicted is None:
+            if verbose:
+                print(f"No se pudo ajustar el modelo para {run['item_id']}_{run['store_id']}: {run['error']}")
+            continue
+        periods, real_values = holdout_rows[(run["item_id"], run["store_id"])]
+        for period, real, pred in zip(periods, real_values, predicted):
+            rows.append({"item_store": f"{run['item_id']}_{run['store_id']}", period_col: period,
+                         "real_sales": real, "predicted_sales": pred})
+    if use_cache:
+        _save_fit_cache(model, cache, cache_dir)
+
+    comparison_df = pd.DataFrame(rows, columns=["item_store", period_col, "real_sales", "predicted_sales"])
+    comparison_df = comparison_df.sort_values("item_store", kind="stable").reset_index(drop=True)
+    runs = pd.DataFrame(runs, columns=RUN_COLUMNS).sort_values(["item_id", "store_id"]).reset_index(drop=True)
+    metrics = _metrics(comparison_df["real_sales"], comparison_df["predicted_sales"]) if len(comparison_df) else {}
+    if verbose:
+        counts = runs["status"].value_counts().to_dict()
+        print(f"{len(runs)} series en {runs['seconds'].sum():.1f} s de ajuste: {counts}; "
+              f"sin converger: {int((~runs['converged']).sum())}")
+    return comparison_df, metrics, runs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest en paralelo de SARIMAX o Prophet por serie.")
+    parser.add_argument("data", help="CSV con item_id, store_id, el periodo y las ventas")
+    parser.add_argument("--model", choices=["sarimax", "prophet"], default="sarimax")
+    parser.add_argument("--period-col", default="quarter")
+    parser.add_argument("--season", type=int, default=4, help="Periodo estacional de SARIMAX")
+    parser.add_argument("--log", action="store_true", help="Ajustar sobre log1p(ventas)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-cache", action="store_true")
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.data)
+    if args.model == "sarimax":
+        stats_model = SarimaxModel(seasonal_order=(1, 1, 1, args.season), log=args.log)
+    else:
+        stats_model = ProphetModel(log=args.log)
+    comparison, scores, series_runs = run_backtest(data, stats_model, args.period_col, workers=args.workers,
+                                                   use_cache=not args.no_cache)
+    print({name: round(value, 4) for name, value in scores.items()})
+    print(series_runs.sort_values("seconds", ascending=False).head(10).to_string(index=False))
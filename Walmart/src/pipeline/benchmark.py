@@ -0,0 +1,417 @@
+"""Benchmark unificado de precisión y coste para XGBoost, LSTM, SARIMAX y Prophet.
+
+Cada notebook comparaba modelos con su propio corte de datos y su propio
+split, e imprimía `mean_squared_error` / `mean_absolute_error` / `r2_score` a
+mano, sin medir cuánto cuesta cada modelo. `run_benchmark`:
+
+- usa las mismas series (`select_series`) y los mismos orígenes (backtest con
+  origen móvil: para cada uno de los últimos `n_origins` meses se entrena con
+  los meses anteriores y se predice ese mes) para todas las familias;
+- ejecuta cada familia en un proceso nuevo y mide el tiempo de entrenamiento,
+  la latencia de predicción, el pico de memoria del proceso (`peak_rss_mb`) y el
+  tamaño del modelo serializado, además de MAE, RMSE y R²;
+- guarda los resultados en JSON (`write_results`), con el entorno y una huella
+  de las series y los orígenes.
+
+`check_regressions` compara unos resultados con una línea base y marca las
+métricas que empeoran más de lo permitido (`DEFAULT_THRESHOLDS`); desde la
+línea de comandos, `--baseline` hace que el proceso termine con código 1 si
+hay regresiones:
+
+    python -m pipeline.benchmark --series 20 --origins 3 --baseline ../benchmarks/baseline.json
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+from pipeline.features import FEATURE_COLUMNS
+from pipeline.paths import BENCHMARK_BASELINE_PATH, BENCHMARKS_DIR, PROCESSED_DATA_PATH
+from pipeline.schema import read_processed
+
+try:
+    import resource
+except ImportError:  # Windows no tiene `resource`
+    resource = None
+
+DEFAULT_MODELS = ("xgboost", "global_xgboost", "sarimax", "prophet", "lstm")
+DEFAULT_SERIES = 20
+DEFAULT_ORIGINS = 3
+
+# Cambio máximo permitido frente a la línea base: relativo para las métricas en las que
+# más es peor y absoluto (caída) para R²
+DEFAULT_THRESHOLDS = {
+    "MAE": 0.05,
+    "RMSE": 0.05,
+    "R2": 0.02,
+    "train_seconds": 0.5,
+    "predict_ms_per_series": 0.5,
+    "peak_rss_mb": 0.2,
+    "model_bytes": 0.2,
+}
+# Margen absoluto mínimo de las métricas de coste: en ejecuciones cortas el ruido del reloj supera el relativo
+MIN_DELTAS = {"train_seconds": 1.0, "predict_ms_per_series": 0.5, "peak_rss_mb": 32.0}
+HIGHER_IS_BETTER = {"R2"}
+
+
+class Candidate(ABC):
+    """Interfaz de una familia de modelos en el benchmark.
+
+    `fit(train)` entrena con las filas de entrenamiento (todas las series);
+    `predict(test)` devuelve las ventas predichas de las filas de `test`
+    (una por serie, en su orden) y `size_bytes()` el tamaño del modelo
+    serializado.
+    """
+
+    name = "candidate"
+
+    @abstractmethod
+    def fit(self, train):
+        ...
+
+    @abstractmethod
+    def predict(self, test):
+        ...
+
+    @abstractmethod
+    def size_bytes(self):
+        ...
+
+
+class XGBoostCandidate(Candidate):
+    """Un `XGBRegressor` por serie sobre `log1p(sales)` (como `models_data_monthly.ipynb`) con parámetros fijos."""
+
+    name = "xgboost"
+    params = {"n_estimators": 200, "max_depth": 5, "learning_rate": 0.1, "subsample": 0.8,
+              "colsample_bytree": 0.8, "random_state": 42, "n_jobs": 1}
+
+    def fit(self, train):
+        from xgboost import XGBRegressor
+
+        self.models = {}
+        for key, group in train.groupby(["item_id", "store_id"], sort=False, observed=True):
+            model = XGBRegressor(**self.params)
+            model.fit(group[FEATURE_COLUMNS].to_numpy(dtype=np.float32), np.log1p(group["sales"].to_numpy()))
+            self.models[key] = model
+
+    def predict(self, test):
+        X = test[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+        keys = zip(test["item_id"], test["store_id"])
+        return np.array([np.expm1(self.models[key].predict(X[i:i + 1])[0]) for i, key in enumerate(keys)])
+
+    def size_bytes(self):
+        return sum(len(model.get_booster().save_raw("ubj")) for model in self.models.values())
+
+
+class GlobalXGBoostCandidate(Candidate):
+    """`pipeline.global_model.GlobalXGBModel`: un modelo para todas las series."""
+
+    name = "global_xgboost"
+
+    def fit(self, train):
+        from pipeline.global_model import GlobalXGBModel
+
+        self.model = GlobalXGBModel(n_jobs=1).fit(train)
+
+    def predict(self, test):
+        return self.model.predict(test)
+
+    def size_bytes(self):
+        return len(self.model.model.get_booster().save_raw("ubj"))
+
+
+class _HistoryCandidate(Candidate):
+    # Modelos que solo usan la historia de ventas de cada serie (interfaz de pipeline.backtest)
+    model = None
+
+    def fit(self, train):
+        self.states = {}
+        for key, group in train.groupby(["item_id", "store_id"], sort=False, observed=True):
+            ds = group["month"].to_numpy()
+            y = group["sales"].to_numpy(dtype=np.float64)
+            state, _, _ = self.model.fit(ds, y)
+            self.states[key] = (ds, y, state)
+
+    def predict(self, test):
+        predicted = []
+        for key, month in zip(zip(test["item_id"], test["store_id"]), test["month"]):
+            ds, y, state = self.states[key]
+            predicted.append(self.model.forecast(ds, y, None, state, np.array([month]))[0])
+        return np.array(predicted)
+
+    def size_bytes(self):
+        return len(json.dumps([state for _, _, state in self.states.values()]).encode())
+
+
+class SarimaxCandidate(_HistoryCandidate):
+    """SARIMAX(1,1,1)(1,1,1,12) por serie (`pipeline.backtest.SarimaxModel`)."""
+
+    name = "sarimax"
+
+    def __init__(self):
+        from pipeline.backtest import SarimaxModel
+
+        self.model = SarimaxModel(order=(1, 1, 1), seasonal_order=(1, 1, 1, 12))
+
+
+class ProphetCandidate(_HistoryCandidate):
+    """Prophet por serie sobre `log1p(sales)` con estacionalidad multiplicativa (`pipeline.backtest.ProphetModel`)."""
+
+    name = "prophet"
+
+    def __init__(self):
+        import prophet  # noqa: F401  (falla aquí si no está instalado)
+        from pipeline.backtest import ProphetModel
+
+        self.model = ProphetModel(seasonality_mode="multiplicative", log=True)
+
+
+class LSTMCandidate(Candidate):
+    """LSTM multiserie de `pipeline.lstm` con ventanas de 12 meses y horizonte de 1."""
+
+    name = "lstm"
+    config = {"window": 12, "horizon": 1, "val_days": 6, "epochs": 200, "patience": 10, "batch_size": 64}
+
+    def __init__(self):
+        import tensorflow  # noqa: F401  (falla aquí si no está instalado)
+
+    def fit(self, train):
+        from pipeline.lstm import train_lstm
+
+        self.model, self.panel, _ = train_lstm(train, self.config, verbose=0, period_col="month")
+
+    def predict(self, test):
+        from pipeline.lstm import forecast_lstm
+
+        forecast = forecast_lstm(self.model, self.panel, window=self.config["window"])
+        forecast = forecast.drop_duplicates(["item_id", "store_id"]).set_index(["item_id", "store_id"])
+        return forecast.loc[list(zip(test["item_id"], test["store_id"])), "predicted_sales"].to_numpy()
+
+    def size_bytes(self):
+        return int(self.model.count_params()) * 4
+
+
+CANDIDATES = {
+    candidate.name: candidate
+    for candidate in (XGBoostCandidate, GlobalXGBoostCandidate, SarimaxCandidate, ProphetCandidate, LSTMCandidate)
+}
+
+
+def select_series(history, n_series=DEFAULT_SERIES):
+    """Las `n_series` primeras series (orden de `item_id`, `store_id`) con historia completa."""
+    lengths = history.groupby(["item_id", "store_id"], observed=True).size()
+    complete = lengths[lengths == lengths.max()].sort_index()
+    return list(complete.index[:n_series])
+
+
+def rolling_origins(history, n_origins=DEFAULT_ORIGINS):
+    """Los últimos `n_origins` meses del histórico (cada uno es un origen del backtest)."""
+    months = np.sort(pd.to_datetime(history["month"]).unique())
+    return list(pd.to_datetime(months[-n_origins:]))
+
+
+def benchmark_fingerprint(pairs, origins, data_path):
+    """Huella de las series, los orígenes y los datos: solo son comparables resultados con la misma huella."""
+    from pipeline.forecast_store import file_fingerprint
+
+    payload = json.dumps({
+        "pairs": [list(pair) for pair in pairs],
+        "origins": [origin.strftime("%Y-%m") for origin in origins],
+        "data": file_fingerprint(data_path),
+    })
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _metrics(real, predicted):
+    return {
+        "MAE": float(mean_absolute_error(real, predicted)),
+        "RMSE": float(np.sqrt(mean_squared_error(real, predicted))),
+        "R2": float(r2_score(real, predicted)),
+    }
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB (`ru_maxrss`); None si la plataforma no lo expone."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux da ru_maxrss en KiB y macOS en bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_candidate(name, history, origins):
+    # Se ejecuta en un proceso nuevo: el pico de memoria (ru_maxrss) es solo de esta familia
+    try:
+        candidate = CANDIDATES[name]()
+    except ImportError as e:
+        return {"status": "unavailable", "error": str(e)}
+
+    real, predicted, per_origin = [], [], []
+    train_seconds = predict_seconds = 0.0
+    n_predicted = 0
+    try:
+        for origin in origins:
+            train = history[history["month"] < origin]
+            test = history[history["month"] == origin].reset_index(drop=True)
+            start = time.perf_counter()
+            candidate.fit(train)
+            train_seconds += time.perf_counter() - start
+            start = time.perf_counter()
+            values = np.asarray(candidate.predict(test), dtype=np.float64)
+            predict_seconds += time.perf_counter() - start
+            n_predicted += len(test)
+            real.append(test["sales"].to_numpy(dtype=np.float64))
+            predicted.append(values)
+            per_origin.append({"origin": origin.strftime("%Y-%m"), **_metrics(real[-1], values)})
+        size = candidate.size_bytes()
+    except Exception as e:
+        return {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+
+    return {
+        "status": "ok",
+        **_metrics(np.concatenate(real), np.concatenate(predicted)),
+        "train_seconds": train_seconds,
+        "predict_seconds": predict_seconds,
+        "predict_ms_per_series": predict_seconds / n_predicted * 1000,
+        "peak_rss_mb": peak_rss_mb(),
+        "model_bytes": int(size),
+        "per_origin": per_origin,
+    }
+
+
+def _environment():
+    versions = {}
+    for module in ("numpy", "pandas", "sklearn", "xgboost", "statsmodels", "prophet", "tensorflow"):
+        if module in sys.modules or module in ("numpy", "pandas", "sklearn"):
+            versions[module] = getattr(sys.modules.get(module) or __import__(module), "__version__", None)
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(), **versions}
+
+
+def run_benchmark(models=DEFAULT_MODELS, n_series=DEFAULT_SERIES, n_origins=DEFAULT_ORIGINS,
+                  data_path=PROCESSED_DATA_PATH, verbose=True):
+    """Backtest con origen móvil de cada familia de `models` sobre las mismas series y orígenes.
+
+    Devuelve el diccionario de resultados (ver `write_results`). Las familias
+    cuyas dependencias no están instaladas quedan con `status='unavailable'`.
+    """
+    history = read_processed(data_path)
+    pairs = select_series(history, n_series)
+    history = history[pd.MultiIndex.from_frame(history[["item_id", "store_id"]]).isin(pairs)]
+    history = history.sort_values(["item_id", "store_id", "month"]).reset_index(drop=True)
+    origins = rolling_origins(history, n_origins)
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for name in models:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            results[name] = pool.submit(_run_candidate, name, history, origins).result()
+        if verbose:
+            row = results[name]
+            if row["status"] == "ok":
+                memory = "-" if row["peak_rss_mb"] is None else f"{row['peak_rss_mb']:.0f}"
+                print(f"{name:>15}: MAE {row['MAE']:.2f} R2 {row['R2']:.3f} | entrenamiento {row['train_seconds']:.2f} s"
+                      f" | predicción {row['predict_ms_per_series']:.3f} ms/serie | {memory} MB"
+                      f" | modelo {row['model_bytes'] / 1024:.0f} KB")
+            else:
+                print(f"{name:>15}: {row['status']} ({row['error']})")
+
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "environment": _environment(),
+        "config": {
+            "data": os.path.basename(data_path),
+            "series": len(pairs),
+            "origins": [origin.strftime("%Y-%m") for origin in origins],
+            "fingerprint": benchmark_fingerprint(pairs, origins, data_path),
+        },
+        "models": results,
+    }
+
+
+def write_results(results, path=None):
+    """Guarda los resultados en JSON (por defecto `benchmarks/results-<fecha>.json`) de forma atómica."""
+    if path is None:
+        path = os.path.join(BENCHMARKS_DIR, f"results-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(results, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def check_regressions(results, baseline, thresholds=None):
+    """Compara `results` con `baseline` por familia y métrica.
+
+    Devuelve un DataFrame con `model`, `metric`, `baseline`, `current`,
+    `limit` y `regression` (True si la métrica empeora más que su umbral,
+    relativo en `thresholds` y con el margen absoluto de `MIN_DELTAS`).
+    Las familias con estado `ok` en la línea base que en `results` no están
+    (`missing`) o no tienen estado `ok` (p. ej. `unavailable` porque falta
+    TensorFlow o Prophet) cuentan como regresión en la métrica `status`.
+    Lanza ValueError si los dos resultados no usan las mismas series y orígenes.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+    if results["config"]["fingerprint"] != baseline["config"]["fingerprint"]:
+        raise ValueError("Los resultados y la línea base no usan las mismas series, orígenes y datos.")
+
+    rows = []
+    for name, reference in baseline["models"].items():
+        if reference.get("status") != "ok":
+            continue
+        # Una familia que funcionaba en la línea base y ahora falta, no está disponible o falla es una regresión
+        current = results["models"].get(name, {"status": "missing"})
+        if current.get("status") != "ok":
+            rows.append({"model": name, "metric": "status", "baseline": "ok", "current": current.get("status"),
+                         "limit": "ok", "regression": True})
+            continue
+        for metric, tolerance in thresholds.items():
+            if reference.get(metric) is None or current.get(metric) is None:
+                continue  # métrica no disponible en esta plataforma (p. ej. peak_rss_mb en Windows)
+            if metric in HIGHER_IS_BETTER:
+                limit = reference[metric] - tolerance
+                regression = current[metric] < limit
+            else:
+                limit = max(reference[metric] * (1 + tolerance), reference[metric] + MIN_DELTAS.get(metric, 0.0))
+                regression = current[metric] > limit
+            rows.append({"model": name, "metric": metric, "baseline": reference[metric], "current": current[metric],
+                         "limit": limit, "regression": bool(regression)})
+    return pd.DataFrame(rows, columns=["model", "metric", "baseline", "current", "limit", "regression"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de precisión y coste de las familias de modelos.")
+    parser.add_argument("--models", nargs="*", default=list(DEFAULT_MODELS), choices=list(CANDIDATES))
+    parser.add_argument("--series", type=int, default=DEFAULT_SERIES)
+    parser.add_argument("--origins", type=int, default=DEFAULT_ORIGINS)
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH)
+    parser.add_argument("--out", default=None, help="Fichero JSON de resultados")
+    parser.add_argument("--baseline", default=None, help=f"Línea base para detectar regresiones (p. ej. {BENCHMARK_BASELINE_PATH})")
+    parser.add_argument("--update-baseline", action="store_true", help="Guardar estos resultados como línea base")
+    args = parser.parse_args()
+
+    benchmark = run_benchmark(args.models, args.series, args.origins, args.data)
+    print(f"Resultados guardados en {write_results(benchmark, args.out)}")
+    if args.update_baseline:
+        print(f"Línea base actualizada en {write_results(benchmark, args.baseline or BENCHMARK_BASELINE_PATH)}")
+    elif args.baseline:
+        comparison = check_regressions(benchmark, load_results(args.baseline))
+        print(comparison.to_string(index=False))
+        if comparison["regression"].any():
+            print("Hay regresiones frente a la línea base.")
+            sys.exit(1)
@@ -0,0 +1,180 @@
+"""Construcción por bloques de `total_data` a partir de los CSV originales del M5.
+
+Sustituye al `sales.melt(...)` + dos `merge` + un único `to_csv` de
+`data_base_create.ipynb`. La tabla ancha de ventas se procesa en bloques de
+series (por defecto una tienda del M5, 3.049 filas): el formato largo se obtiene
+con reshapes de NumPy y el calendario y los precios se unen mediante claves
+enteras precalculadas (`d` -> índice de día, `wm_yr_wk` -> índice de semana).
+Cada bloque se escribe en disco antes de leer el siguiente, así que la memoria
+máxima depende del tamaño del bloque y no del tamaño del dataset.
+
+A diferencia del `melt`, las filas salen ordenadas por serie (todas las fechas
+de una serie seguidas) en lugar de por día.
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.paths import RAW_DIR, TOTAL_DATA_PATH
+from pipeline.store import SalesStoreWriter
+
+ID_COLUMNS = ["id", "item_id", "dept_id", "cat_id", "store_id", "state_id"]
+CALENDAR_COLUMNS = [
+    "date", "wm_yr_wk", "weekday", "wday", "month", "year",
+    "event_name_1", "event_type_1", "event_name_2", "event_type_2",
+    "snap_CA", "snap_TX", "snap_WI",
+]
+# Mismo orden de columnas que producía el melt + merge del notebook
+TOTAL_DATA_COLUMNS = ID_COLUMNS + ["d", "sales"] + CALENDAR_COLUMNS + ["sell_price"]
+
+# Número de series por tienda en el M5: con este tamaño cada bloque es una tienda
+M5_SERIES_PER_STORE = 3049
+
+
+def load_calendar(calendar_path):
+    """Lee el calendario y devuelve el DataFrame indexado por día (`d_1` -> 0)."""
+    calendar = pd.read_csv(calendar_path)
+    calendar["day_index"] = calendar["d"].str.slice(2).astype(np.int32) - 1
+    calendar = calendar.sort_values("day_index").reset_index(drop=True)
+    for col in ["date", "weekday", "event_name_1", "event_type_1", "event_name_2", "event_type_2", "d"]:
+        calendar[col] = calendar[col].astype("category")
+    return calendar
+
+
+def load_prices(prices_path, weeks):
+    """Lee los precios con tipos compactos y añade el índice de semana.
+
+    `weeks` es el array ordenado de `wm_yr_wk` del calendario; el índice de
+    semana es la posición dentro de ese array.
+    """
+    prices = pd.read_csv(
+        prices_path,
+        dtype={"store_id": "category", "item_id": "category", "wm_yr_wk": np.int32, "sell_price": np.float32},
+    )
+    prices["week_index"] = np.searchsorted(weeks, prices["wm_yr_wk"].to_numpy()).astype(np.int32)
+    return prices
+
+
+def _take(column, positions):
+    # Gather por posición; las columnas categóricas se copian solo como códigos
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return pd.Categorical.from_codes(column.cat.codes.to_numpy()[positions], dtype=column.dtype)
+    return column.to_numpy()[positions]
+
+
+def _price_matrix(block, prices, price_rows_by_store, n_weeks):
+    # Matriz (series del bloque x semanas) con el precio de cada serie y semana
+    matrix = np.full((len(block), n_weeks), np.nan, dtype=np.float32)
+    rows = np.concatenate([
+        price_rows_by_store.get(store, np.empty(0, dtype=np.int64)) for store in block["store_id"].unique()
+    ])
+    if len(rows) == 0:
+        return matrix
+    block_prices = prices.iloc[rows]
+    series_keys = pd.MultiIndex.from_arrays([block["store_id"].astype(str), block["item_id"].astype(str)])
+    price_keys = pd.MultiIndex.from_arrays([
+        block_prices["store_id"].astype(str), block_prices["item_id"].astype(str)
+    ])
+    series_pos = series_keys.get_indexer(price_keys)
+    valid = series_pos >= 0
+    matrix[series_pos[valid], block_prices["week_index"].to_numpy()[valid]] = (
+        block_prices["sell_price"].to_numpy()[valid]
+    )
+    return matrix
+
+
+def _long_block(block, day_columns, day_index, calendar, day_week_index, prices, price_rows_by_store, n_weeks):
+    # Pasar un bloque ancho (series x días) a formato largo sin melt
+    n_series, n_days = len(block), len(day_columns)
+    values = block[day_columns].to_numpy()
+    long = {}
+
+    # Identificadores: cada serie se repite n_days veces (como categorías para no copiar strings)
+    for col in ID_COLUMNS:
+        codes, uniques = pd.factorize(block[col])
+        long[col] = pd.Categorical.from_codes(np.repeat(codes, n_days), categories=uniques)
+
+    # Día y ventas: el ravel en orden C deja cada serie contigua
+    days = np.tile(day_index, n_series)
+    long["d"] = _take(calendar["d"], days)
+    long["sales"] = values.ravel()
+
+    # Calendario: gather por índice de día
+    for col in CALENDAR_COLUMNS:
+        long[col] = _take(calendar[col], days)
+
+    # Precios: gather por (serie, índice de semana)
+    matrix = _price_matrix(block, prices, price_rows_by_store, n_weeks)
+    long["sell_price"] = matrix[:, day_week_index[day_index]].ravel()
+
+    return pd.DataFrame(long, columns=TOTAL_DATA_COLUMNS)
+
+
+def build_total_data(sales_path=os.path.join(RAW_DIR, "sales.csv"),
+                     calendar_path=os.path.join(RAW_DIR, "calendar.csv"),
+                     prices_path=os.path.join(RAW_DIR, "sell_prices.csv"),
+                     out_csv=TOTAL_DATA_PATH, store_dir=None, block_size=M5_SERIES_PER_STORE,
+                     partition_by_year=False):
+    """Construye `total_data` en streaming y lo escribe bloque a bloque.
+
+    `out_csv` es el CSV de salida (None para no escribirlo) y `store_dir` el
+    almacén Parquet de `pipeline.store` (None para no escribirlo). `block_size`
+    es el número de series (filas de sales.csv) por bloque. Devuelve el número
+    de filas escritas.
+    """
+    if out_csv is None and store_dir is None:
+        raise ValueError("Indica al menos una salida: out_csv o store_dir.")
+
+    calendar = load_calendar(calendar_path)
+    weeks = np.sort(calendar["wm_yr_wk"].unique())
+    day_week_index = np.searchsorted(weeks, calendar["wm_yr_wk"].to_numpy())
+    prices = load_prices(prices_path, weeks)
+    price_rows_by_store = {
+        store: rows for store, rows in prices.groupby("store_id", observed=True).indices.items()
+    }
+
+    # Columnas de días del fichero ancho y su índice entero
+    header = pd.read_csv(sales_path, nrows=0).columns
+    day_columns = [col for col in header if col.startswith("d_")]
+    day_index = np.array([int(col[2:]) - 1 for col in day_columns], dtype=np.int32)
+    dtypes = {col: np.int16 for col in day_columns}
+
+    writer = SalesStoreWriter(store_dir, partition_by_year=partition_by_year) if store_dir else None
+    if out_csv is not None and os.path.exists(out_csv):
+        os.remove(out_csv)
+
+    total_rows = 0
+    try:
+        for block in pd.read_csv(sales_path, dtype=dtypes, chunksize=block_size):
+            long = _long_block(
+                block, day_columns, day_index, calendar, day_week_index, prices, price_rows_by_store, len(weeks)
+            )
+            if out_csv is not None:
+                long.to_csv(out_csv, mode="a", header=total_rows == 0, index=False)
+            if writer is not None:
+                writer.write(long)
+            total_rows += len(long)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return total_rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye total_data (formato largo) por bloques de series.")
+    parser.add_argument("--sales", default=os.path.join(RAW_DIR, "sales.csv"))
+    parser.add_argument("--calendar", default=os.path.join(RAW_DIR, "calendar.csv"))
+    parser.add_argument("--prices", default=os.path.join(RAW_DIR, "sell_prices.csv"))
+    parser.add_argument("--out-csv", default=TOTAL_DATA_PATH, help="CSV de salida ('' para no escribirlo)")
+    parser.add_argument("--store-dir", default="", help="Almacén Parquet de salida ('' para no escribirlo)")
+    parser.add_argument("--block-size", type=int, default=M5_SERIES_PER_STORE)
+    args = parser.parse_args()
+
+    rows = build_total_data(
+        args.sales, args.calendar, args.prices,
+        out_csv=args.out_csv or None, store_dir=args.store_dir or None, block_size=args.block_size,
+    )
+    print(f"total_data construido con {rows:,} filas")
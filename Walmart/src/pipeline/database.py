@@ -0,0 +1,277 @@
+"""Capa de acceso a la base de datos SQLite `DB_Walmart`.
+
+Sustituye a los `to_sql(if_exists='replace')` sin índices y a los
+`SELECT *` ejecutados dos veces (`cursor.execute` + `pd.read_sql`) de
+`data_base_create.ipynb`:
+
+- cada tabla tiene un esquema tipado y sus índices, creados después de la carga;
+- la carga es masiva, en una única transacción y con WAL y pragmas ajustados;
+- las consultas empujan a SQL los filtros de tienda, producto y fechas y pueden
+  devolver los resultados en chunks, de modo que obtener una serie es una
+  búsqueda por índice y no la materialización de la tabla entera.
+"""
+import os
+import sqlite3
+from contextlib import closing
+
+import pandas as pd
+
+from pipeline.paths import RAW_DIR, SALES_STORE_DIR, TOTAL_DATA_PATH, WALMART_DB_PATH
+from pipeline.store import iter_sales
+
+# Esquemas tipados: (columna, tipo SQLite) en el orden de los CSV del M5
+CALENDAR_SCHEMA = [
+    ("date", "TEXT"), ("wm_yr_wk", "INTEGER"), ("weekday", "TEXT"), ("wday", "INTEGER"),
+    ("month", "INTEGER"), ("year", "INTEGER"), ("d", "TEXT"),
+    ("event_name_1", "TEXT"), ("event_type_1", "TEXT"), ("event_name_2", "TEXT"), ("event_type_2", "TEXT"),
+    ("snap_CA", "INTEGER"), ("snap_TX", "INTEGER"), ("snap_WI", "INTEGER"),
+]
+SELL_PRICES_SCHEMA = [
+    ("store_id", "TEXT"), ("item_id", "TEXT"), ("wm_yr_wk", "INTEGER"), ("sell_price", "REAL"),
+]
+TOTAL_DATA_SCHEMA = [
+    ("id", "TEXT"), ("item_id", "TEXT"), ("dept_id", "TEXT"), ("cat_id", "TEXT"),
+    ("store_id", "TEXT"), ("state_id", "TEXT"), ("d", "TEXT"), ("sales", "INTEGER"),
+    ("date", "TEXT"), ("wm_yr_wk", "INTEGER"), ("weekday", "TEXT"), ("wday", "INTEGER"),
+    ("month", "INTEGER"), ("year", "INTEGER"),
+    ("event_name_1", "TEXT"), ("event_type_1", "TEXT"), ("event_name_2", "TEXT"), ("event_type_2", "TEXT"),
+    ("snap_CA", "INTEGER"), ("snap_TX", "INTEGER"), ("snap_WI", "INTEGER"), ("sell_price", "REAL"),
+]
+SALES_ID_SCHEMA = [
+    ("id", "TEXT"), ("item_id", "TEXT"), ("dept_id", "TEXT"), ("cat_id", "TEXT"),
+    ("store_id", "TEXT"), ("state_id", "TEXT"),
+]
+
+# Índices de cada tabla: nombre -> columnas
+TABLE_INDEXES = {
+    "calendar": {"idx_calendar_d": ["d"], "idx_calendar_wm_yr_wk": ["wm_yr_wk"]},
+    "sell_prices": {"idx_sell_prices_series_week": ["store_id", "item_id", "wm_yr_wk"],
+                    "idx_sell_prices_wm_yr_wk": ["wm_yr_wk"]},
+    "sales": {"idx_sales_series": ["store_id", "item_id"]},
+    "total_data": {"idx_total_data_series_d": ["store_id", "item_id", "d"],
+                   "idx_total_data_wm_yr_wk": ["wm_yr_wk"]},
+}
+
+# Pragmas de lectura/escritura; durante la carga masiva se desactiva además el fsync
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+    "cache_size": -262144,  # 256 MB
+    "mmap_size": 268435456,
+}
+
+
+def connect(db_path=WALMART_DB_PATH):
+    """Abre la base de datos con los pragmas del proyecto en modo autocommit."""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    con = sqlite3.connect(db_path, isolation_level=None)
+    for name, value in PRAGMAS.items():
+        con.execute(f"PRAGMA {name} = {value}")
+    return con
+
+
+def _column_values(series):
+    # Pasar una columna a valores nativos de Python que sqlite3 sabe enlazar
+    if pd.api.types.is_datetime64_any_dtype(series):
+        series = series.dt.strftime("%Y-%m-%d")
+    elif isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    return series.where(series.notna(), None).tolist()
+
+
+def _quote(col):
+    return f'"{col}"'
+
+
+def _chain(first, rest):
+    yield first
+    yield from rest
+
+
+def _sqlite_type(series):
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        return "REAL"
+    return "TEXT"
+
+
+def bulk_load(con, table, data, schema=None, indexes=None, batch_size=100_000):
+    """Carga `data` (un DataFrame o un iterable de DataFrames) en `table`.
+
+    La tabla se recrea con el esquema tipado `schema` (lista de
+    `(columna, tipo)`; si es None se infiere del primer DataFrame), todas las
+    filas se insertan en una sola transacción con `executemany` y los índices
+    se crean al final, que es bastante más rápido que mantenerlos durante la
+    carga. Devuelve el número de filas insertadas.
+    """
+    frames = iter([data]) if isinstance(data, pd.DataFrame) else iter(data)
+    first = next(frames, None)
+    if first is None:
+        raise ValueError(f"No hay datos que cargar en la tabla {table}.")
+    if schema is None:
+        schema = [(col, _sqlite_type(first[col])) for col in first.columns]
+    if indexes is None:
+        indexes = TABLE_INDEXES.get(table, {})
+
+    columns = [col for col, _ in schema]
+    column_sql = ", ".join(f"{_quote(col)} {sql_type}" for col, sql_type in schema)
+    placeholders = ", ".join("?" * len(columns))
+    insert_sql = f'INSERT INTO "{table}" ({", ".join(_quote(c) for c in columns)}) VALUES ({placeholders})'
+
+    rows = 0
+    con.execute("PRAGMA synchronous = OFF")
+    con.execute("BEGIN")
+    try:
+        con.execute(f'DROP TABLE IF EXISTS "{table}"')
+        con.execute(f'CREATE TABLE "{table}" ({column_sql})')
+        for frame in _chain(first, frames):
+            for start in range(0, len(frame), batch_size):
+                part = frame.iloc[start:start + batch_size]
+                con.executemany(insert_sql, zip(*[_column_values(part[col]) for col in columns]))
+                rows += len(part)
+        for name, index_columns in indexes.items():
+            con.execute(f'CREATE INDEX "{name}" ON "{table}" ({", ".join(_quote(c) for c in index_columns)})')
+        con.execute("COMMIT")
+    except Exception:
+        con.execute("ROLLBACK")
+        raise
+    finally:
+        con.execute(f"PRAGMA synchronous = {PRAGMAS['synchronous']}")
+    con.execute(f'ANALYZE "{table}"')
+    return rows
+
+
+def load_walmart_db(raw_dir=RAW_DIR, db_path=WALMART_DB_PATH, store_dir=SALES_STORE_DIR, chunk_size=1_000_000,
+                    include_wide_sales=True, include_total_data=True):
+    """Crea `DB_Walmart` a partir de los CSV del M5 y del almacén columnar.
+
+    Devuelve un diccionario tabla -> filas cargadas.
+    """
+    loaded = {}
+    with closing(connect(db_path)) as con:
+        loaded["calendar"] = bulk_load(
+            con, "calendar", pd.read_csv(os.path.join(raw_dir, "calendar.csv")), CALENDAR_SCHEMA
+        )
+        loaded["sell_prices"] = bulk_load(
+            con, "sell_prices",
+            pd.read_csv(os.path.join(raw_dir, "sell_prices.csv"), chunksize=chunk_size),
+            SELL_PRICES_SCHEMA,
+        )
+        sample_submission_path = os.path.join(raw_dir, "sample_submission.csv")
+        if os.path.exists(sample_submission_path):
+            loaded["sample_submission"] = bulk_load(
+                con, "sample_submission", pd.read_csv(sample_submission_path, chunksize=chunk_size)
+            )
+        if include_wide_sales:
+            sales_path = os.path.join(raw_dir, "sales.csv")
+            header = pd.read_csv(sales_path, nrows=0).columns
+            schema = SALES_ID_SCHEMA + [(col, "INTEGER") for col in header if col.startswith("d_")]
+            loaded["sales"] = bulk_load(con, "sales", pd.read_csv(sales_path, chunksize=10_000), schema)
+    if include_total_data:
+        loaded["total_data"] = load_total_data(
+            db_path, store_dir, os.path.join(raw_dir, "total_data.csv"), chunk_size
+        )
+    return loaded
+
+
+def load_total_data(db_path=WALMART_DB_PATH, store_dir=SALES_STORE_DIR, csv_path=TOTAL_DATA_PATH,
+                    chunk_size=1_000_000):
+    """Carga `total_data` (formato largo) con sus índices.
+
+    Se lee por chunks desde el almacén Parquet de `pipeline.store` si existe y,
+    si no, desde `total_data.csv`.
+    """
+    if os.path.isdir(store_dir):
+        frames = iter_sales(batch_size=chunk_size, store_dir=store_dir)
+    else:
+        frames = pd.read_csv(csv_path, chunksize=chunk_size)
+    with closing(connect(db_path)) as con:
+        return bulk_load(con, "total_data", frames, TOTAL_DATA_SCHEMA)
+
+
+def list_tables(db_path=WALMART_DB_PATH):
+    """Nombres de las tablas de la base de datos."""
+    with closing(connect(db_path)) as con:
+        rows = con.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+        )
+        return [row[0] for row in rows]
+
+
+def _read(sql, params, chunksize, db_path):
+    # Una sola ejecución de la consulta; con chunksize se devuelve un generador
+    if chunksize is None:
+        with closing(connect(db_path)) as con:
+            return pd.read_sql(sql, con, params=params)
+    return _read_chunks(sql, params, chunksize, db_path)
+
+
+def _read_chunks(sql, params, chunksize, db_path):
+    with closing(connect(db_path)) as con:
+        yield from pd.read_sql(sql, con, params=params, chunksize=chunksize)
+
+
+def _select(table, columns):
+    column_sql = "*" if columns is None else ", ".join(_quote(c) for c in columns)
+    return f'SELECT {column_sql} FROM "{table}"'
+
+
+def read_table(table, columns=None, chunksize=None, db_path=WALMART_DB_PATH, limit=None):
+    """Lee una tabla completa (o solo algunas columnas), opcionalmente en chunks.
+
+    Con `limit` solo se leen las primeras `limit` filas (`LIMIT` en SQL), para
+    echar un vistazo a una tabla sin cargarla entera.
+    """
+    sql = _select(table, columns)
+    if limit is not None:
+        return _read(f"{sql} LIMIT ?", [int(limit)], chunksize, db_path)
+    return _read(sql, [], chunksize, db_path)
+
+
+def query_sales(stores=None, items=None, start=None, end=None, columns=None, chunksize=None,
+                table="total_data", db_path=WALMART_DB_PATH):
+    """Consulta `total_data` empujando los filtros a SQL.
+
+    `stores` e `items` se traducen a `IN (...)` sobre el índice
+    `(store_id, item_id, d)`; `start` y `end` filtran por `date` (incluidos).
+    """
+    conditions, params = [], []
+    if stores is not None:
+        stores = list(stores)
+        conditions.append(f"store_id IN ({', '.join('?' * len(stores))})")
+        params.extend(stores)
+    if items is not None:
+        items = list(items)
+        conditions.append(f"item_id IN ({', '.join('?' * len(items))})")
+        params.extend(items)
+    if start is not None:
+        conditions.append("date >= ?")
+        params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+    if end is not None:
+        conditions.append("date <= ?")
+        params.append(pd.Timestamp(end).strftime("%Y-%m-%d"))
+
+    sql = _select(table, columns)
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    return _read(sql, params, chunksize, db_path)
+
+
+def get_series(item_id, store_id, columns=None, db_path=WALMART_DB_PATH):
+    """Devuelve la serie diaria de un producto en una tienda ordenada por fecha."""
+    df = query_sales(stores=[store_id], items=[item_id], columns=columns, db_path=db_path)
+    return df.sort_values("date").reset_index(drop=True) if "date" in df.columns else df
+
+
+def get_prices(item_id, store_id, db_path=WALMART_DB_PATH):
+    """Precios semanales de un producto en una tienda (búsqueda por índice)."""
+    sql = _select("sell_prices", None) + " WHERE store_id = ? AND item_id = ? ORDER BY wm_yr_wk"
+    return _read(sql, [store_id, item_id], None, db_path)
+
+
+def explain(sql, params=(), db_path=WALMART_DB_PATH):
+    """Plan de ejecución de SQLite, útil para comprobar que una consulta usa un índice."""
+    with closing(connect(db_path)) as con:
+        return [row[-1] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}", list(params))]
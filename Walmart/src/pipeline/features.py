@@ -0,0 +1,239 @@
+"""Construcción de características para los modelos por serie (producto-tienda).
+
+Un único módulo para el entrenamiento (`models_data_monthly.ipynb`) y para la
+app de Streamlit, en lugar de repetir en cada sitio el `apply(axis=1)` del
+`snap`, los `groupby().shift()` de los lags y la reconstrucción a mano con
+`iloc[-k]` del registro del mes siguiente.
+
+Los datos se ordenan una vez por (`item_id`, `store_id`, periodo) y todas las
+operaciones se hacen sobre arrays de NumPy usando el inicio y la longitud de
+cada serie, de modo que los lags y la media móvil nunca mezclan valores de
+series distintas:
+
+- `build_features` añade las características a todo el histórico (entrenamiento);
+- `extend_features` calcula solo las de los periodos nuevos a partir de la
+  cola del histórico (actualización mensual incremental);
+- `next_period_features` genera de una vez la fila del periodo siguiente para
+  cualquier número de series (predicción).
+"""
+import numpy as np
+import pandas as pd
+
+LAGS = (1, 2, 3, 6, 12)
+ROLLING_WINDOW = 3
+MONTH_COLUMNS = [f"month_{month}" for month in range(1, 13)]
+
+
+def feature_columns(lags=LAGS, rolling_window=ROLLING_WINDOW):
+    """Columnas de entrada del modelo, en el orden con el que se entrenó."""
+    return (
+        ["event_name_1", "snap", "sell_price"] + [f"lag_{lag}" for lag in lags]
+        + [f"rolling_mean_{rolling_window}", "year"] + MONTH_COLUMNS
+    )
+
+
+# Columnas de entrada de los modelos XGBoost guardados, en su orden
+FEATURE_COLUMNS = feature_columns()
+
+# Columnas del histórico que necesita `next_period_features`
+HISTORY_COLUMNS = ["month", "sales", "event_name_1", "snap", "sell_price"]
+
+# Estado -> columna SNAP de la tienda
+SNAP_COLUMNS = {"CA": "snap_CA", "TX": "snap_TX", "WI": "snap_WI"}
+
+
+def sort_series(df, period_col="month"):
+    """Ordena las filas por serie y periodo (orden estable)."""
+    return df.sort_values(["item_id", "store_id", period_col], kind="stable").reset_index(drop=True)
+
+
+def series_layout(df):
+    """Inicio, longitud y posición dentro de su serie de cada fila de un DataFrame ya ordenado.
+
+    Devuelve `(starts, lengths, group, position)`: `starts` y `lengths` tienen
+    una entrada por serie y `group` / `position` una por fila.
+    """
+    n = len(df)
+    item_codes = pd.factorize(df["item_id"])[0]
+    store_codes = pd.factorize(df["store_id"])[0]
+    new_series = np.ones(n, dtype=bool)
+    new_series[1:] = (item_codes[1:] != item_codes[:-1]) | (store_codes[1:] != store_codes[:-1])
+    starts = np.flatnonzero(new_series)
+    lengths = np.diff(np.append(starts, n))
+    group = np.cumsum(new_series) - 1
+    position = np.arange(n) - starts[group]
+    return starts, lengths, group, position
+
+
+def select_snap(df):
+    """Columna `snap` de cada fila según el estado de su tienda (sin `apply`)."""
+    state = df["store_id"].astype(str).str.slice(0, 2).to_numpy()
+    conditions = [state == prefix for prefix in SNAP_COLUMNS]
+    choices = [df[col].to_numpy() for col in SNAP_COLUMNS.values()]
+    return np.select(conditions, choices, default=0)
+
+
+def _lag(values, position, lag):
+    # Valor `lag` periodos atrás dentro de la misma serie (NaN si no existe)
+    out = np.full(len(values), np.nan)
+    valid = position >= lag
+    out[valid] = values[np.flatnonzero(valid) - lag]
+    return out
+
+
+def _rolling_mean(values, position, window):
+    # Media de los `window` periodos anteriores (equivale a shift(1).rolling(window) por serie)
+    csum = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    idx = np.arange(len(values))
+    out = np.full(len(values), np.nan)
+    valid = position >= window
+    out[valid] = (csum[idx[valid]] - csum[idx[valid] - window]) / window
+    return out
+
+
+def month_one_hot(months):
+    """DataFrame con las columnas `month_1` ... `month_12` a partir del número de mes."""
+    months = np.asarray(months)
+    return pd.DataFrame(
+        months[:, None] == np.arange(1, 13)[None, :], columns=MONTH_COLUMNS
+    )
+
+
+def build_features(df, period_col="month", lags=LAGS, rolling_window=ROLLING_WINDOW, one_hot_month=True,
+                   dropna=True):
+    """Añade las características de entrenamiento a un DataFrame mensual por serie.
+
+    Espera las columnas `item_id`, `store_id`, `period_col`, `sales`,
+    `event_name_1`, `snap_CA`, `snap_TX`, `snap_WI` y `sell_price` (la salida de
+    `load_aggregates('monthly')`). Añade `snap`, `lag_k`, `rolling_mean_<w>`,
+    `year` y los `month_1..12` (o `month_num` si `one_hot_month` es False), con
+    las mismas transformaciones que hacían los notebooks. Las filas salen
+    ordenadas por serie y periodo; con `dropna` se eliminan las que no tienen
+    todos los lags.
+    """
+    df = sort_series(df, period_col)
+    _, _, _, position = series_layout(df)
+    sales = df["sales"].to_numpy(dtype=np.float64)
+
+    df["event_name_1"] = df["event_name_1"].notnull().astype(int)
+    df["snap"] = select_snap(df)
+    df["sell_price"] = df["sell_price"].fillna(df["sell_price"].mean())
+    for lag in lags:
+        df[f"lag_{lag}"] = _lag(sales, position, lag)
+    df[f"rolling_mean_{rolling_window}"] = _rolling_mean(sales, position, rolling_window)
+
+    periods = pd.to_datetime(df[period_col])
+    if one_hot_month:
+        df["year"] = periods.dt.year
+        df = pd.concat([df, month_one_hot(periods.dt.month.to_numpy())], axis=1)
+    else:
+        df["month_num"] = periods.dt.month
+        df["year"] = periods.dt.year
+
+    if dropna:
+        df = df.dropna().reset_index(drop=True)
+    return df
+
+
+def extend_features(history, new_rows, period_col="month", lags=LAGS, rolling_window=ROLLING_WINDOW,
+                    fill_price=None):
+    """Características de los periodos nuevos `new_rows` usando solo la cola de `history`.
+
+    `history` es el histórico con características ya construidas (p. ej.
+    `Final_XGBoost_data_processed.csv`) y `new_rows` los agregados de los
+    periodos siguientes (mismas columnas de entrada que `build_features`). De
+    cada serie solo se usan sus últimos `max(lags, rolling_window)` periodos,
+    así que el coste depende de las filas nuevas y no de la longitud del
+    histórico. Los `sell_price` nulos se rellenan con `fill_price` (por
+    defecto, la media de `history`). Devuelve las filas nuevas con las
+    columnas de `history`; las que no tienen todos los lags se descartan,
+    como en `build_features` (también las de series con tan pocos periodos en
+    `history` que sus lags no se pueden recuperar: esas requieren volver a
+    ejecutar `build_features` sobre los agregados completos).
+    """
+    depth = max(max(lags), rolling_window)
+    history = sort_series(history, period_col)
+    starts, lengths, group, position = series_layout(history)
+    tail = history[position >= lengths[group] - depth]
+
+    new_rows = new_rows.copy()
+    new_rows["event_name_1"] = new_rows["event_name_1"].notnull().astype(int)
+    new_rows["snap"] = select_snap(new_rows)
+    fill_price = history["sell_price"].mean() if fill_price is None else fill_price
+    new_rows["sell_price"] = new_rows["sell_price"].fillna(fill_price)
+    combined = sort_series(pd.concat([tail.assign(_new=False), new_rows.assign(_new=True)], ignore_index=True),
+                           period_col)
+    _, lengths, group, position = series_layout(combined)
+    is_new = combined.pop("_new").to_numpy(dtype=bool)
+
+    # Ventas conocidas por (serie, posición): las de cada fila y, en las filas del histórico, las de sus
+    # lags, que recuperan los periodos anteriores a la cola o descartados por el `dropna` de `build_features`
+    stride = lengths.max() + depth
+    slot = group * stride + position + depth
+    keys, values = [slot], [combined["sales"].to_numpy(dtype=np.float64)]
+    for lag in lags:
+        column = f"lag_{lag}"
+        if column in combined.columns:
+            lagged = combined[column].to_numpy(dtype=np.float64)
+            known = ~is_new & ~np.isnan(lagged)
+            keys.append(slot[known] - lag)
+            values.append(lagged[known])
+    known = pd.Series(np.concatenate(values), index=np.concatenate(keys))
+    known = known[~known.index.duplicated()]
+
+    out = combined[is_new].reset_index(drop=True)
+    new_slot = slot[is_new]
+    for lag in lags:
+        out[f"lag_{lag}"] = known.reindex(new_slot - lag).to_numpy()
+    previous = np.column_stack([known.reindex(new_slot - k).to_numpy() for k in range(1, rolling_window + 1)])
+    out[f"rolling_mean_{rolling_window}"] = previous.mean(axis=1)
+
+    periods = pd.to_datetime(out[period_col])
+    out["year"] = periods.dt.year
+    out = pd.concat([out.drop(columns=MONTH_COLUMNS, errors="ignore"), month_one_hot(periods.dt.month.to_numpy())],
+                    axis=1)
+    out = out.dropna(subset=[f"lag_{lag}" for lag in lags] + [f"rolling_mean_{rolling_window}"])
+    return out.reindex(columns=history.columns).reset_index(drop=True)
+
+
+def next_period_features(history, period_col="month", lags=LAGS, rolling_window=ROLLING_WINDOW):
+    """Fila de características del periodo siguiente para todas las series de `history`.
+
+    `history` es el histórico con características ya construidas (p. ej.
+    `Final_XGBoost_data_processed.csv`). Para cada serie:
+
+    - `event_name_1`, `snap` y `sell_price` se toman del último periodo conocido;
+    - `lag_k` es la venta de hace k periodos (o la media de la serie si es más corta);
+    - `rolling_mean_<w>` es la media de los últimos w periodos disponibles;
+    - `year` y `month_1..12` corresponden al mes siguiente al último.
+
+    Devuelve un DataFrame con una fila por serie: `item_id`, `store_id`,
+    `period_col` (el mes siguiente), `last_sales` (ventas del último periodo)
+    y las columnas de `feature_columns(lags, rolling_window)`.
+    """
+    columns = ["item_id", "store_id", period_col, "last_sales"] + feature_columns(lags, rolling_window)
+    if history.empty:
+        return pd.DataFrame(columns=columns)
+
+    history = sort_series(history, period_col)
+    starts, lengths, group, _ = series_layout(history)
+    last = starts + lengths - 1
+    sales = history["sales"].to_numpy(dtype=np.float64)
+    series_mean = np.bincount(group, weights=sales) / lengths
+
+    out = history.loc[last, ["item_id", "store_id", "event_name_1", "snap", "sell_price"]].reset_index(drop=True)
+    out["last_sales"] = sales[last]
+    for lag in lags:
+        available = lengths >= lag
+        out[f"lag_{lag}"] = np.where(available, sales[np.where(available, last - lag + 1, last)], series_mean)
+
+    # Media de los últimos `rolling_window` periodos (o de los que haya)
+    csum = np.concatenate([[0.0], np.cumsum(sales)])
+    window = np.minimum(lengths, rolling_window)
+    out[f"rolling_mean_{rolling_window}"] = (csum[last + 1] - csum[last + 1 - window]) / window
+
+    next_period = pd.to_datetime(history[period_col].to_numpy()[last]) + pd.offsets.MonthBegin(1)
+    out[period_col] = next_period.normalize()
+    out["year"] = next_period.year
+    out = pd.concat([out, month_one_hot(next_period.month.to_numpy())], axis=1)
+    return out[columns]
@@ -0,0 +1,146 @@
+"""Predicción por lotes de un mes para cualquier conjunto de pares (producto, tienda).
+
+El informe de la app recorría `productos x tiendas` y, para cada par, cargaba
+el modelo, filtraba los datos, construía un DataFrame de una fila y llamaba a
+`predict`, repitiendo la lógica de la predicción individual. `forecast_batch`
+hace lo mismo para todos los pares a la vez:
+
+1. construye de una pasada las filas de características del mes objetivo de
+   todas las series: si el mes está en el histórico se usa su fila (con sus
+   ventas reales, igual que en la validación del entrenamiento) y, si es el
+   mes siguiente al último, se genera con `next_period_features`;
+2. agrupa las filas por modelo y hace una llamada a `predict` por modelo;
+3. devuelve la tabla de predicciones (`write_forecasts` la guarda en CSV).
+
+Uso desde la línea de comandos:
+
+    python -m pipeline.forecast --month 2016-05 --stores CA_1 CA_2
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FEATURE_COLUMNS, next_period_features
+from pipeline.paths import CSV_MODEL_DIR, PROCESSED_DATA_PATH
+from pipeline.schema import read_processed
+
+FORECAST_COLUMNS = [
+    "item_id", "store_id", "month", "real_sales", "predicted_sales", "abs_error", "error_percent",
+    "model_version",
+]
+
+
+def month_start(month):
+    """Primer día del mes de `month` (acepta '2016-05', fechas o Timestamps)."""
+    return pd.Timestamp(month).to_period("M").to_timestamp()
+
+
+def load_history(data_path=PROCESSED_DATA_PATH):
+    """Histórico con características (`Final_XGBoost_data_processed.csv`) con los tipos de `pipeline.schema`."""
+    return read_processed(data_path)
+
+
+def _select_pairs(df, pairs):
+    if pairs is None:
+        return df
+    keys = pd.MultiIndex.from_tuples(list(pairs), names=["item_id", "store_id"])
+    return df[pd.MultiIndex.from_frame(df[["item_id", "store_id"]]).isin(keys)]
+
+
+def forecast_features(history, target_month, period_col="month"):
+    """Filas de características del mes `target_month` para todas las series de `history`.
+
+    Las series con fila en ese mes la usan tal cual (`real_sales` son sus
+    ventas); las que terminan justo el mes anterior reciben la fila generada
+    por `next_period_features` (`real_sales` es NaN). El resto de series no
+    aparecen.
+    """
+    target = month_start(target_month)
+    months = pd.to_datetime(history[period_col])
+
+    known = history.loc[months == target, ["item_id", "store_id", "sales"] + FEATURE_COLUMNS]
+    known = known.rename(columns={"sales": "real_sales"})
+
+    following = next_period_features(history[months < target], period_col)
+    following = following[following[period_col] == target]
+    following = following[~pd.MultiIndex.from_frame(following[["item_id", "store_id"]]).isin(
+        pd.MultiIndex.from_frame(known[["item_id", "store_id"]])
+    )]
+    following = following[["item_id", "store_id"] + FEATURE_COLUMNS].assign(real_sales=np.nan)
+
+    rows = pd.concat([known, following], ignore_index=True)
+    rows.insert(2, period_col, target)
+    return rows
+
+
+def forecast_batch(history, target_month, pairs=None, registry=None, load_model=None, period_col="month"):
+    """Predicción de `target_month` para `pairs` (lista de (item_id, store_id)) o para todas las series.
+
+    `load_model(item_id, store_id)` devuelve el modelo de una serie (por
+    defecto `registry.load_predictor`, abriendo el registro si no se pasa);
+    la app pasa su función con caché. Devuelve un DataFrame con las columnas
+    de `FORECAST_COLUMNS`; las series sin modelo quedan con `predicted_sales`
+    NaN.
+    """
+    if registry is None and load_model is None:
+        from pipeline.registry import open_registry
+
+        registry = open_registry()
+    load_model = load_model or registry.load_predictor
+
+    rows = forecast_features(_select_pairs(history, pairs), target_month, period_col)
+    X = rows[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    predicted = np.full(len(rows), np.nan)
+    versions = np.full(len(rows), None, dtype=object)
+
+    for (item_id, store_id), idx in rows.groupby(["item_id", "store_id"], observed=True, sort=False).indices.items():
+        model = load_model(item_id, store_id)
+        if model is None:
+            continue
+        predicted[idx] = np.expm1(model.predict(X[idx]))
+        if registry is not None and (item_id, store_id) in registry:
+            versions[idx] = registry.entry(item_id, store_id)["version"]
+
+    out = rows[["item_id", "store_id", period_col, "real_sales"]].copy()
+    out["predicted_sales"] = predicted
+    out["abs_error"] = (out["real_sales"] - out["predicted_sales"]).abs()
+    real = out["real_sales"].to_numpy(dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out["error_percent"] = np.where(real != 0, out["abs_error"].to_numpy() / real * 100, 0.0)
+    out["error_percent"] = out["error_percent"].where(out["real_sales"].notna())
+    out["model_version"] = versions
+    return out.sort_values(["item_id", "store_id"]).reset_index(drop=True)
+
+
+def write_forecasts(forecasts, path=None):
+    """Guarda la tabla de predicciones en CSV (por defecto `data/csv_model/forecast_<YYYY-MM>.csv`)."""
+    if path is None:
+        month = forecasts["month"].iloc[0].strftime("%Y-%m") if len(forecasts) else "empty"
+        path = os.path.join(CSV_MODEL_DIR, f"forecast_{month}.csv")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    forecasts.to_csv(path, index=False)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predicción por lotes de un mes para pares producto-tienda.")
+    parser.add_argument("--month", required=True, help="Mes objetivo, p. ej. 2016-05")
+    parser.add_argument("--items", nargs="*", help="Productos (por defecto, todos)")
+    parser.add_argument("--stores", nargs="*", help="Tiendas (por defecto, todas)")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH)
+    parser.add_argument("--out", default=None, help="CSV de salida")
+    args = parser.parse_args()
+
+    history = load_history(args.data)
+    if args.items:
+        history = history[history["item_id"].isin(args.items)]
+    if args.stores:
+        history = history[history["store_id"].isin(args.stores)]
+    forecasts = forecast_batch(history, args.month)
+    path = write_forecasts(forecasts, args.out)
+    valid = forecasts.dropna(subset=["predicted_sales"])
+    print(f"{len(valid)} predicciones para {month_start(args.month):%Y-%m} guardadas en {path}")
+    if valid["real_sales"].notna().any():
+        print(f"MAE: {valid['abs_error'].mean():.2f}")
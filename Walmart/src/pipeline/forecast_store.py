@@ -0,0 +1,222 @@
+"""Tabla materializada de predicciones en SQLite (`data/data_base/DB_Forecasts`).
+
+La app recalculaba la predicción de Mayo 2016 en cada selección de producto y
+tienda aunque el resultado solo cambia cuando cambian los datos o los modelos.
+Aquí las predicciones se calculan por lotes (`pipeline.forecast`) y se guardan
+en la tabla `forecasts`, con clave (`item_id`, `store_id`, `month`,
+`model_version`) y las ventas predichas y reales. La app y el informe PDF las
+leen con una única consulta indexada (`read_forecasts`).
+
+`refresh_forecasts` compara las huellas guardadas en `forecast_runs` con las
+actuales:
+
+- si cambian los datos (`Final_XGBoost_data_processed.csv`), se recalculan
+  todas las series del mes;
+- si solo cambian algunos modelos (su versión en el registro), se recalculan
+  solo esas series;
+- si no cambia nada, no se recalcula nada.
+
+Las filas de versiones anteriores de un modelo se conservan con `current = 0`.
+Si el modelo de una serie no se puede cargar o no predice, su fila anterior
+sigue vigente y la ejecución no queda al día: la siguiente llamada vuelve a
+intentar solo esas series.
+"""
+import argparse
+import hashlib
+from contextlib import closing
+from datetime import datetime
+
+import pandas as pd
+
+from pipeline.database import connect
+from pipeline.forecast import forecast_batch, load_history, month_start
+from pipeline.paths import FORECASTS_DB_PATH, PROCESSED_DATA_PATH
+
+FORECASTS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS forecasts (
+    item_id TEXT NOT NULL,
+    store_id TEXT NOT NULL,
+    month TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    real_sales REAL,
+    predicted_sales REAL NOT NULL,
+    abs_error REAL,
+    error_percent REAL,
+    data_fingerprint TEXT NOT NULL,
+    current INTEGER NOT NULL DEFAULT 1,
+    created TEXT NOT NULL,
+    PRIMARY KEY (item_id, store_id, month, model_version)
+);
+CREATE INDEX IF NOT EXISTS idx_forecasts_current ON forecasts (month, current, store_id, item_id);
+CREATE TABLE IF NOT EXISTS forecast_runs (
+    month TEXT PRIMARY KEY,
+    data_fingerprint TEXT NOT NULL,
+    models_fingerprint TEXT NOT NULL,
+    rows INTEGER NOT NULL,
+    updated TEXT NOT NULL
+);
+"""
+
+INCOMPLETE = "incomplete"  # huella de modelos de una ejecución con series fallidas
+
+READ_COLUMNS = ["item_id", "store_id", "month", "real_sales", "predicted_sales", "abs_error", "error_percent",
+                "model_version"]
+
+
+def file_fingerprint(path, chunk_size=1 << 20):
+    """Huella del contenido de un fichero."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def models_fingerprint(registry):
+    """Huella del conjunto de modelos del registro (clave y versión de cada uno)."""
+    versions = sorted(f"{key}={entry['version']}" for key, entry in registry.models.items())
+    return hashlib.sha256("\n".join(versions).encode()).hexdigest()
+
+
+def _month_key(month):
+    return month_start(month).strftime("%Y-%m-%d")
+
+
+def connect_forecasts(db_path=FORECASTS_DB_PATH):
+    """Abre la base de datos de predicciones y crea las tablas si no existen."""
+    con = connect(db_path)
+    con.executescript(FORECASTS_SCHEMA)
+    return con
+
+
+def forecast_status(target_month, registry, data_path=PROCESSED_DATA_PATH, db_path=FORECASTS_DB_PATH):
+    """'fresh' si las predicciones del mes están al día, 'stale' si hay que recalcular y 'missing' si no existen."""
+    with closing(connect_forecasts(db_path)) as con:
+        run = con.execute(
+            "SELECT data_fingerprint, models_fingerprint FROM forecast_runs WHERE month = ?",
+            [_month_key(target_month)],
+        ).fetchone()
+    if run is None:
+        return "missing"
+    current = (file_fingerprint(data_path), models_fingerprint(registry))
+    return "fresh" if tuple(run) == current else "stale"
+
+
+def refresh_forecasts(target_month, registry=None, data_path=PROCESSED_DATA_PATH, db_path=FORECASTS_DB_PATH,
+                      load_model=None, force=False):
+    """Recalcula (solo si hace falta) las predicciones de `target_month` y las guarda en la tabla.
+
+    Devuelve el número de series recalculadas (0 si todo estaba al día).
+    """
+    if registry is None:
+        from pipeline.registry import open_registry
+
+        registry = open_registry()
+    month = _month_key(target_month)
+    data_hash = file_fingerprint(data_path)
+    models_hash = models_fingerprint(registry)
+
+    with closing(connect_forecasts(db_path)) as con:
+        run = con.execute(
+            "SELECT data_fingerprint, models_fingerprint FROM forecast_runs WHERE month = ?", [month]
+        ).fetchone()
+        if not force and run is not None and tuple(run) == (data_hash, models_hash):
+            return 0
+
+        current_rows = con.execute(
+            "SELECT item_id, store_id, model_version, data_fingerprint FROM forecasts WHERE month = ? AND current = 1",
+            [month],
+        ).fetchall()
+        # Series a recalcular: todas si cambian los datos; si no, las que no tienen fila con su versión
+        # actual calculada con los datos actuales
+        pairs, retired = None, []
+        if not force and run is not None and run[0] == data_hash:
+            stored = {(item_id, store_id, version) for item_id, store_id, version, data in current_rows
+                      if data == data_hash}
+            pairs = [
+                (entry["item_id"], entry["store_id"]) for entry in registry.models.values()
+                if (entry["item_id"], entry["store_id"], entry["version"]) not in stored
+            ]
+            # Series cuyo modelo ya no está en el registro: dejan de estar vigentes
+            retired = list({(item_id, store_id) for item_id, store_id, _, _ in current_rows
+                            if (item_id, store_id) not in registry})
+
+        forecasts = pd.DataFrame(columns=READ_COLUMNS)
+        failed = set()
+        if pairs is None or pairs:
+            forecasts = forecast_batch(load_history(data_path), target_month, pairs=pairs, registry=registry,
+                                       load_model=load_model)
+            # Series del registro cuyo modelo no se pudo cargar o no predijo: conservan su fila anterior y
+            # quedan pendientes (las series sin modelo en el registro simplemente no tienen predicción)
+            missing = forecasts[["predicted_sales", "model_version"]].isna().any(axis=1)
+            failed = {pair for pair in zip(forecasts.loc[missing, "item_id"], forecasts.loc[missing, "store_id"])
+                      if pair in registry}
+            forecasts = forecasts[~missing]
+        if pairs is None:
+            replaced = {(item_id, store_id) for item_id, store_id, _, _ in current_rows} - failed
+        else:
+            replaced = set(pairs) - failed
+
+        created = datetime.now().isoformat(timespec="seconds")
+        rows = [
+            (row.item_id, row.store_id, month, row.model_version,
+             None if pd.isna(row.real_sales) else float(row.real_sales), float(row.predicted_sales),
+             None if pd.isna(row.abs_error) else float(row.abs_error),
+             None if pd.isna(row.error_percent) else float(row.error_percent), data_hash, created)
+            for row in forecasts.itertuples(index=False)
+        ]
+        con.execute("BEGIN")
+        try:
+            con.executemany(
+                "UPDATE forecasts SET current = 0 WHERE month = ? AND item_id = ? AND store_id = ?",
+                [(month, item_id, store_id) for item_id, store_id in sorted(replaced | set(retired))],
+            )
+            con.executemany(
+                "INSERT OR REPLACE INTO forecasts (item_id, store_id, month, model_version, real_sales, "
+                "predicted_sales, abs_error, error_percent, data_fingerprint, current, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                rows,
+            )
+            total = con.execute(
+                "SELECT COUNT(*) FROM forecasts WHERE month = ? AND current = 1", [month]
+            ).fetchone()[0]
+            # Con series fallidas la ejecución no queda al día: la siguiente recalcula solo esas
+            con.execute(
+                "INSERT OR REPLACE INTO forecast_runs (month, data_fingerprint, models_fingerprint, rows, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [month, data_hash, INCOMPLETE if failed else models_hash, total, created],
+            )
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    return len(rows)
+
+
+def read_forecasts(target_month, pairs=None, db_path=FORECASTS_DB_PATH):
+    """Predicciones vigentes de `target_month` (de todas las series o de `pairs`) en una única consulta."""
+    sql = f"SELECT {', '.join(READ_COLUMNS)} FROM forecasts WHERE month = ? AND current = 1"
+    params = [_month_key(target_month)]
+    pairs = None if pairs is None else list(pairs)
+    if pairs is not None:
+        if not pairs:
+            return pd.DataFrame(columns=READ_COLUMNS)
+        sql += f" AND (item_id, store_id) IN (VALUES {', '.join(['(?, ?)'] * len(pairs))})"
+        params += [value for pair in pairs for value in pair]
+    with closing(connect_forecasts(db_path)) as con:
+        forecasts = pd.read_sql(sql + " ORDER BY item_id, store_id", con, params=params)
+    forecasts["month"] = pd.to_datetime(forecasts["month"])
+    return forecasts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actualiza la tabla materializada de predicciones.")
+    parser.add_argument("--month", required=True, help="Mes objetivo, p. ej. 2016-05")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH)
+    parser.add_argument("--db", default=FORECASTS_DB_PATH)
+    parser.add_argument("--force", action="store_true", help="Recalcular aunque las huellas no hayan cambiado")
+    args = parser.parse_args()
+
+    updated = refresh_forecasts(args.month, data_path=args.data, db_path=args.db, force=args.force)
+    print(f"Series recalculadas: {updated}")
+    print(f"Predicciones vigentes: {len(read_forecasts(args.month, db_path=args.db))}")
@@ -0,0 +1,176 @@
+"""Modelo XGBoost global (opcional) entrenado con todas las series a la vez.
+
+En lugar de un `XGBRegressor` por (`item_id`, `store_id`) con ~60 filas cada
+uno, se entrena un único modelo con todas las filas del histórico mensual y se
+añaden como características el producto, la tienda, el departamento y la
+categoría (columnas categóricas nativas de XGBoost). La predicción de un mes
+para todas las series es una sola llamada a `predict` sobre la matriz de
+características construida por `pipeline.features.next_period_features`.
+
+`compare_with_per_series` evalúa los dos enfoques con el mismo protocolo que
+`models_data_monthly.ipynb` (entrenar con todo salvo el último mes de cada serie
+y predecir ese mes) y devuelve la tabla de predicciones y las métricas.
+"""
+import argparse
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from xgboost import XGBRegressor
+
+from pipeline.features import FEATURE_COLUMNS, next_period_features
+from pipeline.paths import MODELS_DIR, PROCESSED_DATA_PATH
+from pipeline.schema import read_processed
+
+ENCODING_COLUMNS = ["item_id", "store_id", "dept_id", "cat_id"]
+GLOBAL_FEATURE_COLUMNS = FEATURE_COLUMNS + ENCODING_COLUMNS
+GLOBAL_MODEL_PATH = os.path.join(MODELS_DIR, "Global_model_XGBOOST.sav")
+
+DEFAULT_PARAMS = {
+    "n_estimators": 600,
+    "max_depth": 8,
+    "learning_rate": 0.05,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "tree_method": "hist",
+    "max_cat_to_onehot": 1,
+    "random_state": 42,
+}
+
+
+def add_hierarchy(df):
+    """Añade `dept_id` y `cat_id` derivados del `item_id` del M5 (`FOODS_1_012` -> `FOODS_1`, `FOODS`)."""
+    df = df.copy()
+    items = df["item_id"].astype(str)
+    if "dept_id" not in df.columns:
+        df["dept_id"] = items.str.rsplit("_", n=1).str[0]
+    if "cat_id" not in df.columns:
+        df["cat_id"] = items.str.split("_", n=1).str[0]
+    return df
+
+
+class GlobalXGBModel:
+    """Un único XGBoost para todas las series, con el producto, la tienda, el departamento y la categoría como categóricas.
+
+    Igual que los modelos por serie, se entrena sobre `log1p(sales)` y
+    `predict` devuelve ventas en unidades (`expm1`).
+    """
+
+    def __init__(self, **params):
+        self.params = {**DEFAULT_PARAMS, **params}
+        self.model = None
+        self.categories = {}
+
+    def _matrix(self, df):
+        # Características con las mismas categorías que en el entrenamiento
+        X = add_hierarchy(df)[GLOBAL_FEATURE_COLUMNS].copy()
+        for col in ENCODING_COLUMNS:
+            X[col] = pd.Categorical(X[col].astype(str), categories=self.categories[col])
+        for col in FEATURE_COLUMNS:
+            if X[col].dtype == bool:
+                X[col] = X[col].astype(np.int8)
+        return X
+
+    def fit(self, df, target="sales"):
+        """Entrena con un DataFrame de `build_features` (todas las series juntas)."""
+        df = add_hierarchy(df)
+        self.categories = {col: sorted(df[col].astype(str).unique()) for col in ENCODING_COLUMNS}
+        self.model = XGBRegressor(enable_categorical=True, **self.params)
+        self.model.fit(self._matrix(df), np.log1p(df[target].to_numpy(dtype=np.float64)))
+        return self
+
+    def predict(self, df):
+        """Predice (en unidades) todas las filas de `df` en una sola llamada."""
+        if self.model is None:
+            raise ValueError("El modelo global no está entrenado.")
+        return np.expm1(self.model.predict(self._matrix(df)))
+
+    def predict_next_period(self, history, period_col="month"):
+        """Predicción del mes siguiente al último de cada serie de `history`.
+
+        Devuelve `item_id`, `store_id`, el mes predicho y `predicted_sales`.
+        """
+        rows = next_period_features(history, period_col)
+        out = rows[["item_id", "store_id", period_col]].copy()
+        out["predicted_sales"] = self.predict(rows)
+        return out
+
+    def save(self, path=GLOBAL_MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(self, path)
+        return path
+
+    @staticmethod
+    def load(path=GLOBAL_MODEL_PATH):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No se encontró el modelo global en: {path}")
+        return joblib.load(path)
+
+
+def _split_last_period(df, period_col):
+    # Último periodo de cada serie como test; el resto como entrenamiento
+    last = df.groupby(["item_id", "store_id"], observed=True)[period_col].transform("max")
+    is_test = df[period_col] == last
+    return df[~is_test], df[is_test]
+
+
+def _metrics(real, predicted):
+    return {
+        "MSE": mean_squared_error(real, predicted),
+        "MAE": mean_absolute_error(real, predicted),
+        "R2": r2_score(real, predicted),
+    }
+
+
+def compare_with_per_series(df, models_dir=MODELS_DIR, period_col="month", params=None):
+    """Compara el modelo global con los modelos por serie sobre el último mes de cada serie.
+
+    `df` es la salida de `build_features` (o `Final_XGBoost_data_processed.csv`).
+    El modelo global se entrena con todas las series salvo su último mes y se
+    predice ese mes para todas a la vez; los modelos por serie se cargan de
+    `models_dir` (`Final_model_XGBOOST_<item>_<store>.sav`, entrenados con el
+    mismo corte). Devuelve `(predicciones, métricas)`: una fila por serie con
+    `real_sales`, `pred_global` y `pred_per_series`, y una tabla de MSE/MAE/R²
+    por enfoque calculada sobre las series que tienen los dos.
+    """
+    df = df.copy()
+    df[period_col] = pd.to_datetime(df[period_col])
+    train, test = _split_last_period(df, period_col)
+
+    model = GlobalXGBModel(**(params or {})).fit(train)
+    test = test.reset_index(drop=True)
+    results = test[["item_id", "store_id", period_col]].copy()
+    results["real_sales"] = test["sales"].to_numpy(dtype=np.float64)
+    results["pred_global"] = model.predict(test)
+
+    per_series = np.full(len(test), np.nan)
+    for i, (item_id, store_id) in enumerate(zip(test["item_id"], test["store_id"])):
+        model_path = os.path.join(models_dir, f"Final_model_XGBOOST_{item_id}_{store_id}.sav")
+        if os.path.exists(model_path):
+            series_model = joblib.load(model_path)
+            per_series[i] = np.expm1(series_model.predict(test.loc[[i], FEATURE_COLUMNS])[0])
+    results["pred_per_series"] = per_series
+
+    both = results.dropna(subset=["pred_per_series"])
+    metrics = pd.DataFrame({
+        "global": _metrics(both["real_sales"], both["pred_global"]),
+        "per_series": _metrics(both["real_sales"], both["pred_per_series"]),
+    }).T
+    metrics["series"] = len(both)
+    return results, metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena el modelo XGBoost global y lo compara con los modelos por serie.")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH, help="CSV con las características mensuales")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--out", default=GLOBAL_MODEL_PATH, help="Ruta del modelo global entrenado con todo el histórico")
+    args = parser.parse_args()
+
+    data = read_processed(args.data)
+    _, metrics = compare_with_per_series(data, args.models_dir)
+    print(metrics.round(4).to_string())
+    path = GlobalXGBModel().fit(data).save(args.out)
+    print(f"Modelo global guardado en {path}")
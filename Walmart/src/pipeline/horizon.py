@@ -0,0 +1,166 @@
+"""Predicción recursiva a varios meses (1 a 12) para todas las series a la vez.
+
+La app y `models_data_monthly.ipynb` solo predicen el mes siguiente al último
+conocido (Junio 2016, con `month_6` puesto a mano). Para horizontes más largos
+`recursive_forecast` encadena predicciones de un mes:
+
+1. para cada serie guarda las últimas `max(LAGS)` ventas en una fila de una
+   matriz (`n_series x 12`), rellenando con la media de la serie si es más
+   corta, igual que `pipeline.features.next_period_features`;
+2. en cada paso construye la matriz de características de todas las series
+   (`lag_k` son columnas de la matriz de ventas, `rolling_mean_3` la media de
+   las tres últimas, `year` y `month_1..12` los del mes objetivo) y predice;
+3. desplaza la matriz una columna y escribe la predicción como nueva última
+   venta, que pasa a ser `lag_1` del paso siguiente (y `lag_2..12` se desplazan).
+
+`event_name_1`, `snap` y `sell_price` se mantienen en el último valor conocido
+(como en `next_period_features`). Con los modelos por serie hay una llamada a
+`predict` por modelo y paso; con el modelo global (`pipeline.global_model`) hay
+una sola llamada por paso para todas las series.
+
+Uso desde la línea de comandos:
+
+    python -m pipeline.horizon --horizon 12 --stores CA_1
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FEATURE_COLUMNS, LAGS, ROLLING_WINDOW, sort_series, series_layout
+from pipeline.forecast import _select_pairs, load_history
+from pipeline.paths import CSV_MODEL_DIR, PROCESSED_DATA_PATH
+
+MAX_HORIZON = 12
+EXOG_COLUMNS = ["event_name_1", "snap", "sell_price"]
+PATH_COLUMNS = ["item_id", "store_id", "step", "month", "predicted_sales", "model_version"]
+
+
+def initial_state(history, period_col="month", depth=max(LAGS)):
+    """Estado de partida de la recursión para todas las series de `history`.
+
+    Devuelve `(keys, sales, exog, last_period)`: `keys` es un DataFrame con
+    `item_id` y `store_id` (una fila por serie), `sales` la matriz
+    `n_series x depth` con las últimas ventas (la última columna es el último
+    mes), `exog` la matriz de `EXOG_COLUMNS` del último mes y `last_period`
+    el último mes de cada serie.
+    """
+    history = sort_series(history, period_col)
+    starts, lengths, group, position = series_layout(history)
+    last = starts + lengths - 1
+    values = history["sales"].to_numpy(dtype=np.float64)
+    series_mean = np.bincount(group, weights=values) / lengths
+
+    # Columna de cada fila en la matriz: las últimas `depth` filas de cada serie, alineadas a la derecha
+    sales = np.repeat(series_mean[:, None], depth, axis=1)
+    column = depth - lengths[group] + position
+    keep = column >= 0
+    sales[group[keep], column[keep]] = values[keep]
+
+    keys = history.loc[last, ["item_id", "store_id"]].reset_index(drop=True)
+    exog = history.loc[last, EXOG_COLUMNS].to_numpy(dtype=np.float64)
+    last_period = pd.DatetimeIndex(pd.to_datetime(history[period_col].to_numpy()[last]))
+    return keys, sales, exog, last_period
+
+
+def step_features(sales, exog, periods, lags=LAGS, rolling_window=ROLLING_WINDOW):
+    """Matriz float32 de características (orden de `FEATURE_COLUMNS`) de un paso para todas las series.
+
+    `periods` es el mes objetivo de cada serie.
+    """
+    months = np.asarray(periods.month) - 1
+    return np.column_stack(
+        [exog]
+        + [sales[:, -lag] for lag in lags]
+        + [sales[:, -rolling_window:].mean(axis=1), np.asarray(periods.year, dtype=np.float64)]
+        + [np.eye(12, dtype=np.float64)[months]]
+    ).astype(np.float32)
+
+
+def recursive_forecast(history, horizon=MAX_HORIZON, pairs=None, registry=None, load_model=None, global_model=None,
+                       period_col="month"):
+    """Predicciones de los `horizon` meses siguientes al último de cada serie (o de `pairs`).
+
+    Con `global_model` (un `GlobalXGBModel`) se predicen todas las series en
+    una llamada por paso; si no, se usan los modelos por serie de
+    `load_model(item_id, store_id)` (por defecto `registry.load_predictor`).
+    Las series sin modelo no aparecen. Devuelve una fila por serie y paso con
+    las columnas de `PATH_COLUMNS`.
+    """
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"El horizonte debe estar entre 1 y {MAX_HORIZON} meses.")
+    if global_model is None and registry is None and load_model is None:
+        from pipeline.registry import open_registry
+
+        registry = open_registry()
+
+    history = _select_pairs(history, pairs)
+    if history.empty:
+        return pd.DataFrame(columns=PATH_COLUMNS)
+    keys, sales, exog, periods = initial_state(history, period_col)
+
+    if global_model is None:
+        load_model = load_model or registry.load_predictor
+        models = [load_model(item_id, store_id) for item_id, store_id in zip(keys["item_id"], keys["store_id"])]
+        available = np.array([model is not None for model in models], dtype=bool)
+        keys, sales, exog, periods = keys[available].reset_index(drop=True), sales[available], exog[available], \
+            periods[available]
+        models = [model for model in models if model is not None]
+    n = len(keys)
+
+    predicted = np.empty((horizon, n))
+    months = np.empty((horizon, n), dtype="datetime64[ns]")
+    for step in range(horizon):
+        periods = periods + pd.offsets.MonthBegin(1)
+        X = step_features(sales, exog, periods)
+        if global_model is not None:
+            frame = pd.DataFrame(X, columns=FEATURE_COLUMNS)
+            frame[["item_id", "store_id"]] = keys.to_numpy()
+            values = global_model.predict(frame)
+        else:
+            values = np.expm1(np.array([model.predict(X[i:i + 1])[0] for i, model in enumerate(models)]))
+        values = np.maximum(values, 0.0)
+        predicted[step] = values
+        months[step] = periods.to_numpy()
+        # La predicción pasa a ser la última venta conocida (lag_1 del paso siguiente)
+        sales[:, :-1] = sales[:, 1:]
+        sales[:, -1] = values
+
+    out = pd.DataFrame({
+        "item_id": np.tile(keys["item_id"].to_numpy(), horizon),
+        "store_id": np.tile(keys["store_id"].to_numpy(), horizon),
+        "step": np.repeat(np.arange(1, horizon + 1), n),
+        period_col: months.reshape(-1),
+        "predicted_sales": predicted.reshape(-1),
+    })
+    if registry is not None and global_model is None:
+        versions = {
+            (item_id, store_id): registry.entry(item_id, store_id)["version"]
+            for item_id, store_id in zip(keys["item_id"], keys["store_id"]) if (item_id, store_id) in registry
+        }
+        out["model_version"] = [versions.get(key) for key in zip(out["item_id"], out["store_id"])]
+    else:
+        out["model_version"] = None
+    return out.sort_values(["item_id", "store_id", "step"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predicción recursiva a varios meses para pares producto-tienda.")
+    parser.add_argument("--horizon", type=int, default=MAX_HORIZON, help=f"Meses a predecir (1-{MAX_HORIZON})")
+    parser.add_argument("--items", nargs="*", help="Productos (por defecto, todos)")
+    parser.add_argument("--stores", nargs="*", help="Tiendas (por defecto, todas)")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH)
+    parser.add_argument("--out", default=None, help="CSV de salida")
+    args = parser.parse_args()
+
+    history = load_history(args.data)
+    if args.items:
+        history = history[history["item_id"].isin(args.items)]
+    if args.stores:
+        history = history[history["store_id"].isin(args.stores)]
+    path = recursive_forecast(history, args.horizon)
+    out = args.out or os.path.join(CSV_MODEL_DIR, f"recursive_forecast_h{args.horizon}.csv")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    path.to_csv(out, index=False)
+    print(f"{path[['item_id', 'store_id']].drop_duplicates().shape[0]} series x {args.horizon} meses guardadas en {out}")
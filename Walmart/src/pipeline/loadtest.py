@@ -0,0 +1,116 @@
+"""Prueba de carga del servicio de predicción (`pipeline.service`).
+
+Lanza `clients` clientes concurrentes (hilos) que piden predicciones con
+`GET /forecast` (una clave) o `POST /forecast` (`--keys-per-request` claves)
+durante un número fijo de peticiones, y mide la latencia de cada petición vista
+desde el cliente. Devuelve p50/p99 y el rendimiento (peticiones y claves por
+segundo), junto con las métricas del propio servicio (`/metrics`).
+
+Sin `--url`, arranca el servicio en el mismo proceso en un puerto libre:
+
+    python -m pipeline.loadtest --clients 16 --requests 100 --month 2016-05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+import numpy as np
+
+from pipeline.service import BATCH_WINDOW
+
+
+def _get_json(url, payload=None):
+    if payload is None:
+        request = Request(url)
+    else:
+        request = Request(url, data=json.dumps(payload).encode(), headers={"Content-Type": "application/json"})
+    with urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_load_test(url, pairs, month, clients=16, requests_per_client=100, keys_per_request=1, seed=42):
+    """Mide la latencia de `clients` clientes concurrentes contra el servicio en `url`.
+
+    `pairs` es la lista de (item_id, store_id) de la que cada cliente elige
+    claves al azar. Devuelve un diccionario con las latencias (ms) y el
+    rendimiento observado.
+    """
+    latencies = [[] for _ in range(clients)]
+    failures = [0] * clients
+    barrier = threading.Barrier(clients + 1)
+
+    def client(i):
+        rng = random.Random(seed + i)
+        barrier.wait()
+        for _ in range(requests_per_client):
+            sample = [rng.choice(pairs) for _ in range(keys_per_request)]
+            start = time.perf_counter()
+            try:
+                if keys_per_request == 1:
+                    item_id, store_id = sample[0]
+                    query = urlencode({"item_id": item_id, "store_id": store_id, "month": month})
+                    _get_json(f"{url}/forecast?{query}")
+                else:
+                    keys = [{"item_id": item_id, "store_id": store_id, "month": month} for item_id, store_id in sample]
+                    _get_json(f"{url}/forecast", {"keys": keys})
+            except OSError:
+                failures[i] += 1
+                continue
+            latencies[i].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    observed = np.concatenate([np.array(client_latencies) for client_latencies in latencies]) * 1000
+    completed = len(observed)
+    return {
+        "clients": clients,
+        "keys_per_request": keys_per_request,
+        "requests": completed,
+        "failures": sum(failures),
+        "elapsed_s": round(elapsed, 3),
+        "latency_p50_ms": round(float(np.percentile(observed, 50)), 3) if completed else None,
+        "latency_p99_ms": round(float(np.percentile(observed, 99)), 3) if completed else None,
+        "requests_per_s": round(completed / elapsed, 2),
+        "keys_per_s": round(completed * keys_per_request / elapsed, 2),
+        "service": _get_json(f"{url}/metrics"),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prueba de carga del servicio de predicción.")
+    parser.add_argument("--url", default=None, help="URL del servicio (por defecto, se arranca en este proceso)")
+    parser.add_argument("--month", default="2016-05", help="Mes de las predicciones")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="Peticiones por cliente")
+    parser.add_argument("--keys-per-request", type=int, default=1)
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW,
+                        help="Ventana de agrupación del servicio arrancado en este proceso")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        from pipeline.service import ForecastServer
+
+        server = ForecastServer(port=0, batch_window=args.batch_window).start()
+        url = server.url
+    try:
+        from pipeline.registry import open_registry
+
+        pairs = [(entry["item_id"], entry["store_id"]) for entry in open_registry().models.values()]
+        result = run_load_test(url, pairs, args.month, args.clients, args.requests, args.keys_per_request)
+    finally:
+        if server is not None:
+            server.stop()
+    print(json.dumps(result, indent=2))
@@ -0,0 +1,215 @@
+"""LSTM multiserie para las ventas diarias (línea base de deep learning).
+
+`lstm_1p_10s_daily.ipynb` entrenaba un LSTM para un solo producto y tienda:
+las ventanas se construían con un bucle `for` y `list.append`, y la predicción
+de 30 días llamaba a `model.predict` una vez por día reconstruyendo la ventana
+con `np.append`. Aquí:
+
+- `SeriesPanel` guarda todas las series en un único array float32 contiguo
+  (escalado min-max por serie con los datos de entrenamiento) y las ventanas
+  son vistas con strides (`sliding_window_view`) sobre ese array, sin copiarlo;
+- las ventanas de entrenamiento y validación se identifican solo por su
+  posición de inicio (`window_starts`); el `tf.data.Dataset` de
+  `make_dataset` baraja esas posiciones de todas las series y reúne cada lote
+  con un `gather`, de modo que solo se materializa el lote en curso;
+- el modelo predice los `horizon` días de una vez (salida densa de tamaño
+  `horizon`) y se entrena con early stopping sobre la validación (los últimos
+  días antes del periodo de prueba de cada serie);
+- `forecast_lstm` predice el horizonte completo de todas las series en una sola
+  llamada a `predict`.
+
+TensorFlow solo se importa al construir el dataset o el modelo.
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_CONFIG = {
+    "window": 30,          # días de entrada
+    "horizon": 30,         # días que se predicen de una vez
+    "val_days": 60,        # días antes del periodo de prueba reservados para validación
+    "units": 64,
+    "activation": "relu",
+    "batch_size": 256,
+    "epochs": 500,
+    "patience": 20,
+    "learning_rate": 1e-3,
+    "seed": 42,
+}
+
+
+class SeriesPanel:
+    """Todas las series diarias en un array contiguo, con escalado min-max por serie.
+
+    Las últimas `holdout` observaciones de cada serie son el periodo de
+    prueba: no se usan para el escalado ni para entrenar.
+    """
+
+    def __init__(self, df, holdout, period_col="date", value_col="sales"):
+        df = df.sort_values(["item_id", "store_id", period_col], kind="stable").reset_index(drop=True)
+        codes = df.groupby(["item_id", "store_id"], sort=False, observed=True).ngroup().to_numpy()
+        new_series = np.ones(len(df), dtype=bool)
+        new_series[1:] = codes[1:] != codes[:-1]
+        self.starts = np.flatnonzero(new_series)
+        self.lengths = np.diff(np.append(self.starts, len(df)))
+        self.keys = df.loc[self.starts, ["item_id", "store_id"]].reset_index(drop=True)
+        self.periods = pd.to_datetime(df[period_col]).to_numpy()
+        self.holdout = holdout
+        self.raw = df[value_col].to_numpy(dtype=np.float32)
+
+        # Mínimo y máximo de la parte de entrenamiento de cada serie (reduceat sobre [inicio, fin))
+        train_end = self.starts + np.maximum(self.lengths - holdout, 1)
+        bounds = np.column_stack([self.starts, train_end]).ravel()
+        padded = np.append(self.raw, np.float32(0))
+        self.low = np.minimum.reduceat(padded, bounds)[::2]
+        self.scale = np.maximum.reduceat(padded, bounds)[::2] - self.low
+        self.scale[self.scale == 0] = 1.0
+        series = np.repeat(np.arange(len(self.starts)), self.lengths)
+        self.values = (self.raw - self.low[series]) / self.scale[series]
+
+    def __len__(self):
+        return len(self.starts)
+
+    def windows(self, size):
+        """Vista (sin copia) de todas las ventanas de `size` valores consecutivos del array."""
+        return sliding_window_view(self.values, size)
+
+    def inverse(self, scaled, series=None):
+        """Deshace el escalado de una matriz `n_series x pasos` (o de las series `series`)."""
+        series = np.arange(len(self)) if series is None else np.asarray(series)
+        return scaled * self.scale[series, None] + self.low[series, None]
+
+
+def window_starts(panel, window, horizon, first_target, last_target):
+    """Posiciones (en el array del panel) de las ventanas cuyo objetivo cae en un tramo de cada serie.
+
+    `first_target` y `last_target` son, por serie, el primer y el último+1
+    índice (relativo a la serie) permitidos para los `horizon` días
+    objetivo. Las ventanas nunca cruzan de una serie a otra.
+    """
+    first = np.maximum(np.asarray(first_target) - window, 0)
+    last = np.asarray(last_target) - window - horizon  # inclusive
+    counts = np.maximum(last - first + 1, 0)
+    offsets = np.repeat(panel.starts + first - np.cumsum(counts) + counts, counts)
+    return offsets + np.arange(counts.sum())
+
+
+def split_starts(panel, window, horizon, val_days):
+    """Inicios de las ventanas de entrenamiento y de validación.
+
+    Para cada serie, los últimos `panel.holdout` días son de prueba; los
+    `val_days` anteriores, de validación, y el resto, de entrenamiento.
+    """
+    test_start = panel.lengths - panel.holdout
+    val_start = np.maximum(test_start - val_days, 0)
+    train = window_starts(panel, window, horizon, np.zeros_like(val_start), val_start)
+    val = window_starts(panel, window, horizon, val_start, test_start)
+    return train, val
+
+
+def gather_windows(panel, starts, window, horizon):
+    """Entradas `(n, window, 1)` y objetivos `(n, horizon)` de las ventanas de `starts` (solo se copian esas)."""
+    batch = panel.windows(window + horizon)[starts]
+    return batch[:, :window, None], batch[:, window:]
+
+
+def make_dataset(panel, starts, window, horizon, batch_size, shuffle=True, seed=42):
+    """`tf.data.Dataset` de lotes `(X, y)` que recorre las ventanas de `starts` de todas las series.
+
+    El dataset solo contiene las posiciones de inicio; cada lote se reúne con
+    `tf.gather` sobre el array del panel.
+    """
+    import tensorflow as tf
+
+    values = tf.constant(panel.values)
+    offsets = tf.range(window + horizon, dtype=tf.int64)
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(starts, dtype=np.int64))
+    if shuffle:
+        dataset = dataset.shuffle(len(starts), seed=seed, reshuffle_each_iteration=True)
+
+    def to_batch(batch_starts):
+        batch = tf.gather(values, batch_starts[:, None] + offsets)
+        return batch[:, :window, None], batch[:, window:]
+
+    return dataset.batch(batch_size).map(to_batch, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+
+def build_model(window, horizon, units=64, activation="relu", learning_rate=1e-3):
+    """LSTM de una capa con salida densa de `horizon` días."""
+    import tensorflow as tf
+
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input(shape=(window, 1)),
+        tf.keras.layers.LSTM(units, activation=activation),
+        tf.keras.layers.Dense(horizon),
+    ])
+    model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate), loss="mse")
+    return model
+
+
+def train_lstm(df, config=None, verbose=1, period_col="date", value_col="sales"):
+    """Entrena un LSTM con todas las series de `df` (`item_id`, `store_id`, `period_col`, `value_col`).
+
+    Devuelve `(model, panel, history)`; el periodo de prueba de cada serie son
+    sus últimos `config['horizon']` días.
+    """
+    import tensorflow as tf
+
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    window, horizon = config["window"], config["horizon"]
+    tf.keras.utils.set_random_seed(config["seed"])
+
+    panel = SeriesPanel(df, holdout=horizon, period_col=period_col, value_col=value_col)
+    train, val = split_starts(panel, window, horizon, config["val_days"])
+    if len(train) == 0 or len(val) == 0:
+        raise ValueError("Las series son demasiado cortas para la ventana, el horizonte y la validación elegidos.")
+
+    model = build_model(window, horizon, config["units"], config["activation"], config["learning_rate"])
+    history = model.fit(
+        make_dataset(panel, train, window, horizon, config["batch_size"], seed=config["seed"]),
+        validation_data=make_dataset(panel, val, window, horizon, config["batch_size"], shuffle=False),
+        epochs=config["epochs"],
+        callbacks=[tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=config["patience"],
+                                                    restore_best_weights=True)],
+        verbose=verbose,
+    )
+    return model, panel, history
+
+
+def _predict_from(model, panel, ends, window, batch_size):
+    # Predicción (en unidades) del horizonte que sigue a la posición `ends` de cada serie, en una llamada
+    X = panel.windows(window)[panel.starts + ends - window][:, :, None]
+    return panel.inverse(model.predict(X, batch_size=batch_size, verbose=0))
+
+
+def evaluate_holdout(model, panel, window=DEFAULT_CONFIG["window"], batch_size=DEFAULT_CONFIG["batch_size"]):
+    """Predicción del periodo de prueba de todas las series frente a las ventas reales.
+
+    Devuelve una fila por serie y día con `item_id`, `store_id`, `date`,
+    `real_sales` y `predicted_sales`.
+    """
+    horizon = panel.holdout
+    ends = panel.lengths - horizon
+    predicted = _predict_from(model, panel, ends, window, batch_size)[:, :horizon]
+    rows = (panel.starts + ends)[:, None] + np.arange(horizon)
+    return pd.DataFrame({
+        "item_id": np.repeat(panel.keys["item_id"].to_numpy(), horizon),
+        "store_id": np.repeat(panel.keys["store_id"].to_numpy(), horizon),
+        "date": panel.periods[rows].ravel(),
+        "real_sales": panel.raw[rows].ravel(),
+        "predicted_sales": predicted.ravel(),
+    })
+
+
+def forecast_lstm(model, panel, window=DEFAULT_CONFIG["window"], batch_size=DEFAULT_CONFIG["batch_size"]):
+    """Predicción de los días siguientes al último de cada serie, para todas las series en una llamada."""
+    predicted = _predict_from(model, panel, panel.lengths, window, batch_size)
+    horizon = predicted.shape[1]
+    last = panel.periods[panel.starts + panel.lengths - 1]
+    dates = last[:, None] + np.arange(1, horizon + 1) * np.timedelta64(1, "D")
+    return pd.DataFrame({
+        "item_id": np.repeat(panel.keys["item_id"].to_numpy(), horizon),
+        "store_id": np.repeat(panel.keys["store_id"].to_numpy(), horizon),
+        "date": dates.ravel(),
+        "predicted_sales": predicted.ravel(),
+    })
@@ -0,0 +1,206 @@
+"""Almacén de macrodatos por estado y periodo con una sola unión contra las ventas.
+
+`data_xgboost.ipynb` pasaba a formato largo cada fichero de `data/raw/macrodata`
+(`personal_income`, `population_density`, `population_growth`,
+`pib_por_estados`, `riqueza_per_capita` y el WTI) y hacía un
+`final_data.merge(...)` distinto para cada uno, copiando el DataFrame de ventas
+completo en cada paso; el del WTI era además un `outer` por fecha que añadía
+filas sin ventas. Aquí:
+
+- `build_macro_table` normaliza todos los ficheros una sola vez en una tabla
+  compacta con una fila por estado y periodo (mes o día): los datos anuales se
+  repiten en los meses de su año, los mensuales van a su mes y el WTI diario se
+  completa con la media de su mes, como en el notebook. Los huecos (los meses
+  posteriores al último dato de cada fichero) se rellenan con el último valor
+  conocido;
+- `load_macro_table` guarda la tabla en `data/cache/macro`, con una clave que
+  depende de la frecuencia y de los ficheros de origen;
+- `attach_macro` añade todas las columnas a las filas de ventas con un solo
+  acceso indexado por (código de estado, periodo): sin `merge`, sin filas nuevas
+  y sin copiar las columnas existentes del DataFrame de ventas.
+
+Uso desde la línea de comandos:
+
+    python -m pipeline.macro --freq MS
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.paths import MACRO_CACHE_DIR, MACRODATA_DIR
+
+MACRO_VERSION = 1
+
+# Nombre completo -> siglas de los estados con tiendas de Walmart en el M5
+STATE_ABBREV = {"California": "CA", "Texas": "TX", "Wisconsin": "WI"}
+SPANISH_MONTHS = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+
+# Columna resultante -> (fichero, columna de estado, frecuencia de las columnas `<prefijo>_<año>`)
+MACRO_SOURCES = {
+    "pi_mean": ("personal_income.csv", "State", "annual"),
+    "poblacion": ("population_density.csv", "State", "annual"),
+    "Crecimiento_p": ("population_growth.csv", "State", "annual"),
+    "pib_por_estado": ("pib_por_estados.csv", "state_id", "monthly"),
+    "riqueza_per_capita": ("riqueza_per_capita.csv", "GeoName", "monthly"),
+}
+WTI_FILE = "wti_crude_oil.csv"
+MACRO_COLUMNS = list(MACRO_SOURCES) + ["wti"]
+
+# Periodo de la tabla: 'MS' (mes, el WTI es la media mensual) o 'D' (día, el WTI es el cierre del día)
+FREQUENCIES = {"MS": "M", "D": "D"}
+
+
+def _read_state_source(path, state_col, frequency):
+    # Fichero ancho (un estado por fila, una columna por año o por mes) -> (estado, mes, valor)
+    wide = pd.read_csv(path)
+    states = wide[state_col].astype(str).str.strip()
+    wide[state_col] = states.map(STATE_ABBREV).fillna(states)
+    wide = wide[wide[state_col].isin(STATE_ABBREV.values())]
+    long = wide.melt(id_vars=state_col, var_name="column", value_name="value")
+    year = long["column"].str.extract(r"(\d{4})$", expand=False).astype(int)
+    if frequency == "annual":
+        # Un valor por año: se repite en sus 12 meses
+        long = long.loc[long.index.repeat(12)]
+        year = year.loc[long.index]
+        month = np.tile(np.arange(1, 13), len(long) // 12)
+    else:
+        month = long["column"].str.extract(r"^([a-z]+)_", expand=False).map(SPANISH_MONTHS).to_numpy()
+    return pd.DataFrame({
+        "state_id": long[state_col].to_numpy(),
+        "period": pd.to_datetime({"year": year.to_numpy(), "month": month, "day": 1}),
+        "value": long["value"].to_numpy(dtype=np.float64),
+    })
+
+
+def _read_wti(path):
+    # Cierre diario del WTI (fechas con formato 'May 20, 2016')
+    wti = pd.read_csv(path, usecols=["Date", "Close"])
+    return pd.Series(wti["Close"].to_numpy(dtype=np.float64),
+                     index=pd.to_datetime(wti["Date"], format="%b %d, %Y")).sort_index()
+
+
+def _ffill(values):
+    # Rellenar hacia delante a lo largo del eje 0 (periodos) de un array (periodos, ...)
+    valid = ~np.isnan(values)
+    index = np.where(valid, np.arange(len(values)).reshape(-1, *[1] * (values.ndim - 1)), 0)
+    np.maximum.accumulate(index, axis=0, out=index)
+    return np.take_along_axis(values, index, axis=0)
+
+
+def build_macro_table(freq="MS", macro_dir=MACRODATA_DIR):
+    """Tabla con una fila por estado y periodo y una columna por macrodato (`MACRO_COLUMNS`).
+
+    `freq` es 'MS' (periodo = primer día del mes) o 'D' (periodo = día). Los
+    periodos van desde el primer mes hasta el último de todos los ficheros y las
+    filas salen ordenadas por estado y periodo.
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Frecuencia no soportada: {freq}. Opciones: {list(FREQUENCIES)}")
+    sources = {column: _read_state_source(os.path.join(macro_dir, file), state_col, frequency)
+               for column, (file, state_col, frequency) in MACRO_SOURCES.items()}
+    wti = _read_wti(os.path.join(macro_dir, WTI_FILE))
+
+    states = sorted(STATE_ABBREV.values())
+    first = min([source["period"].min() for source in sources.values()] + [wti.index.min().to_period("M").start_time])
+    last = max([source["period"].max() for source in sources.values()] + [wti.index.max().to_period("M").start_time])
+    months = pd.date_range(first, last, freq="MS")
+
+    # (mes, estado, columna) con los datos de los ficheros por estado; el WTI es nacional
+    values = np.full((len(months), len(states), len(MACRO_COLUMNS)), np.nan)
+    for k, source in enumerate(sources.values()):
+        rows = months.get_indexer(source["period"])
+        cols = pd.Index(states).get_indexer(source["state_id"])
+        values[rows, cols, k] = source["value"].to_numpy()
+    monthly_wti = wti.groupby(wti.index.to_period("M").start_time).mean()
+    values[months.get_indexer(monthly_wti.index), :, -1] = monthly_wti.to_numpy()[:, None]
+
+    if freq == "D":
+        periods = pd.date_range(first, last + pd.offsets.MonthEnd(0), freq="D")
+        month_of_day = months.get_indexer(periods.to_period("M").start_time)
+        values = values[month_of_day]
+        # Cierre del día cuando existe; si no (fines de semana, festivos...), la media del mes
+        daily = wti.groupby(level=0).last().reindex(periods).to_numpy()
+        values[:, :, -1] = np.where(np.isnan(daily), values[:, 0, -1], daily)[:, None]
+    else:
+        periods = months
+
+    values = _ffill(values)
+    table = pd.DataFrame(values.transpose(1, 0, 2).reshape(-1, len(MACRO_COLUMNS)), columns=MACRO_COLUMNS)
+    table.insert(0, "state_id", np.repeat(states, len(periods)))
+    table.insert(1, "period", np.tile(periods.to_numpy(), len(states)))
+    return table
+
+
+def source_fingerprint(macro_dir=MACRODATA_DIR):
+    """Huella de los ficheros de macrodatos (nombre, tamaño y fecha de modificación)."""
+    digest = hashlib.sha256()
+    for file in sorted([source[0] for source in MACRO_SOURCES.values()] + [WTI_FILE]):
+        stat = os.stat(os.path.join(macro_dir, file))
+        digest.update(f"{file}|{stat.st_size}|{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def load_macro_table(freq="MS", macro_dir=MACRODATA_DIR, cache_dir=MACRO_CACHE_DIR, overwrite=False):
+    """`build_macro_table` guardada en caché (Parquet con escritura atómica).
+
+    La clave depende de la frecuencia y de la huella de los ficheros, así que
+    la tabla se vuelve a construir sola cuando cambia algún fichero de macrodatos.
+    """
+    payload = json.dumps({"source": source_fingerprint(macro_dir), "freq": freq, "version": MACRO_VERSION},
+                         sort_keys=True)
+    path = os.path.join(cache_dir, f"macro-{freq}-{hashlib.sha256(payload.encode()).hexdigest()[:16]}.parquet")
+    if os.path.exists(path) and not overwrite:
+        return pd.read_parquet(path)
+    table = build_macro_table(freq, macro_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    table.to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+    return table
+
+
+def attach_macro(df, freq="D", date_col="date", state_col="state_id", columns=None, table=None,
+                 macro_dir=MACRODATA_DIR, cache_dir=MACRO_CACHE_DIR):
+    """Añade a `df` las columnas de macrodatos de su estado y periodo con un solo acceso indexado.
+
+    `freq` es la frecuencia de la tabla ('D' para ventas diarias, 'MS' para
+    mensuales) y `table` permite pasar una tabla ya cargada. Las fechas
+    posteriores al último periodo de la tabla toman su último valor; las
+    anteriores al primero y los estados desconocidos quedan a NaN. Devuelve un
+    DataFrame nuevo con las mismas filas y en el mismo orden que `df`.
+    """
+    if table is None:
+        table = load_macro_table(freq, macro_dir, cache_dir)
+    columns = list(columns or MACRO_COLUMNS)
+    states = pd.Index(table["state_id"].unique())
+    periods = pd.DatetimeIndex(table.loc[table["state_id"] == states[0], "period"])
+    n_periods = len(periods)
+
+    unit = FREQUENCIES[freq]
+    dates = np.asarray(pd.to_datetime(df[date_col]), dtype=f"datetime64[{unit}]")
+    offset = (dates - periods[0].to_datetime64().astype(f"datetime64[{unit}]")).astype(np.int64)
+    codes = states.get_indexer(df[state_col].astype(str))
+    valid = (codes >= 0) & (offset >= 0) & ~np.isnat(dates)
+    key = np.where(valid, codes * n_periods + np.minimum(offset, n_periods - 1), 0)
+
+    gathered = table[columns].to_numpy(dtype=np.float64).take(key, axis=0)
+    gathered[~valid] = np.nan
+    return df.assign(**{column: gathered[:, k] for k, column in enumerate(columns)})
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Construye la tabla de macrodatos por estado y periodo.")
+    parser.add_argument("--freq", choices=list(FREQUENCIES), default="MS")
+    parser.add_argument("--macro-dir", default=MACRODATA_DIR)
+    parser.add_argument("--overwrite", action="store_true", help="Reconstruir aunque exista la caché")
+    args = parser.parse_args()
+
+    table = load_macro_table(args.freq, args.macro_dir, overwrite=args.overwrite)
+    print(f"{len(table)} filas ({table['state_id'].nunique()} estados x {table['period'].nunique()} periodos)")
+    print(table.head(13).to_string(index=False))
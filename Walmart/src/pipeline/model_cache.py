@@ -0,0 +1,221 @@
+"""Caché de modelos con presupuesto de memoria, desalojo LRU/LFU y métricas.
+
+La app guardaba cada modelo con `@st.cache_resource`, sin límite: cada par
+(producto, tienda) que alguien consultaba se quedaba en memoria mientras viviera
+el servidor. `ModelCache`:
+
+- estima lo que ocupa cada modelo al cargarlo (con su longitud en el
+  manifiesto del registro, `registry_footprint`, o serializándolo,
+  `model_footprint`) y mantiene la suma por debajo de `max_bytes`,
+  desalojando el menos usado recientemente (`policy='lru'`) o el de menos
+  accesos (`policy='lfu'`);
+- cuenta aciertos, fallos, desalojos y el tiempo de carga (`stats`);
+- guarda los accesos por modelo (`usage_path`) para que, al arrancar, `warm`
+  cargue los modelos más consultados (`hottest`).
+
+Se llama como `cache(item_id, store_id)`, igual que las funciones `load_model`
+que reciben `pipeline.forecast.forecast_batch` y
+`pipeline.forecast_store.refresh_forecasts`.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from pipeline.registry import model_key
+
+CACHE_POLICIES = ("lru", "lfu")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Memoria residente de un booster cargado frente a su tamaño en UBJSON: cargar los 200
+# modelos (44 MB en UBJSON) aumenta la memoria del proceso en 99 MB
+IN_MEMORY_FACTOR = 2.25
+USAGE_SAVE_EVERY = 100  # accesos entre escrituras del fichero de uso
+
+
+def model_footprint(model, item_id=None, store_id=None):
+    """Bytes aproximados que ocupa en memoria un modelo cargado.
+
+    Para boosters de XGBoost (o `BoosterPredictor`) es el tamaño del modelo
+    serializado por `IN_MEMORY_FACTOR`. Serializa el modelo para medirlo; con
+    un registro es más barato `registry_footprint`.
+    """
+    booster = getattr(model, "booster", model)
+    if hasattr(booster, "get_booster"):
+        booster = booster.get_booster()
+    return int(len(booster.save_raw("ubj")) * IN_MEMORY_FACTOR)
+
+
+def registry_footprint(registry):
+    """`sizeof` que estima la huella con la longitud guardada en el manifiesto del registro, sin serializar."""
+    def sizeof(model, item_id, store_id):
+        return int(registry.entry(item_id, store_id)["length"] * IN_MEMORY_FACTOR)
+
+    return sizeof
+
+
+def load_usage(path):
+    """Accesos por modelo guardados en `path` (Counter de claves 'item|store'); vacío si no existe."""
+    if not path or not os.path.exists(path):
+        return Counter()
+    with open(path) as f:
+        return Counter(json.load(f))
+
+
+class ModelCache:
+    """Caché de modelos acotada en bytes.
+
+    `loader(item_id, store_id)` carga un modelo (p. ej.
+    `ModelRegistry.load_predictor`); `sizeof(model, item_id, store_id)` mide
+    su huella en bytes (`registry_footprint(registry)` para los modelos de un
+    registro). Un modelo que por sí solo supera `max_bytes` se devuelve sin
+    guardarlo.
+    """
+
+    def __init__(self, loader, max_bytes=DEFAULT_MAX_BYTES, policy="lru", sizeof=model_footprint, usage_path=None):
+        if policy not in CACHE_POLICIES:
+            raise ValueError(f"Política de caché no soportada: {policy}. Opciones: {CACHE_POLICIES}")
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.policy = policy
+        self.sizeof = sizeof
+        self.usage_path = usage_path
+        self.usage = load_usage(usage_path)
+        self._entries = OrderedDict()  # clave -> (modelo, bytes), del menos al más reciente
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uncached = 0
+        self.loads = 0
+        self.load_seconds = 0.0
+        self._unsaved = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return model_key(*key) in self._entries
+
+    def __call__(self, item_id, store_id):
+        return self.get(item_id, store_id)
+
+    def _touch(self, key):
+        self.usage[key] += 1
+        self._unsaved += 1
+        if self.usage_path and self._unsaved >= USAGE_SAVE_EVERY:
+            self._save_usage()
+
+    def _victim(self):
+        if self.policy == "lru":
+            return next(iter(self._entries))
+        # LFU: el de menos accesos; a igualdad, el menos reciente (orden del OrderedDict)
+        return min(self._entries, key=lambda key: self.usage[key])
+
+    def _store(self, key, model, size):
+        if size > self.max_bytes:
+            self.uncached += 1
+            return
+        while self._entries and self.bytes + size > self.max_bytes:
+            _, evicted_size = self._entries.pop(self._victim())
+            self.bytes -= evicted_size
+            self.evictions += 1
+        self._entries[key] = (model, size)
+        self.bytes += size
+
+    def get(self, item_id, store_id):
+        """Modelo de la serie, de la caché o cargándolo (y desalojando si hace falta)."""
+        key = model_key(item_id, store_id)
+        with self._lock:
+            self._touch(key)
+            if key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            self.misses += 1
+
+        # La carga se hace fuera del lock para no bloquear los aciertos de otros hilos
+        start = time.perf_counter()
+        model = self.loader(item_id, store_id)
+        elapsed = time.perf_counter() - start
+        size = self.sizeof(model, item_id, store_id) if model is not None else 0
+
+        with self._lock:
+            self.loads += 1
+            self.load_seconds += elapsed
+            if model is None:
+                return None
+            if key in self._entries:  # otro hilo lo cargó a la vez
+                return self._entries[key][0]
+            self._store(key, model, size)
+        return model
+
+    def hottest(self, n=None):
+        """Claves (item_id, store_id) de los modelos más consultados, de más a menos."""
+        return [tuple(key.split("|", 1)) for key, _ in self.usage.most_common(n)]
+
+    def warm(self, keys=None, fill=0.9):
+        """Carga `keys` (por defecto los más consultados) hasta ocupar `fill` del presupuesto.
+
+        La carga previa no cuenta como acierto ni fallo ni como acceso. Devuelve
+        el número de modelos cargados.
+        """
+        loaded = 0
+        for item_id, store_id in (self.hottest() if keys is None else keys):
+            key = model_key(item_id, store_id)
+            if self.bytes >= fill * self.max_bytes:
+                break
+            if key in self._entries:
+                continue
+            start = time.perf_counter()
+            model = self.loader(item_id, store_id)
+            elapsed = time.perf_counter() - start
+            if model is None:
+                continue
+            size = self.sizeof(model, item_id, store_id)
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += elapsed
+                if key in self._entries or self.bytes + size > self.max_bytes:
+                    continue
+                self._store(key, model, size)
+            loaded += 1
+        return loaded
+
+    def _save_usage(self):
+        tmp_path = f"{self.usage_path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.usage_path)), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump(dict(self.usage), f)
+        os.replace(tmp_path, self.usage_path)
+        self._unsaved = 0
+
+    def save_usage(self):
+        """Guarda los accesos por modelo en `usage_path` (escritura atómica)."""
+        if self.usage_path:
+            with self._lock:
+                self._save_usage()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        """Contadores de la caché: tamaño, aciertos, fallos, desalojos y tiempo de carga."""
+        with self._lock:
+            return {
+                "policy": self.policy,
+                "models": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / (self.hits + self.misses), 4) if self.hits + self.misses else 0.0,
+                "evictions": self.evictions,
+                "uncached": self.uncached,
+                "loads": self.loads,
+                "load_seconds": round(self.load_seconds, 4),
+                "mean_load_ms": round(self.load_seconds / self.loads * 1000, 3) if self.loads else 0.0,
+            }
@@ -0,0 +1,203 @@
+"""Modelos en el formato nativo de XGBoost y predicción de baja latencia.
+
+Los `.sav` son pickles de `XGBRegressor` completos: cargarlos arrastra el
+envoltorio de scikit-learn y ata los modelos a versiones concretas de las
+librerías, y `model.predict(DataFrame)` valida el DataFrame en cada llamada
+aunque sea de una sola fila. Este módulo:
+
+- convierte cada modelo a UBJSON (`Booster.save_raw('ubj')`), el formato
+  estable de XGBoost, sin pickle (lo usa `pipeline.registry` con `model_format='ubj'`);
+- carga un `xgboost.Booster` directamente de esos bytes;
+- `BoosterPredictor` predice con `Booster.inplace_predict` sobre un array
+  float32 reservado una sola vez por hilo, sin DMatrix ni DataFrame (la app
+  comparte cada predictor entre todas las sesiones de Streamlit, cada una en
+  su hilo);
+- `benchmark_latency` compara la carga y la predicción con la ruta de joblib
+  para todos los modelos y `check_thread_safety` comprueba que un predictor
+  compartido entre hilos da las mismas predicciones que en serie.
+"""
+import argparse
+import io
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from pipeline.features import FEATURE_COLUMNS
+from pipeline.paths import MODELS_DIR, PROCESSED_DATA_PATH
+from pipeline.schema import read_processed
+
+MODEL_FORMATS = ("joblib", "ubj")
+MODEL_PATTERN = re.compile(r"Final_model_XGBOOST_(.+)_([A-Z]{2}_\d+)\.sav")
+
+
+def to_native_bytes(model):
+    """Bytes UBJSON del booster de un `XGBRegressor` (o de un `Booster`)."""
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    return bytes(booster.save_raw("ubj"))
+
+
+def load_booster(payload, model_format="ubj"):
+    """`xgboost.Booster` a partir de los bytes guardados en `model_format`."""
+    if model_format == "ubj":
+        booster = xgb.Booster()
+        booster.load_model(bytearray(payload))
+    elif model_format == "joblib":
+        booster = joblib.load(io.BytesIO(payload)).get_booster()
+    else:
+        raise ValueError(f"Formato de modelo no soportado: {model_format}. Opciones: {MODEL_FORMATS}")
+    booster.set_param({"nthread": 1})
+    return booster
+
+
+class BoosterPredictor:
+    """Predicción directa con el booster sobre un array float32 reservado de antemano.
+
+    `predict` acepta lo mismo que `XGBRegressor.predict` (un DataFrame con las
+    columnas del modelo o un array 2D en ese orden) y devuelve lo mismo
+    (`log1p` de las ventas). Para una fila copia los valores en el buffer
+    reservado y llama a `inplace_predict`, sin crear DMatrix. El buffer es
+    propio de cada hilo, así que un mismo predictor se puede usar desde varios
+    hilos a la vez.
+    """
+
+    def __init__(self, booster, feature_names=None):
+        self.booster = booster
+        self.feature_names = list(feature_names or booster.feature_names or FEATURE_COLUMNS)
+        self._local = threading.local()
+
+    def _row(self):
+        # Buffer de una fila del hilo actual, reservado la primera vez que ese hilo predice
+        row = getattr(self._local, "row", None)
+        if row is None:
+            row = self._local.row = np.zeros((1, len(self.feature_names)), dtype=np.float32)
+        return row
+
+    def _to_array(self, X):
+        if isinstance(X, pd.DataFrame):
+            return X[self.feature_names].to_numpy(dtype=np.float32)
+        return np.asarray(X, dtype=np.float32)
+
+    def predict_row(self, values):
+        """Predicción de una fila (secuencia de valores en el orden de `feature_names`)."""
+        row = self._row()
+        row[0] = values
+        return float(self.booster.inplace_predict(row)[0])
+
+    def predict(self, X):
+        X = self._to_array(X)
+        if X.shape[0] == 1:
+            row = self._row()
+            row[0] = X[0]
+            X = row
+        return self.booster.inplace_predict(X)
+
+
+def check_thread_safety(predictor, X, threads=8, repeats=3):
+    """Predice cada fila de `X` por separado desde `threads` hilos a la vez y compara con la serie.
+
+    Reproduce varias sesiones de la app usando el mismo predictor. Lanza
+    `AssertionError` si alguna predicción difiere y devuelve el número de
+    predicciones comparadas.
+    """
+    X = predictor._to_array(X)
+    expected = predictor.booster.inplace_predict(X)
+    rows = [i for _ in range(repeats) for i in range(len(X))]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        predicted = np.array(list(pool.map(lambda i: predictor.predict(X[i:i + 1])[0], rows)))
+    wrong = int(np.sum(predicted != expected[rows]))
+    assert not wrong, f"{wrong} de {len(rows)} predicciones difieren al predecir desde varios hilos"
+    return len(rows)
+
+
+def _model_files(models_dir):
+    return sorted(f for f in os.listdir(models_dir) if MODEL_PATTERN.fullmatch(f))
+
+
+def benchmark_latency(models_dir=MODELS_DIR, data_path=PROCESSED_DATA_PATH, repeats=20):
+    """Compara joblib + `XGBRegressor.predict` con UBJSON + `BoosterPredictor` para todos los modelos.
+
+    Para cada `.sav` mide la carga (deserializar el modelo desde bytes en
+    memoria, sin contar la lectura del disco) y la predicción de la última
+    fila de su serie (media de `repeats` llamadas). Devuelve `(detalle,
+    resumen)`: una fila por modelo y una tabla con media, p50 y p99 en
+    milisegundos por ruta, además de la máxima diferencia entre predicciones.
+    """
+    data = read_processed(data_path)
+    last_rows = data.groupby(["item_id", "store_id"], observed=True).tail(1).set_index(["item_id", "store_id"])
+
+    rows = []
+    for filename in _model_files(models_dir):
+        item_id, store_id = MODEL_PATTERN.fullmatch(filename).groups()
+        if (item_id, store_id) not in last_rows.index:
+            continue
+        with open(os.path.join(models_dir, filename), "rb") as f:
+            payload = f.read()
+        X = last_rows.loc[[(item_id, store_id)], FEATURE_COLUMNS]
+
+        start = time.perf_counter()
+        model = joblib.load(io.BytesIO(payload))
+        load_joblib = time.perf_counter() - start
+        native = to_native_bytes(model)
+
+        start = time.perf_counter()
+        predictor = BoosterPredictor(load_booster(native, "ubj"))
+        load_native = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repeats):
+            pred_joblib = model.predict(X)[0]
+        predict_joblib = (time.perf_counter() - start) / repeats
+
+        values = X.to_numpy(dtype=np.float32)[0]
+        start = time.perf_counter()
+        for _ in range(repeats):
+            pred_native = predictor.predict_row(values)
+        predict_native = (time.perf_counter() - start) / repeats
+
+        rows.append({
+            "item_id": item_id, "store_id": store_id,
+            "size_joblib": len(payload), "size_ubj": len(native),
+            "load_joblib_ms": 1000 * load_joblib, "load_ubj_ms": 1000 * load_native,
+            "predict_joblib_ms": 1000 * predict_joblib, "predict_ubj_ms": 1000 * predict_native,
+            "abs_diff": abs(float(pred_joblib) - pred_native),
+        })
+
+    detail = pd.DataFrame(rows)
+    summary = pd.DataFrame({
+        path: {
+            "load_mean_ms": detail[f"load_{path}_ms"].mean(),
+            "load_p99_ms": detail[f"load_{path}_ms"].quantile(0.99),
+            "predict_p50_ms": detail[f"predict_{path}_ms"].median(),
+            "predict_p99_ms": detail[f"predict_{path}_ms"].quantile(0.99),
+            "size_mean_kb": detail[f"size_{path}"].mean() / 1024,
+        }
+        for path in ["joblib", "ubj"]
+    }).T
+    summary["models"] = len(detail)
+    summary["max_abs_diff"] = detail["abs_diff"].max()
+    return detail, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de latencia: joblib frente al formato nativo de XGBoost.")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--check-threads", action="store_true",
+                        help="Comprobar que un predictor compartido entre hilos predice igual que en serie")
+    args = parser.parse_args()
+
+    if args.check_threads:
+        with open(os.path.join(args.models_dir, _model_files(args.models_dir)[0]), "rb") as f:
+            predictor = BoosterPredictor(load_booster(to_native_bytes(joblib.load(f))))
+        X = read_processed(args.data)[FEATURE_COLUMNS].head(2000)
+        print(f"{check_thread_safety(predictor, X)} predicciones idénticas en serie y desde varios hilos")
+    _, summary = benchmark_latency(args.models_dir, args.data, args.repeats)
+    print(summary.round(4).to_string())
@@ -0,0 +1,44 @@
+import os
+
+# Rutas del proyecto calculadas a partir de este fichero, igual que hace
+# Walmart_streamlit.py, para que funcionen desde notebooks, la app o la CLI.
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BASE_DIR = os.path.abspath(os.path.join(SRC_DIR, ".."))
+
+DATA_DIR = os.path.join(BASE_DIR, "data")
+RAW_DIR = os.path.join(DATA_DIR, "raw")
+MACRODATA_DIR = os.path.join(RAW_DIR, "macrodata")
+CSV_MODEL_DIR = os.path.join(DATA_DIR, "csv_model")
+DATA_BASE_DIR = os.path.join(DATA_DIR, "data_base")
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+TOTAL_DATA_PATH = os.path.join(RAW_DIR, "total_data.csv")
+PROCESSED_DATA_PATH = os.path.join(RAW_DIR, "Final_XGBoost_data_processed.csv")
+
+# Dataset columnar (Parquet) particionado por tienda con el contenido de total_data.csv
+SALES_STORE_DIR = os.path.join(DATA_DIR, "sales_store")
+
+# Caché en disco de agregados (diarios, semanales, mensuales y trimestrales)
+AGGREGATES_CACHE_DIR = os.path.join(DATA_DIR, "cache", "aggregates")
+
+# Caché de las series seleccionadas para entrenar (una por huella de agregados y umbrales)
+SELECTION_CACHE_DIR = os.path.join(DATA_DIR, "cache", "selection")
+
+# Caché de la tabla de macrodatos por estado y periodo (una por frecuencia y huella de los ficheros)
+MACRO_CACHE_DIR = os.path.join(DATA_DIR, "cache", "macro")
+
+# Base de datos SQLite con las tablas del M5
+WALMART_DB_PATH = os.path.join(DATA_BASE_DIR, "DB_Walmart")
+
+# Registro empaquetado de los modelos por serie (ficheros .pack + manifest.json)
+REGISTRY_DIR = os.path.join(MODELS_DIR, "registry")
+
+# Base de datos SQLite con la tabla materializada de predicciones
+FORECASTS_DB_PATH = os.path.join(DATA_BASE_DIR, "DB_Forecasts")
+
+# Accesos por modelo que guarda la caché de modelos para precargar los más consultados
+MODEL_USAGE_PATH = os.path.join(MODELS_DIR, "model_usage.json")
+
+# Resultados del benchmark de modelos y línea base para detectar regresiones
+BENCHMARKS_DIR = os.path.join(BASE_DIR, "benchmarks")
+BENCHMARK_BASELINE_PATH = os.path.join(BENCHMARKS_DIR, "baseline.json")
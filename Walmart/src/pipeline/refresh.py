@@ -0,0 +1,246 @@
+"""Actualización mensual incremental: datos, características, modelos y registro.
+
+Al llegar un mes nuevo de ventas se regeneraban `total_data.csv` y los
+agregados mensuales desde cero, se recalculaban todos los lags y se
+reentrenaban todos los modelos con la rejilla completa. `refresh_month` hace
+solo el trabajo que depende del mes nuevo:
+
+1. con `--daily`, las filas diarias del mes se añaden al almacén columnar y a
+   la caché de agregados (`pipeline.aggregation.append_aggregates`), que solo
+   agrega el mes nuevo;
+2. las características de las filas nuevas se calculan con la cola de cada
+   serie (`pipeline.features.extend_features`) y se añaden a
+   `Final_XGBoost_data_processed.csv`;
+3. solo las series con filas nuevas se reajustan, sin búsqueda de
+   hiperparámetros: con `mode='continue'` se añaden `extra_rounds` árboles al
+   booster existente y con `mode='best_params'` se reentrena con los mejores
+   parámetros anteriores (los `best_params` del estado o los del propio modelo);
+4. cada modelo y su estado se escriben de forma atómica (como en
+   `pipeline.training`) y las versiones nuevas se añaden al registro con
+   `pipeline.registry.update_registry`.
+
+El estado de cada serie conserva la huella de configuración y actualiza la de
+los datos, así que `train_all_series` no la vuelve a entrenar; con
+`force=True` se hace el reentrenamiento completo (conviene de vez en cuando,
+porque con `continue` el modelo crece cada mes).
+
+Uso desde la línea de comandos:
+
+    python -m pipeline.refresh --daily ../data/raw/sales_2016_06.csv --mode continue
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FEATURE_COLUMNS, extend_features, sort_series
+from pipeline.paths import MODELS_DIR, PROCESSED_DATA_PATH, REGISTRY_DIR
+from pipeline.registry import MANIFEST_NAME, update_registry
+from pipeline.schema import read_processed
+from pipeline.training import (
+    DEFAULT_CONFIG, _atomic_write, _limit_threads, _state_path, _write_json, data_fingerprint, load_state, model_path,
+)
+
+REFRESH_MODES = ("continue", "best_params")
+DEFAULT_EXTRA_ROUNDS = 20
+
+
+def refit_series(group, previous, state, mode="continue", extra_rounds=DEFAULT_EXTRA_ROUNDS, threads=1,
+                 holdout_last=DEFAULT_CONFIG["holdout_last"]):
+    """Reajusta el modelo `previous` de una serie con su histórico actualizado `group`.
+
+    Con `mode='continue'` se añaden `extra_rounds` árboles al booster de
+    `previous` (mismos parámetros); con 'best_params' se entrena un modelo
+    nuevo con `state['best_params']` (o los parámetros de `previous`). Con
+    `holdout_last` el último mes queda fuera del entrenamiento y se usa para
+    calcular el error, igual que en `pipeline.training.fit_series`. Devuelve
+    `(modelo, métricas)`.
+    """
+    from xgboost import XGBRegressor
+
+    if mode not in REFRESH_MODES:
+        raise ValueError(f"Modo de actualización no válido: {mode}. Opciones: {REFRESH_MODES}")
+    X = group[FEATURE_COLUMNS]
+    y = np.log1p(group["sales"].to_numpy(dtype=np.float64))
+    if holdout_last:
+        X_train, y_train, X_test, y_test = X.iloc[:-1], y[:-1], X.iloc[-1:], y[-1]
+    else:
+        X_train, y_train, X_test, y_test = X, y, None, None
+
+    if mode == "continue":
+        model = XGBRegressor(**{**previous.get_params(), "n_estimators": extra_rounds, "n_jobs": threads})
+        model.fit(X_train, y_train, xgb_model=previous.get_booster())
+    else:
+        params = (state or {}).get("best_params") or previous.get_params()
+        model = XGBRegressor(**{**params, "random_state": DEFAULT_CONFIG["random_state"], "n_jobs": threads})
+        model.fit(X_train, y_train)
+
+    metrics = {"refresh_mode": mode, "rounds": int(model.get_booster().num_boosted_rounds())}
+    if X_test is not None:
+        real = float(np.expm1(y_test))
+        predicted = float(np.expm1(model.predict(X_test)[0]))
+        metrics.update({"real_sales": real, "predicted_sales": predicted, "abs_error": abs(real - predicted)})
+    return model, metrics
+
+
+def _refresh_task(item_id, store_id, group, data_hash, mode, extra_rounds, models_dir, threads):
+    # Trabajo de cada proceso: reajustar, guardar el modelo y después el estado
+    start = time.perf_counter()
+    state = load_state(item_id, store_id, models_dir) or {"item_id": item_id, "store_id": store_id}
+    state.pop("error", None)
+    try:
+        previous = joblib.load(model_path(item_id, store_id, models_dir))
+        model, metrics = refit_series(group, previous, state, mode, extra_rounds, threads)
+        _atomic_write(model_path(item_id, store_id, models_dir), lambda path: joblib.dump(model, path))
+        state.update(metrics, status="ok", data_fingerprint=data_hash, month=str(group["month"].iloc[-1]))
+    except Exception as e:
+        state.update(status="failed", error=f"{type(e).__name__}: {e}")
+    state["seconds"] = round(time.perf_counter() - start, 3)
+    state["finished"] = datetime.now().isoformat(timespec="seconds")
+    _atomic_write(_state_path(item_id, store_id, models_dir), lambda path: _write_json(path, state))
+    return state
+
+
+def append_month(new_monthly, data_path=PROCESSED_DATA_PATH):
+    """Añade al CSV de características las filas nuevas de las series que ya contiene.
+
+    `new_monthly` son los agregados mensuales del periodo nuevo (la salida de
+    `load_aggregates('monthly')` o de `append_aggregates`). Las características
+    se calculan con `extend_features` y el CSV se sustituye de forma atómica.
+    El histórico se lee con `read_processed`, los mismos tipos que usan el
+    entrenamiento y la app, para que las huellas de los datos coincidan.
+    Devuelve `(histórico actualizado, filas nuevas)`.
+    """
+    history = read_processed(data_path)
+    history = history.assign(item_id=history["item_id"].astype(str), store_id=history["store_id"].astype(str))
+    pairs = history[["item_id", "store_id"]].drop_duplicates()
+    new_monthly = new_monthly.assign(
+        item_id=new_monthly["item_id"].astype(str), store_id=new_monthly["store_id"].astype(str)
+    ).merge(pairs, on=["item_id", "store_id"])
+    last = history.groupby(["item_id", "store_id"], observed=True)["month"].max().rename("last_month").reset_index()
+    stale = new_monthly.merge(last, on=["item_id", "store_id"]).eval("month <= last_month")
+    if stale.any():
+        raise ValueError(f"{int(stale.sum())} filas nuevas no son posteriores al último mes de su serie en {data_path}.")
+
+    new_rows = extend_features(history, new_monthly)
+    if new_rows.empty:
+        return history, new_rows
+    updated = sort_series(pd.concat([history, new_rows], ignore_index=True))
+    _atomic_write(data_path, lambda path: updated.to_csv(path, index=False))
+    return updated, new_rows
+
+
+def refresh_month(new_monthly, data_path=PROCESSED_DATA_PATH, models_dir=MODELS_DIR, registry_dir=REGISTRY_DIR,
+                  mode="continue", extra_rounds=DEFAULT_EXTRA_ROUNDS, workers=None, threads_per_worker=1,
+                  verbose=True):
+    """Añade un mes nuevo a las características y reajusta solo las series afectadas.
+
+    Ver el docstring del módulo. Si existe el registro, las versiones nuevas se
+    añaden con `update_registry`. Devuelve un DataFrame con el estado de cada
+    serie reajustada (`status` es 'ok' o 'failed').
+    """
+    if mode not in REFRESH_MODES:
+        raise ValueError(f"Modo de actualización no válido: {mode}. Opciones: {REFRESH_MODES}")
+    start = time.perf_counter()
+    history, new_rows = append_month(new_monthly, data_path)
+    if new_rows.empty:
+        if verbose:
+            print("No hay filas nuevas para las series del modelo.")
+        return pd.DataFrame()
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    changed = pd.MultiIndex.from_frame(new_rows[["item_id", "store_id"]]).unique()
+    affected = history[pd.MultiIndex.from_frame(history[["item_id", "store_id"]]).isin(changed)]
+    columns = ["sales"] + FEATURE_COLUMNS
+    if verbose:
+        print(f"Filas nuevas: {len(new_rows)} | series a reajustar: {len(changed)} | modo: {mode}")
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads,
+                             initargs=(threads_per_worker,)) as pool:
+        futures = [
+            pool.submit(_refresh_task, item_id, store_id, group.reset_index(drop=True),
+                        data_fingerprint(group, columns), mode, extra_rounds, models_dir, threads_per_worker)
+            for (item_id, store_id), group in affected.groupby(["item_id", "store_id"], sort=True, observed=True)
+        ]
+        for future in as_completed(futures):
+            state = future.result()
+            results.append(state)
+            if verbose and state["status"] == "failed":
+                print(f"No se pudo reajustar {state['item_id']}_{state['store_id']}: {state['error']}")
+
+    summary = pd.DataFrame(results).sort_values(["item_id", "store_id"]).reset_index(drop=True)
+    refreshed = summary.loc[summary["status"] == "ok", ["item_id", "store_id"]].itertuples(index=False)
+    if os.path.exists(os.path.join(registry_dir, MANIFEST_NAME)):
+        update_registry(list(refreshed), models_dir, registry_dir)
+    if verbose:
+        print(f"{int((summary['status'] == 'ok').sum())}/{len(summary)} series reajustadas "
+              f"en {time.perf_counter() - start:.1f}s")
+    return summary
+
+
+def check_refresh_then_train(data_path=PROCESSED_DATA_PATH, n_series=3, config=None):
+    """Comprueba que, tras `refresh_month`, `train_all_series` no vuelve a entrenar las series reajustadas.
+
+    Trabaja en un directorio temporal con las `n_series` primeras series de
+    `data_path`: las entrena, añade un mes sintético (la última fila de cada
+    serie un mes después) con `refresh_month` y vuelve a llamar a
+    `train_all_series` con el CSV releído con `read_processed`. Lanza
+    `AssertionError` si alguna serie no se salta y devuelve el resumen del
+    segundo entrenamiento.
+    """
+    import tempfile
+
+    from pipeline.training import train_all_series
+
+    config = {"search": "halving", "budget": 8, **(config or {})}
+    history = read_processed(data_path)
+    pairs = history[["item_id", "store_id"]].drop_duplicates().head(n_series)
+    history = history.merge(pairs.astype(history[["item_id", "store_id"]].dtypes.to_dict()), on=["item_id", "store_id"])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_data, tmp_models = os.path.join(tmp_dir, "data.csv"), os.path.join(tmp_dir, "models")
+        history.to_csv(tmp_data, index=False)
+        train_all_series(read_processed(tmp_data), config, tmp_models, workers=1, verbose=False)
+
+        last = sort_series(history).groupby(["item_id", "store_id"], observed=True).tail(1)
+        new_monthly = last.assign(month=last["month"] + pd.offsets.MonthBegin(1), event_name_1=None)
+        refreshed = refresh_month(new_monthly, tmp_data, tmp_models, os.path.join(tmp_dir, "registry"), workers=1,
+                                  verbose=False)
+        assert (refreshed["status"] == "ok").all(), "No se pudieron reajustar todas las series"
+
+        summary = train_all_series(read_processed(tmp_data), config, tmp_models, workers=1, verbose=False)
+    retrained = summary.loc[summary["status"] != "skipped", ["item_id", "store_id"]]
+    assert retrained.empty, f"Series reentrenadas tras la actualización: {list(map(tuple, retrained.to_numpy()))}"
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Actualización mensual incremental de datos y modelos.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--daily", help="CSV con las filas diarias del mes nuevo (columnas de total_data)")
+    source.add_argument("--monthly", help="CSV con los agregados mensuales del mes nuevo")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH, help="CSV con las características mensuales")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--registry-dir", default=REGISTRY_DIR)
+    parser.add_argument("--mode", choices=REFRESH_MODES, default="continue")
+    parser.add_argument("--extra-rounds", type=int, default=DEFAULT_EXTRA_ROUNDS,
+                        help="Árboles que se añaden con --mode continue")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.daily:
+        from pipeline.aggregation import append_aggregates
+
+        _, monthly = append_aggregates(pd.read_csv(args.daily))
+    else:
+        monthly = pd.read_csv(args.monthly, parse_dates=["month"])
+    summary = refresh_month(monthly, args.data, args.models_dir, args.registry_dir, args.mode, args.extra_rounds,
+                            args.workers)
+    if not summary.empty:
+        print(summary["status"].value_counts().to_string())
@@ -0,0 +1,326 @@
+"""Registro empaquetado de los modelos por serie.
+
+En lugar de 200 ficheros `Final_model_XGBOOST_<item>_<store>.sav` sueltos que la
+app descubría con `os.listdir` y una expresión regular, los modelos se
+empaquetan en uno o varios ficheros (`models-000.pack`, ...) con un índice
+`manifest.json`:
+
+- cada entrada guarda producto, tienda, fichero, desplazamiento y longitud de
+  los bytes del modelo, su versión (hash del contenido), el esquema de
+  características, la fecha de entrenamiento y las métricas de
+  `models/training_state/` si existen;
+- `ModelRegistry` carga solo el manifiesto; cada modelo se deserializa bajo
+  demanda leyendo su rango de bytes de un `mmap` del fichero (búsqueda O(1));
+- `catalog()` devuelve los productos y sus tiendas desde el manifiesto, sin
+  tocar el sistema de ficheros.
+
+Por defecto los modelos se guardan en el formato nativo de XGBoost (UBJSON,
+sin pickle, ver `pipeline.native`) y `load_predictor` devuelve un
+`BoosterPredictor` para predecir sin el envoltorio de scikit-learn; con
+`model_format='joblib'` se guardan los bytes de los `.sav` tal cual.
+
+Los `.sav` siguen siendo la salida del entrenamiento (`pipeline.training`);
+`pack_models` los empaqueta y se vuelve a ejecutar después de reentrenar.
+Tras una actualización incremental (`pipeline.refresh`), `update_registry`
+añade solo los modelos nuevos en un fichero empaquetado adicional y sustituye
+el manifiesto de forma atómica; `pack_models` compacta el registro.
+"""
+import argparse
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+
+import joblib
+
+from pipeline.native import MODEL_FORMATS, BoosterPredictor, load_booster, to_native_bytes
+from pipeline.paths import MODELS_DIR, REGISTRY_DIR
+
+MANIFEST_NAME = "manifest.json"
+REGISTRY_VERSION = 1
+SHARD_SIZE = 256 * 1024 ** 2  # bytes por fichero empaquetado
+MODEL_PATTERN = re.compile(r"Final_model_XGBOOST_(.+)_([A-Z]{2}_\d+)\.sav")
+STATE_DIRNAME = "training_state"
+STATE_FIELDS = ["best_params", "cv_score", "real_sales", "predicted_sales", "abs_error", "fits", "month"]
+
+
+def model_key(item_id, store_id):
+    return f"{item_id}|{store_id}"
+
+
+def _shard_name(index):
+    return f"models-{index:03d}.pack"
+
+
+def _feature_schema(model):
+    # Columnas de entrada con las que se entrenó el modelo (o None si no se guardaron)
+    names = getattr(model, "feature_names_in_", None)
+    if names is None and hasattr(model, "get_booster"):
+        names = model.get_booster().feature_names
+    return None if names is None else [str(name) for name in names]
+
+
+def _load_training_state(models_dir, item_id, store_id):
+    path = os.path.join(models_dir, STATE_DIRNAME, f"{item_id}_{store_id}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _entry_fields(models_dir, item_id, store_id, payload, model_format, schema_index):
+    # Campos de la entrada del manifiesto que dependen del modelo (no de dónde se guarda)
+    path = os.path.join(models_dir, f"Final_model_XGBOOST_{item_id}_{store_id}.sav")
+    state = _load_training_state(models_dir, item_id, store_id)
+    return {
+        "item_id": item_id,
+        "store_id": store_id,
+        "length": len(payload),
+        "format": model_format,
+        "version": hashlib.sha256(payload).hexdigest()[:16],
+        "schema": schema_index,
+        "trained": state.get("finished")
+        or datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+        "metrics": {field: state[field] for field in STATE_FIELDS if field in state},
+    }
+
+
+def pack_models(models_dir=MODELS_DIR, registry_dir=REGISTRY_DIR, shard_size=SHARD_SIZE, model_format="ubj"):
+    """Empaqueta los `.sav` de `models_dir` en `registry_dir` y escribe el manifiesto.
+
+    Con `model_format='ubj'` cada modelo se convierte al formato nativo de
+    XGBoost; con 'joblib' se guardan los bytes del `.sav`. El registro se
+    escribe en un directorio temporal propio de esta llamada y después se
+    intercambia con el anterior, que se aparta antes de borrarlo.
+    Devuelve el manifiesto.
+    """
+    if model_format not in MODEL_FORMATS:
+        raise ValueError(f"Formato de modelo no soportado: {model_format}. Opciones: {MODEL_FORMATS}")
+    files = sorted(f for f in os.listdir(models_dir) if MODEL_PATTERN.fullmatch(f))
+    if not files:
+        raise FileNotFoundError(f"No se encontraron modelos .sav en: {models_dir}")
+
+    # Directorio temporal único junto al registro: dos empaquetados a la vez no comparten ficheros
+    parent = os.path.dirname(os.path.abspath(registry_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=f"{os.path.basename(os.path.abspath(registry_dir))}.tmp-", dir=parent)
+
+    schemas, entries = [], {}
+    shard_index, shard, offset = 0, None, 0
+    try:
+        for filename in files:
+            item_id, store_id = MODEL_PATTERN.fullmatch(filename).groups()
+            path = os.path.join(models_dir, filename)
+            with open(path, "rb") as f:
+                payload = f.read()
+            model = joblib.load(io.BytesIO(payload))
+            if model_format == "ubj":
+                payload = to_native_bytes(model)
+
+            if shard is None or (offset > 0 and offset + len(payload) > shard_size):
+                if shard is not None:
+                    shard.close()
+                    shard_index += 1
+                shard, offset = open(os.path.join(tmp_dir, _shard_name(shard_index)), "wb"), 0
+            shard.write(payload)
+
+            schema = _feature_schema(model)
+            if schema not in schemas:
+                schemas.append(schema)
+            entries[model_key(item_id, store_id)] = {
+                **_entry_fields(models_dir, item_id, store_id, payload, model_format, schemas.index(schema)),
+                "shard": _shard_name(shard_index),
+                "offset": offset,
+            }
+            offset += len(payload)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    finally:
+        if shard is not None:
+            shard.close()
+
+    manifest = {
+        "registry_version": REGISTRY_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        # Relativa al registro, para que el manifiesto no dependa de dónde está el repositorio
+        "source": os.path.relpath(os.path.abspath(models_dir), os.path.abspath(registry_dir)),
+        "schemas": schemas,
+        "models": entries,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+    _swap_dir(tmp_dir, registry_dir)
+    return manifest
+
+
+def _swap_dir(new_dir, target_dir):
+    # Sustituye `target_dir` por `new_dir` con dos renombrados: el registro anterior se aparta con un nombre
+    # único y solo se borra cuando el nuevo ya está en su sitio, así que nunca hay un registro a medias
+    aside = f"{new_dir}.old"
+    try:
+        os.replace(target_dir, aside)
+    except FileNotFoundError:
+        pass
+    try:
+        os.replace(new_dir, target_dir)
+    except OSError:
+        # Otro empaquetado ha colocado entre medias un registro completo: se conserva ese
+        if not os.path.exists(os.path.join(target_dir, MANIFEST_NAME)):
+            raise
+        shutil.rmtree(new_dir, ignore_errors=True)
+    shutil.rmtree(aside, ignore_errors=True)
+
+
+def update_registry(pairs, models_dir=MODELS_DIR, registry_dir=REGISTRY_DIR, model_format="ubj"):
+    """Añade al registro las versiones nuevas de los modelos de `pairs` sin reescribir el resto.
+
+    Los modelos (`.sav` de `models_dir`) se escriben en un fichero empaquetado
+    nuevo y después se sustituye el manifiesto con `os.replace`: quien tenga
+    abierto el registro sigue leyendo las versiones anteriores, que no se
+    tocan, y quien lo abra después ve todas las nuevas a la vez. Los modelos
+    ya registrados conservan su formato; cada entrada guarda la versión a la
+    que sustituye en `previous_version`. Devuelve el manifiesto.
+    """
+    manifest_path = os.path.join(registry_dir, MANIFEST_NAME)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    pairs = list(dict.fromkeys(pairs))
+    if not pairs:
+        return manifest
+    shard_index = 1 + max(
+        (int(name[len("models-"):-len(".pack")]) for name in os.listdir(registry_dir)
+         if name.startswith("models-") and name.endswith(".pack")), default=-1,
+    )
+    shard_name = _shard_name(shard_index)
+    shard_path = os.path.join(registry_dir, shard_name)
+
+    entries, offset = {}, 0
+    with open(f"{shard_path}.tmp", "wb") as shard:
+        for item_id, store_id in pairs:
+            key = model_key(item_id, store_id)
+            previous = manifest["models"].get(key, {})
+            entry_format = previous.get("format", model_format)
+            with open(os.path.join(models_dir, f"Final_model_XGBOOST_{item_id}_{store_id}.sav"), "rb") as f:
+                payload = f.read()
+            model = joblib.load(io.BytesIO(payload))
+            if entry_format == "ubj":
+                payload = to_native_bytes(model)
+            schema = _feature_schema(model)
+            if schema not in manifest["schemas"]:
+                manifest["schemas"].append(schema)
+            shard.write(payload)
+            entries[key] = {
+                **_entry_fields(models_dir, item_id, store_id, payload, entry_format, manifest["schemas"].index(schema)),
+                "shard": shard_name,
+                "offset": offset,
+                "previous_version": previous.get("version"),
+            }
+            offset += len(payload)
+    os.replace(f"{shard_path}.tmp", shard_path)
+
+    manifest["models"].update(entries)
+    manifest["updated"] = datetime.now().isoformat(timespec="seconds")
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    return manifest
+
+
+class ModelRegistry:
+    """Acceso de solo lectura al registro: manifiesto en memoria y modelos bajo demanda."""
+
+    def __init__(self, registry_dir=REGISTRY_DIR):
+        manifest_path = os.path.join(registry_dir, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No se encontró el manifiesto del registro en: {manifest_path}")
+        with open(manifest_path) as f:
+            self.manifest = json.load(f)
+        self.registry_dir = registry_dir
+        self.models = self.manifest["models"]
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.models)
+
+    def __contains__(self, key):
+        return model_key(*key) in self.models
+
+    def entry(self, item_id, store_id):
+        """Metadatos del modelo (sin cargarlo). Lanza KeyError si no existe."""
+        key = model_key(item_id, store_id)
+        if key not in self.models:
+            raise KeyError(f"No hay modelo para el producto {item_id} en la tienda {store_id}")
+        return self.models[key]
+
+    def features(self, item_id, store_id):
+        """Columnas de entrada del modelo, en el orden con el que se entrenó."""
+        return self.manifest["schemas"][self.entry(item_id, store_id)["schema"]]
+
+    def _shard(self, name):
+        # Cada fichero empaquetado se abre una vez y se mapea en memoria
+        if name not in self._shards:
+            with open(os.path.join(self.registry_dir, name), "rb") as f:
+                self._shards[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._shards[name]
+
+    def read_bytes(self, item_id, store_id):
+        """Bytes serializados del modelo, leídos de su rango en el fichero empaquetado."""
+        entry = self.entry(item_id, store_id)
+        return self._shard(entry["shard"])[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def load(self, item_id, store_id):
+        """Modelo de una serie como `XGBRegressor` (con el envoltorio de scikit-learn)."""
+        payload = self.read_bytes(item_id, store_id)
+        if self.entry(item_id, store_id)["format"] == "joblib":
+            return joblib.load(io.BytesIO(payload))
+        from xgboost import XGBRegressor
+
+        model = XGBRegressor()
+        model.load_model(bytearray(payload))
+        return model
+
+    def load_booster(self, item_id, store_id):
+        """`xgboost.Booster` de una serie, sin pasar por pickle si está en formato nativo."""
+        return load_booster(self.read_bytes(item_id, store_id), self.entry(item_id, store_id)["format"])
+
+    def load_predictor(self, item_id, store_id):
+        """`BoosterPredictor` de una serie: predicción directa sobre un array float32 reservado."""
+        return BoosterPredictor(self.load_booster(item_id, store_id), self.features(item_id, store_id))
+
+    def catalog(self):
+        """Productos ordenados y, para cada producto, el conjunto de tiendas con modelo."""
+        product_to_stores = {}
+        for entry in self.models.values():
+            product_to_stores.setdefault(entry["item_id"], set()).add(entry["store_id"])
+        return sorted(product_to_stores), product_to_stores
+
+    def close(self):
+        for shard in self._shards.values():
+            shard.close()
+        self._shards = {}
+
+
+def open_registry(registry_dir=REGISTRY_DIR, models_dir=MODELS_DIR):
+    """Abre el registro; si todavía no existe, lo crea a partir de los `.sav` de `models_dir`."""
+    if not os.path.exists(os.path.join(registry_dir, MANIFEST_NAME)):
+        pack_models(models_dir, registry_dir)
+    return ModelRegistry(registry_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Empaqueta los modelos .sav en el registro de modelos.")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--registry-dir", default=REGISTRY_DIR)
+    parser.add_argument("--shard-size", type=int, default=SHARD_SIZE, help="Bytes máximos por fichero empaquetado")
+    parser.add_argument("--format", choices=MODEL_FORMATS, default="ubj", help="ubj: formato nativo de XGBoost, sin pickle")
+    args = parser.parse_args()
+
+    manifest = pack_models(args.models_dir, args.registry_dir, args.shard_size, args.format)
+    shards = sorted({entry["shard"] for entry in manifest["models"].values()})
+    print(f"{len(manifest['models'])} modelos empaquetados ({args.format}) en {len(shards)} fichero(s) en {args.registry_dir}")
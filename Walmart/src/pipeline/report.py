@@ -0,0 +1,244 @@
+"""Informe PDF de predicciones generado en memoria y con los gráficos en paralelo.
+
+La app dibujaba cada gráfico con matplotlib, lo guardaba como PNG en un
+directorio temporal, esperaba `time.sleep(1)` y volvía a leerlo para
+reportlab: un informe de 20 tiendas x 20 productos tenía 400 segundos de
+espera fijos. Aquí:
+
+- cada gráfico se guarda en un `BytesIO` y reportlab lo lee de memoria;
+- los gráficos se dibujan en un pool de procesos (cada par es independiente
+  y dibujar es CPU), con una sola figura por hilo que se reutiliza: solo
+  cambian las alturas de las barras, los textos y el título, y con márgenes
+  fijos para que cada gráfico se dibuje una sola vez. La figura es por hilo y
+  no por proceso porque, con pocos gráficos, se dibujan dentro del servidor de
+  Streamlit, que ejecuta cada sesión en su propio hilo; por el mismo motivo
+  los procesos del pool se crean con forkserver y no con fork;
+- los gráficos se añaden a la historia de reportlab según van llegando del pool.
+
+`benchmark_report` mide el tiempo del informe según el número de pares y
+`check_thread_safety` comprueba que los gráficos dibujados desde varios hilos a
+la vez son idénticos a los dibujados en serie.
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import pandas as pd
+
+BACKGROUND = "#1E1E3C"
+BAR_COLORS = ["#37536D", "#FF8C00"]
+BAR_WIDTH = 0.35
+TABLE_HEADER = ["Producto", "Estado", "Tienda", "Demanda real (mayo 2016)", "Demanda predicha (Mayo 2016)", "% Error"]
+IMAGE_SIZE = (450, 300)
+MIN_PARALLEL_CHARTS = 8  # con menos gráficos no compensa arrancar el pool
+# El pool se arranca desde el servidor de Streamlit, que tiene varios hilos: hacer fork de un proceso con
+# hilos puede bloquearse, así que los procesos se crean con forkserver (o spawn donde no existe)
+POOL_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+_local = threading.local()
+
+
+def _chart_template():
+    # Figura, barras y textos que se crean una vez por hilo y se reutilizan en cada gráfico.
+    # Se crea sin pyplot (que tiene estado global) para que cada hilo tenga la suya y se libere con él.
+    template = getattr(_local, "template", None)
+    if template is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        fig = Figure(figsize=(8, 6), facecolor=BACKGROUND)
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        ax.set_facecolor(BACKGROUND)
+        x = [0, 1]
+        bars = ax.bar(x, [1, 1], BAR_WIDTH, color=BAR_COLORS, edgecolor="#08306B")
+        labels = [
+            ax.text(bar.get_x() + bar.get_width() / 2.0, 1, "", ha="center", va="bottom", color="white")
+            for bar in bars
+        ]
+        ax.set_xticks(x)
+        ax.set_xlim(-0.5, 1.5)
+        ax.set_xticklabels(["Demanda real", "Demanda predicha"], color="white")
+        ax.set_ylabel("Demanda", color="white")
+        title = ax.set_title("", color="white", pad=20)
+        ax.tick_params(axis="y", colors="white")
+        ax.spines["bottom"].set_color("white")
+        ax.spines["left"].set_color("white")
+        ax.spines["top"].set_visible(False)
+        ax.spines["right"].set_visible(False)
+        # Márgenes fijos en lugar de bbox_inches='tight', que obliga a dibujar la figura dos veces
+        fig.subplots_adjust(left=0.1, right=0.97, top=0.88, bottom=0.07)
+        template = _local.template = fig, ax, bars, labels, title
+    return template
+
+
+def render_chart(chart):
+    """PNG (bytes) del gráfico real frente a predicho de un par.
+
+    `chart` es `(producto, estado, tienda, demanda_real, demanda_predicha)`.
+    """
+    product, state_name, store_id, real_demand, predicted_demand = chart
+    fig, ax, bars, labels, title = _chart_template()
+    for bar, label, height in zip(bars, labels, [real_demand, predicted_demand]):
+        bar.set_height(height)
+        label.set_position((bar.get_x() + bar.get_width() / 2.0, height))
+        label.set_text(f"{height:.2f}")
+    title.set_text(f"Demanda Real vs. Predicha - {product}, {state_name}, Tienda {store_id.split('_')[1]}")
+    ax.relim()
+    ax.autoscale_view(scalex=False)
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", facecolor=BACKGROUND, edgecolor="none")
+    return buffer.getvalue()
+
+
+def render_charts(charts, workers=None):
+    """Genera los PNG de `charts` en orden; en paralelo si hay suficientes gráficos."""
+    charts = list(charts)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(charts) < MIN_PARALLEL_CHARTS:
+        yield from map(render_chart, charts)
+        return
+    context = multiprocessing.get_context(POOL_START_METHOD)
+    if POOL_START_METHOD == "forkserver":
+        # El servidor importa matplotlib y este módulo una sola vez y los procesos del pool nacen de él ya cargados
+        context.set_forkserver_preload(["pipeline.report", "matplotlib.backends.backend_agg", "matplotlib.figure"])
+    with ProcessPoolExecutor(max_workers=min(workers, len(charts)), mp_context=context) as pool:
+        yield from pool.map(render_chart, charts, chunksize=max(1, len(charts) // (4 * workers)))
+
+
+def _report_rows(forecasts, state_name):
+    # Filas de la tabla y datos de cada gráfico a partir de la tabla de predicciones
+    rows, charts = [], []
+    for forecast in forecasts.itertuples(index=False):
+        real_demand, predicted_demand = float(forecast.real_sales), float(forecast.predicted_sales)
+        error_percent = abs(real_demand - predicted_demand) / real_demand * 100 if real_demand != 0 else 0
+        rows.append([
+            forecast.item_id,
+            state_name,
+            f"Tienda {forecast.store_id.split('_')[1]}",
+            f"{real_demand:.2f}",
+            f"{predicted_demand:.2f}",
+            f"{error_percent:.2f}%",
+        ])
+        charts.append((forecast.item_id, state_name, forecast.store_id, real_demand, predicted_demand))
+    return rows, charts
+
+
+def build_report_pdf(forecasts, state_name, username, workers=None):
+    """PDF (bytes) con la tabla de predicciones y un gráfico por par.
+
+    `forecasts` tiene las columnas `item_id`, `store_id`, `real_sales` y
+    `predicted_sales` (p. ej. `pipeline.forecast_store.read_forecasts`).
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, rightMargin=50, leftMargin=50, topMargin=50, bottomMargin=50)
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        "Title", parent=styles["Title"], fontSize=16, textColor=colors.HexColor("#0071CE"), spaceAfter=20,
+        alignment=1,
+    )
+    heading_style = ParagraphStyle("Heading2", parent=styles["Heading2"], fontSize=12, spaceAfter=10)
+    normal_style = styles["Normal"]
+
+    story = [
+        Paragraph(f"Informe de predicciones - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", title_style),
+        Paragraph(f"Usuario: {username}", normal_style),
+        Spacer(1, 12),
+    ]
+
+    rows, charts = _report_rows(forecasts, state_name)
+    table = Table([TABLE_HEADER] + rows)
+    table.setStyle(TableStyle([
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#0071CE")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 10),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+        ("BACKGROUND", (0, 1), (-1, -1), colors.white),
+        ("TEXTCOLOR", (0, 1), (-1, -1), colors.black),
+        ("FONTNAME", (0, 1), (-1, -1), "Helvetica"),
+        ("FONTSIZE", (0, 1), (-1, -1), 8),
+        ("GRID", (0, 0), (-1, -1), 1, colors.black),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]))
+    story += [Paragraph("Resumen de predicciones", heading_style), table, Spacer(1, 12)]
+
+    if charts:
+        story.append(Paragraph("Gráficos de Demanda", heading_style))
+        for png in render_charts(charts, workers):
+            image = Image(io.BytesIO(png), width=IMAGE_SIZE[0], height=IMAGE_SIZE[1])
+            image.hAlign = "CENTER"
+            story += [image, Spacer(1, 12)]
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def check_thread_safety(n_charts=60, threads=8):
+    """Dibuja `n_charts` gráficos desde `threads` hilos a la vez y los compara con los de serie.
+
+    Reproduce varias sesiones de Streamlit generando informes al mismo tiempo.
+    Lanza `AssertionError` si algún PNG difiere y devuelve el número de gráficos comparados.
+    """
+    charts = [
+        (f"FOODS_3_{i:03d}", "California", f"CA_{i % 4 + 1}", float(10 + 7 * i), float(5 + 11 * (i % 13)))
+        for i in range(n_charts)
+    ]
+    serial = [render_chart(chart) for chart in charts]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        threaded = list(pool.map(render_chart, charts))
+    different = [chart[0] for chart, a, b in zip(charts, serial, threaded) if a != b]
+    assert not different, f"{len(different)} de {n_charts} gráficos difieren al dibujarse en paralelo: {different[:5]}"
+    return n_charts
+
+
+def benchmark_report(pair_counts=(1, 10, 50, 100, 200), workers=None, forecasts=None):
+    """Tiempo de `build_report_pdf` según el número de pares, en serie y con el pool.
+
+    Sin `forecasts` usa la tabla materializada de Mayo 2016. La columna
+    `sleep_floor_s` es la espera fija que tenía el informe anterior
+    (`time.sleep(1)` por gráfico), sin contar el dibujo.
+    """
+    if forecasts is None:
+        from pipeline.forecast_store import read_forecasts, refresh_forecasts
+
+        refresh_forecasts("2016-05")
+        forecasts = read_forecasts("2016-05")
+    forecasts = forecasts.dropna(subset=["real_sales", "predicted_sales"])
+
+    results = []
+    for n in pair_counts:
+        sample = forecasts.head(n)
+        row = {"pairs": len(sample), "sleep_floor_s": float(len(sample))}
+        for name, n_workers in [("serial_s", 1), ("parallel_s", workers or os.cpu_count() or 1)]:
+            start = time.perf_counter()
+            pdf = build_report_pdf(sample, "California", "benchmark", workers=n_workers)
+            row[name] = time.perf_counter() - start
+        row["pdf_kb"] = len(pdf) / 1024
+        results.append(row)
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark del informe PDF según el número de pares.")
+    parser.add_argument("--pairs", type=int, nargs="*", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--check-threads", action="store_true",
+                        help="Comprobar que los gráficos dibujados desde varios hilos coinciden con los de serie")
+    args = parser.parse_args()
+
+    if args.check_threads:
+        print(f"{check_thread_safety()} gráficos idénticos en serie y desde varios hilos")
+    print(benchmark_report(args.pairs, args.workers).round(3).to_string(index=False))
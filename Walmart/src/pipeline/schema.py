@@ -0,0 +1,199 @@
+"""Esquema de tipos de los datasets de ventas y cargador tipado.
+
+Cada etapa leía `total_data.csv` y `Final_XGBoost_data_processed.csv` con
+`pd.read_csv` sin tipos: `item_id`, `store_id`, `d` o `event_name_*` quedaban
+como texto (object), `sales` y `snap_*` como int64, `sell_price` y los lags
+como float64, y las fechas como texto. Este módulo describe todas las columnas
+de los dos datasets en un solo sitio:
+
+- identificadores y eventos como `category`;
+- ventas y marcas (`snap_*`, `event_name_1`, `wday`...) con enteros pequeños;
+- precios y características calculadas (`lag_k`, `rolling_mean_3`) en float32,
+  la precisión con la que XGBoost las usa;
+- fechas (`date` y el `month` del dataset procesado) ya convertidas;
+- los `month_1..12` como booleanos.
+
+`read_typed` aplica el esquema al leer (los tipos se pasan a `read_csv`, así
+que las columnas nunca llegan a existir como texto u int64); con `chunksize`
+se lee por bloques, se reducen los tipos de cada bloque y las categorías se
+unifican antes de concatenar. `memory_report` compara la memoria de la
+lectura por defecto con la tipada.
+
+El entrenamiento (`pipeline.training`) y la actualización incremental
+(`pipeline.refresh`) también leen con `read_processed`; sus huellas de los
+datos se calculan en float32 (`pipeline.training.data_fingerprint`), así que no
+dependen del cargador.
+
+Uso desde la línea de comandos:
+
+    python -m pipeline.schema --dataset processed
+    python -m pipeline.schema --dataset total_data --rows 2000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_float_dtype, is_integer_dtype, is_string_dtype
+
+from pipeline.features import MONTH_COLUMNS
+from pipeline.paths import PROCESSED_DATA_PATH, TOTAL_DATA_PATH
+
+DATE = "datetime64[ns]"
+
+# total_data.csv: una fila por producto, tienda y día (ventas + calendario + precios)
+TOTAL_DATA_SCHEMA = {
+    "id": "category",
+    "item_id": "category",
+    "dept_id": "category",
+    "cat_id": "category",
+    "store_id": "category",
+    "state_id": "category",
+    "d": "category",
+    "sales": "int16",
+    "date": DATE,
+    "wm_yr_wk": "int16",
+    "weekday": "category",
+    "wday": "int8",
+    "month": "int8",
+    "year": "int16",
+    "event_name_1": "category",
+    "event_type_1": "category",
+    "event_name_2": "category",
+    "event_type_2": "category",
+    "snap_CA": "int8",
+    "snap_TX": "int8",
+    "snap_WI": "int8",
+    "sell_price": "float32",
+}
+
+# Final_XGBoost_data_processed.csv: una fila por serie y mes con las características de los modelos
+PROCESSED_SCHEMA = {
+    "item_id": "category",
+    "store_id": "category",
+    "month": DATE,
+    "sales": "int32",
+    "event_name_1": "int8",
+    "snap_CA": "int8",
+    "snap_TX": "int8",
+    "snap_WI": "int8",
+    "sell_price": "float32",
+    "snap": "int8",
+    "lag_1": "float32",
+    "lag_2": "float32",
+    "lag_3": "float32",
+    "lag_6": "float32",
+    "lag_12": "float32",
+    "rolling_mean_3": "float32",
+    "year": "int16",
+    **{column: "bool" for column in MONTH_COLUMNS},
+}
+
+SCHEMAS = {"total_data": TOTAL_DATA_SCHEMA, "processed": PROCESSED_SCHEMA}
+DATASET_PATHS = {"total_data": TOTAL_DATA_PATH, "processed": PROCESSED_DATA_PATH}
+
+# Columnas fuera del esquema: texto con menos de esta proporción de valores distintos pasa a category
+CATEGORY_RATIO = 0.5
+
+
+def _read_options(path, schema, columns):
+    # Tipos y fechas para `read_csv`, solo de las columnas que existen en el fichero
+    header = pd.read_csv(path, nrows=0).columns
+    present = [col for col in header if columns is None or col in columns]
+    dtype = {col: schema[col] for col in present if col in schema and schema[col] != DATE}
+    parse_dates = [col for col in present if schema.get(col) == DATE]
+    return {"usecols": columns, "dtype": dtype, "parse_dates": parse_dates or None}
+
+
+def downcast(df, schema=None):
+    """Reduce los tipos de `df`: las columnas de `schema` a su tipo y el resto al menor posible.
+
+    Los enteros y reales fuera del esquema se reducen con `pd.to_numeric(downcast=...)`
+    y el texto con pocos valores distintos pasa a `category`.
+    """
+    schema = schema or {}
+    for col in df.columns:
+        dtype = schema.get(col)
+        if dtype == DATE:
+            df[col] = pd.to_datetime(df[col])
+        elif dtype is not None:
+            if str(df[col].dtype) != dtype:
+                df[col] = df[col].astype(dtype)
+        elif is_integer_dtype(df[col]) and df[col].dtype != bool:
+            df[col] = pd.to_numeric(df[col], downcast="integer")
+        elif is_float_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast="float")
+        elif is_string_dtype(df[col]) and len(df) and df[col].nunique() < CATEGORY_RATIO * len(df):
+            df[col] = df[col].astype("category")
+    return df
+
+
+def iter_typed(path, schema, columns=None, chunksize=1_000_000):
+    """Bloques de como mucho `chunksize` filas del CSV, ya con los tipos de `schema`."""
+    for chunk in pd.read_csv(path, chunksize=chunksize, **_read_options(path, schema, columns)):
+        yield downcast(chunk, schema)
+
+
+def _concat_typed(chunks):
+    # Concatenar bloques tipados sin perder las categorías (cada bloque tiene las suyas)
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+    for col in chunks[0].columns:
+        if isinstance(chunks[0][col].dtype, pd.CategoricalDtype):
+            categories = pd.Index(sorted(set().union(*(chunk[col].cat.categories for chunk in chunks))))
+            for chunk in chunks:
+                chunk[col] = chunk[col].cat.set_categories(categories)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def read_typed(path, schema, columns=None, chunksize=None):
+    """Lee un CSV aplicando `schema` al leer; con `chunksize`, por bloques (memoria acotada por bloque)."""
+    if chunksize is not None:
+        return _concat_typed(iter_typed(path, schema, columns, chunksize))
+    return downcast(pd.read_csv(path, **_read_options(path, schema, columns)), schema)
+
+
+def read_total_data(path=TOTAL_DATA_PATH, columns=None, chunksize=1_000_000):
+    """`total_data.csv` con los tipos de `TOTAL_DATA_SCHEMA` (leído por bloques)."""
+    return read_typed(path, TOTAL_DATA_SCHEMA, columns, chunksize)
+
+
+def read_processed(path=PROCESSED_DATA_PATH, columns=None):
+    """`Final_XGBoost_data_processed.csv` con los tipos de `PROCESSED_SCHEMA`."""
+    return read_typed(path, PROCESSED_SCHEMA, columns)
+
+
+def memory_report(path, schema, nrows=None):
+    """Memoria por columna de la lectura por defecto frente a la tipada (las primeras `nrows` filas).
+
+    Devuelve un DataFrame con `column`, `dtype_before`, `mb_before`,
+    `dtype_after`, `mb_after` y `ratio`, más una fila `TOTAL`.
+    """
+    before = pd.read_csv(path, nrows=nrows)
+    options = _read_options(path, schema, None)
+    after = downcast(pd.read_csv(path, nrows=nrows, **options), schema)
+    mb_before = before.memory_usage(deep=True, index=False) / 1024 ** 2
+    mb_after = after.memory_usage(deep=True, index=False) / 1024 ** 2
+    report = pd.DataFrame({
+        "column": before.columns,
+        "dtype_before": before.dtypes.astype(str).to_numpy(),
+        "mb_before": mb_before.to_numpy(),
+        "dtype_after": after.dtypes.astype(str).reindex(before.columns).to_numpy(),
+        "mb_after": mb_after.reindex(before.columns).to_numpy(),
+    })
+    total = {"column": "TOTAL", "dtype_before": "", "mb_before": report["mb_before"].sum(), "dtype_after": "",
+             "mb_after": report["mb_after"].sum()}
+    report = pd.concat([report, pd.DataFrame([total])], ignore_index=True)
+    report["ratio"] = report["mb_before"] / report["mb_after"].replace(0, np.nan)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memoria de los datasets con y sin el esquema de tipos.")
+    parser.add_argument("--dataset", choices=list(SCHEMAS), default="processed")
+    parser.add_argument("--path", default=None, help="CSV (por defecto, la ruta del dataset)")
+    parser.add_argument("--rows", type=int, default=None, help="Filas a leer (por defecto, todas)")
+    args = parser.parse_args()
+
+    report = memory_report(args.path or DATASET_PATHS[args.dataset], SCHEMAS[args.dataset], args.rows)
+    print(report.to_string(index=False, float_format=lambda value: f"{value:,.2f}"))
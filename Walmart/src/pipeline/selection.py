@@ -0,0 +1,208 @@
+"""Selección vectorizada de las series predecibles antes de entrenar.
+
+`models_data_monthly.ipynb` recorría `df.groupby(['item_id', 'store_id'])`
+serie a serie para calcular `non_zero_months`, media, mediana, mínimo,
+desviación y coeficiente de variación, acumulaba diccionarios en una lista y
+elegía los mejores productos de cada tienda con
+`groupby('store_id').apply(lambda x: x.nlargest(...))`. Aquí:
+
+- `series_statistics` calcula todas las estadísticas de todas las series con
+  una sola pasada sobre el array de ventas ordenado por serie (`reduceat`,
+  `bincount` y una ordenación para las medianas), sin bucles de Python;
+- `select_series` aplica los umbrales y se queda con los `min_items_per_store`
+  mejores de cada tienda con una ordenación y la posición dentro de la tienda,
+  sin `apply` (mismo resultado que `nlargest`, incluidos los empates);
+- `load_selection` guarda la selección en `data/cache/selection`, con una clave
+  que combina la huella de los agregados mensuales y los parámetros, para que
+  el entrenamiento, la predicción y los notebooks la reutilicen sin recalcular.
+
+Uso desde la línea de comandos:
+
+    python -m pipeline.selection --min-median-sales 100 --min-sales-value 20 --max-cv 1.0
+"""
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from pipeline.features import series_layout, sort_series
+from pipeline.paths import AGGREGATES_CACHE_DIR, SALES_STORE_DIR, SELECTION_CACHE_DIR
+
+MIN_PERIODS = 24  # al menos dos años para capturar la estacionalidad anual
+MIN_ITEMS_PER_STORE = 20
+RANK_BY = "median_sales"
+
+STAT_COLUMNS = [
+    "n_periods", "non_zero_months", "mean_sales", "median_sales", "min_sales", "max_sales", "std_sales", "cv_sales",
+]
+SEASONAL_COLUMNS = ["seasonal_strength", "combined_score"]
+
+
+def _seasonal_strength(values, starts, lengths, group, position, period):
+    # Var(estacional) / Var(ventas) de la descomposición aditiva de statsmodels
+    # (`seasonal_decompose(sales, model='additive', period=period)`) para todas las series a la vez:
+    # tendencia con la media móvil centrada, media de la serie sin tendencia en cada fase y
+    # componente estacional centrado. Las series con menos de dos periodos completos valen 0.
+    n = len(values)
+    half = period // 2
+    weights = np.ones(2 * half + 1)
+    if period % 2 == 0:
+        weights[0] = weights[-1] = 0.5
+    length = lengths[group]
+    valid = (position >= half) & (position < length - half)
+    trend = np.full(n, np.nan)
+    rows = np.flatnonzero(valid)
+    trend[rows] = sum(w * values[rows + k - half] for k, w in enumerate(weights)) / period
+
+    phase = position % period
+    key = group[rows] * period + phase[rows]
+    size = len(starts) * period
+    phase_mean = (np.bincount(key, weights=values[rows] - trend[rows], minlength=size)
+                  / np.bincount(key, minlength=size)).reshape(-1, period)
+    phase_mean -= phase_mean.mean(axis=1, keepdims=True)
+    seasonal = phase_mean[group, phase]
+
+    def variance(x):
+        centered = x - (np.bincount(group, weights=x) / lengths)[group]
+        return np.bincount(group, weights=centered * centered) / lengths
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        strength = variance(seasonal) / variance(values)
+    return np.where(lengths >= 2 * period, strength, 0.0)
+
+
+def series_statistics(df, period_col="month", value_col="sales", min_periods=MIN_PERIODS, seasonal_period=None):
+    """Estadísticas de predictibilidad de todas las series de `df` en una sola pasada.
+
+    Devuelve una fila por serie con al menos `min_periods` periodos:
+    `item_id`, `store_id` y las columnas de `STAT_COLUMNS` (la desviación es
+    la muestral, como `Series.std()`, y `cv_sales` es infinito si la media es 0).
+    Con `seasonal_period` (12 para meses, 4 para trimestres) se añaden
+    `seasonal_strength`, igual a la de `seasonal_decompose`, y
+    `combined_score` = `seasonal_strength` * `mean_sales`.
+    """
+    df = sort_series(df[["item_id", "store_id", period_col, value_col]], period_col)
+    starts, lengths, group, position = series_layout(df)
+    values = df[value_col].to_numpy(dtype=np.float64)
+
+    total = np.add.reduceat(values, starts)
+    mean = total / lengths
+    centered = values - mean[group]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        std = np.sqrt(np.bincount(group, weights=centered * centered) / (lengths - 1))
+        cv = np.where(mean > 0, std / mean, np.inf)
+
+    # Mediana: ordenar los valores dentro de cada serie y tomar el centro
+    ordered = values[np.lexsort((values, group))]
+    median = (ordered[starts + (lengths - 1) // 2] + ordered[starts + lengths // 2]) / 2
+
+    stats = df.loc[starts, ["item_id", "store_id"]].reset_index(drop=True)
+    stats["n_periods"] = lengths
+    stats["non_zero_months"] = np.add.reduceat((values > 0).astype(np.int64), starts) / lengths
+    stats["mean_sales"] = mean
+    stats["median_sales"] = median
+    stats["min_sales"] = np.minimum.reduceat(values, starts)
+    stats["max_sales"] = np.maximum.reduceat(values, starts)
+    stats["std_sales"] = std
+    stats["cv_sales"] = cv
+    if seasonal_period is not None:
+        stats["seasonal_strength"] = _seasonal_strength(values, starts, lengths, group, position, seasonal_period)
+        stats["combined_score"] = stats["seasonal_strength"] * mean
+    return stats[stats["n_periods"] >= min_periods].reset_index(drop=True)
+
+
+def select_series(stats, min_sales_threshold=None, min_median_sales=None, min_sales_value=None, max_cv=None,
+                  min_items_per_store=MIN_ITEMS_PER_STORE, rank_by=RANK_BY):
+    """Series que cumplen los umbrales y, de ellas, las `min_items_per_store` mejores de cada tienda.
+
+    Los umbrales a None no se aplican. Las series se ordenan por tienda y por
+    `rank_by` de mayor a menor; los empates mantienen el orden de `stats`,
+    igual que `nlargest`.
+    """
+    mask = np.ones(len(stats), dtype=bool)
+    if min_sales_threshold is not None:
+        mask &= stats["non_zero_months"].to_numpy() >= min_sales_threshold
+    if min_median_sales is not None:
+        mask &= stats["median_sales"].to_numpy() >= min_median_sales
+    if min_sales_value is not None:
+        mask &= stats["min_sales"].to_numpy() >= min_sales_value
+    if max_cv is not None:
+        mask &= stats["cv_sales"].to_numpy() <= max_cv
+    candidates = stats[mask].reset_index(drop=True)
+
+    stores = pd.factorize(candidates["store_id"].astype(str), sort=True)[0]
+    order = np.lexsort((-candidates[rank_by].to_numpy(dtype=np.float64), stores))
+    stores = stores[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = stores[1:] != stores[:-1]
+    store_start = np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))
+    rank = np.arange(len(order)) - store_start
+    return candidates.iloc[order[rank < min_items_per_store]].reset_index(drop=True)
+
+
+def selection_key(params, store_dir=SALES_STORE_DIR):
+    """Clave de la selección: huella de los agregados mensuales de origen y parámetros."""
+    from pipeline.aggregation import cache_key
+
+    payload = json.dumps({"aggregates": cache_key(store_dir=store_dir), "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def load_selection(min_sales_threshold=None, min_median_sales=None, min_sales_value=None, max_cv=None,
+                   min_items_per_store=MIN_ITEMS_PER_STORE, rank_by=RANK_BY, min_periods=MIN_PERIODS,
+                   store_dir=SALES_STORE_DIR, aggregates_dir=AGGREGATES_CACHE_DIR, cache_dir=SELECTION_CACHE_DIR,
+                   overwrite=False):
+    """Selección de series sobre los agregados mensuales, guardada en caché.
+
+    La primera vez se calculan las estadísticas de todas las series
+    (`series_statistics`) y se seleccionan (`select_series`); el resultado se
+    guarda en Parquet con escritura atómica. Mientras no cambien los agregados
+    ni los parámetros, las siguientes llamadas solo leen ese fichero. Devuelve
+    las series seleccionadas con sus estadísticas.
+    """
+    params = {
+        "min_sales_threshold": min_sales_threshold, "min_median_sales": min_median_sales,
+        "min_sales_value": min_sales_value, "max_cv": max_cv, "min_items_per_store": min_items_per_store,
+        "rank_by": rank_by, "min_periods": min_periods,
+    }
+    path = os.path.join(cache_dir, f"{selection_key(params, store_dir)}.parquet")
+    if os.path.exists(path) and not overwrite:
+        return pd.read_parquet(path)
+
+    from pipeline.aggregation import load_aggregates
+
+    monthly = load_aggregates("monthly", columns=["item_id", "store_id", "month", "sales"], store_dir=store_dir,
+                              cache_dir=aggregates_dir)
+    seasonal_period = 12 if rank_by in SEASONAL_COLUMNS else None
+    stats = series_statistics(monthly, min_periods=min_periods, seasonal_period=seasonal_period)
+    selected = select_series(stats, min_sales_threshold, min_median_sales, min_sales_value, max_cv,
+                             min_items_per_store, rank_by)
+    os.makedirs(cache_dir, exist_ok=True)
+    selected.to_parquet(f"{path}.tmp", index=False)
+    os.replace(f"{path}.tmp", path)
+    return selected
+
+
+def selected_pairs(selection):
+    """Lista de pares (`item_id`, `store_id`) de una selección (para `pairs=` en la predicción)."""
+    return list(zip(selection["item_id"].astype(str), selection["store_id"].astype(str)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Selecciona las series predecibles a partir de los agregados mensuales.")
+    parser.add_argument("--min-sales-threshold", type=float, default=0.2, help="Proporción mínima de meses con ventas")
+    parser.add_argument("--min-median-sales", type=float, default=None)
+    parser.add_argument("--min-sales-value", type=float, default=None)
+    parser.add_argument("--max-cv", type=float, default=None)
+    parser.add_argument("--min-items-per-store", type=int, default=MIN_ITEMS_PER_STORE)
+    parser.add_argument("--rank-by", default=RANK_BY, choices=STAT_COLUMNS + SEASONAL_COLUMNS)
+    parser.add_argument("--overwrite", action="store_true", help="Recalcular aunque exista la caché")
+    args = parser.parse_args()
+
+    selection = load_selection(args.min_sales_threshold, args.min_median_sales, args.min_sales_value, args.max_cv,
+                               args.min_items_per_store, args.rank_by, overwrite=args.overwrite)
+    print(f"{len(selection)} series seleccionadas en {selection['store_id'].nunique()} tiendas")
+    print(selection.head(10).to_string(index=False))
@@ -0,0 +1,75 @@
+"""Índice de series (producto, tienda) para consultar el histórico sin recorrer todo el DataFrame.
+
+La app filtraba `Final_XGBoost_data_processed.csv` en cada interacción con
+`data[(data['store_id'] == tienda) & (data['item_id'] == producto)].copy()`:
+una máscara booleana sobre todas las filas y una copia, repetidas para cada
+par en el informe. `SeriesIndex` ordena los datos una sola vez por serie y
+periodo, guarda cada columna como un array de NumPy contiguo y un diccionario
+(`item_id`, `store_id`) -> (inicio, fin). Consultar una serie es una búsqueda
+en el diccionario y unas vistas (slices) de los arrays, sin copiar datos, con
+un coste que no depende del número de filas del CSV.
+
+La app construye el índice una sola vez a partir del histórico
+(`get_series_index`) y lo usa para la serie del gráfico de la predicción
+recursiva; las predicciones del panel y del informe se leen de la tabla
+materializada de `pipeline.forecast_store`.
+"""
+import numpy as np
+import pandas as pd
+
+from pipeline.features import series_layout, sort_series
+
+
+class SeriesIndex:
+    """Histórico indexado por serie: columnas contiguas y rangos de filas por (`item_id`, `store_id`)."""
+
+    def __init__(self, df, period_col="month"):
+        df = sort_series(df, period_col)
+        starts, lengths, _, _ = series_layout(df)
+        self.period_col = period_col
+        self.columns = list(df.columns)
+        self.arrays = {col: np.ascontiguousarray(df[col].to_numpy()) for col in self.columns}
+        items = self.arrays["item_id"][starts]
+        stores = self.arrays["store_id"][starts]
+        self.ranges = {
+            (item_id, store_id): (start, start + length)
+            for item_id, store_id, start, length in zip(items, stores, starts.tolist(), lengths.tolist())
+        }
+
+    def __len__(self):
+        return len(self.ranges)
+
+    def __contains__(self, key):
+        return key in self.ranges
+
+    def keys(self):
+        return self.ranges.keys()
+
+    def arrays_for(self, item_id, store_id, columns=None):
+        """Diccionario columna -> vista (sin copia) de las filas de la serie; None si no existe."""
+        bounds = self.ranges.get((item_id, store_id))
+        if bounds is None:
+            return None
+        start, stop = bounds
+        return {col: self.arrays[col][start:stop] for col in (columns or self.columns)}
+
+    def frame(self, item_id, store_id, columns=None):
+        """DataFrame de la serie ordenado por periodo (vacío si no existe), construido sobre las vistas."""
+        arrays = self.arrays_for(item_id, store_id, columns)
+        if arrays is None:
+            return pd.DataFrame(columns=columns or self.columns)
+        return pd.DataFrame(arrays, copy=False)
+
+    def select(self, pairs=None, columns=None):
+        """DataFrame con las filas de varias series (o de todas) reunidas en una sola indexación.
+
+        Las series que no están en el índice se ignoran.
+        """
+        columns = columns or self.columns
+        if pairs is None:
+            return pd.DataFrame({col: self.arrays[col] for col in columns}, copy=False)
+        bounds = [self.ranges[key] for key in pairs if key in self.ranges]
+        if not bounds:
+            return pd.DataFrame(columns=columns)
+        rows = np.concatenate([np.arange(start, stop) for start, stop in bounds])
+        return pd.DataFrame({col: self.arrays[col][rows] for col in columns})
@@ -0,0 +1,364 @@
+"""Servicio HTTP local de predicción, sin Streamlit.
+
+Expone las predicciones de los modelos por serie (los `.sav` empaquetados en
+`pipeline.registry`) con las características de
+`Final_XGBoost_data_processed.csv`, para que otros procesos (p. ej. los
+trabajos de reposición) las pidan sin pasar por la app:
+
+- `GET  /forecast?item_id=...&store_id=...&month=2016-05`: una predicción;
+- `POST /forecast` con `{"keys": [{"item_id": ..., "store_id": ..., "month": ...}, ...]}`:
+  varias predicciones;
+- `GET  /metrics`: peticiones, claves, lotes, latencias (p50/p99), rendimiento
+  y contadores de la caché de modelos;
+- `GET  /health`.
+
+Las peticiones que llegan dentro de una ventana corta (`batch_window`) se
+agrupan en un solo lote (`MicroBatcher`) y se hace una llamada a `predict`
+por modelo con todas las claves de ese modelo. Las filas de características
+de cada mes se calculan una vez para todas las series (`forecast_features`),
+solo para los meses del histórico y el siguiente, y se guardan las de los
+últimos `FEATURE_CACHE_MONTHS` meses pedidos. Los modelos se guardan en una
+caché con presupuesto de memoria (`pipeline.model_cache`), precargando al
+arrancar los más consultados.
+
+`ForecastServer` arranca el servicio en un hilo del propio proceso (para
+pruebas); `python -m pipeline.service` lo arranca en primer plano.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FEATURE_COLUMNS
+from pipeline.forecast import forecast_features, load_history, month_start
+from pipeline.model_cache import DEFAULT_MAX_BYTES, ModelCache, registry_footprint
+from pipeline.paths import MODEL_USAGE_PATH, PROCESSED_DATA_PATH
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+BATCH_WINDOW = 0.005  # segundos que se esperan para juntar peticiones en un lote
+MAX_BATCH_KEYS = 4096
+LATENCY_WINDOW = 10_000  # últimas latencias que se guardan para los percentiles
+FEATURE_CACHE_MONTHS = 4  # meses de características que se guardan en memoria (LRU)
+LISTEN_BACKLOG = 128  # con el valor por defecto (5) los clientes concurrentes esperan reintentos de conexión de 1 s
+
+
+class ForecastMetrics:
+    """Contadores y latencias del servicio (seguros entre hilos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.keys = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched_keys = 0
+        self.predict_calls = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_request(self, n_keys, seconds, failed=False):
+        with self._lock:
+            self.requests += 1
+            self.keys += n_keys
+            self.errors += int(failed)
+            self.latencies.append(seconds)
+
+    def record_batch(self, n_keys, n_predict_calls):
+        with self._lock:
+            self.batches += 1
+            self.batched_keys += n_keys
+            self.predict_calls += n_predict_calls
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self.latencies) * 1000
+            uptime = time.time() - self.started
+            return {
+                "uptime_s": round(uptime, 3),
+                "requests": self.requests,
+                "keys": self.keys,
+                "errors": self.errors,
+                "batches": self.batches,
+                "mean_batch_keys": round(self.batched_keys / self.batches, 2) if self.batches else 0.0,
+                "predict_calls": self.predict_calls,
+                "latency_p50_ms": round(float(np.percentile(latencies, 50)), 3) if len(latencies) else None,
+                "latency_p99_ms": round(float(np.percentile(latencies, 99)), 3) if len(latencies) else None,
+                "requests_per_s": round(self.requests / uptime, 2) if uptime > 0 else 0.0,
+                "keys_per_s": round(self.keys / uptime, 2) if uptime > 0 else 0.0,
+            }
+
+
+class ForecastService:
+    """Predicción por lotes de claves (`item_id`, `store_id`, `month`) con caché de modelos y de características.
+
+    Sin `model_cache` se crea una `ModelCache` de `DEFAULT_MAX_BYTES` sobre
+    `registry.load_predictor`, que mide cada modelo con su longitud en el manifiesto.
+    """
+
+    def __init__(self, history=None, registry=None, data_path=PROCESSED_DATA_PATH, model_cache=None):
+        if registry is None:
+            from pipeline.registry import open_registry
+
+            registry = open_registry()
+        self.registry = registry
+        self.history = load_history(data_path) if history is None else history
+        self.metrics = ForecastMetrics()
+        self._features = OrderedDict()
+        # Meses que se pueden pedir: los del histórico y el siguiente al último
+        months = pd.to_datetime(self.history["month"])
+        self.first_month = month_start(months.min())
+        self.last_month = month_start(months.max()) + pd.offsets.MonthBegin(1)
+        self.models = model_cache or ModelCache(registry.load_predictor, sizeof=registry_footprint(registry))
+        self._lock = threading.Lock()
+
+    def _month_features(self, month):
+        # Filas de características de un mes para todas las series; se guardan los últimos meses usados
+        if month in self._features:
+            self._features.move_to_end(month)
+            return self._features[month]
+        rows = forecast_features(self.history, month)
+        index = {key: i for i, key in enumerate(zip(rows["item_id"], rows["store_id"]))}
+        self._features[month] = (index, rows[FEATURE_COLUMNS].to_numpy(dtype=np.float32),
+                                 rows["real_sales"].to_numpy(dtype=np.float64))
+        while len(self._features) > FEATURE_CACHE_MONTHS:
+            self._features.popitem(last=False)
+        return self._features[month]
+
+    def predict(self, keys):
+        """Predicciones de una lista de claves `(item_id, store_id, month)`, en el mismo orden.
+
+        Cada resultado es un diccionario con `item_id`, `store_id`, `month`,
+        `predicted_sales`, `real_sales` y `model_version`, o con `error` si
+        el mes no es válido o está fuera del histórico (más el mes siguiente),
+        si no hay modelo o características para esa clave o si su modelo falla
+        al cargarse o al predecir (el resto de claves del lote no se ven afectadas).
+        """
+        results = [None] * len(keys)
+        by_model = {}
+        with self._lock:
+            for position, (item_id, store_id, month) in enumerate(keys):
+                result = {"item_id": item_id, "store_id": store_id}
+                try:
+                    target = month_start(month)
+                    result["month"] = target.strftime("%Y-%m")
+                except (ValueError, TypeError):
+                    results[position] = {**result, "month": month, "error": "Mes no válido"}
+                    continue
+                if not self.first_month <= target <= self.last_month:
+                    results[position] = {**result, "error": "Mes fuera del rango del histórico"}
+                    continue
+                index, X, real = self._month_features(target)
+                row = index.get((item_id, store_id))
+                if (item_id, store_id) not in self.registry:
+                    results[position] = {**result, "error": "No hay modelo para esta serie"}
+                elif row is None:
+                    results[position] = {**result, "error": "No hay características para este mes"}
+                else:
+                    results[position] = result
+                    by_model.setdefault((item_id, store_id), []).append((position, X[row], real[row]))
+
+            for (item_id, store_id), items in by_model.items():
+                # Un modelo dañado o que falta solo afecta a sus claves, no al resto del lote
+                try:
+                    predicted = np.expm1(self.models.get(item_id, store_id).predict(np.stack([x for _, x, _ in items])))
+                    version = self.registry.entry(item_id, store_id)["version"]
+                except Exception as e:
+                    for position, _, _ in items:
+                        results[position]["error"] = f"Error al predecir con el modelo: {e}"
+                    continue
+                for (position, _, real), value in zip(items, predicted):
+                    results[position].update({
+                        "predicted_sales": float(value),
+                        "real_sales": None if np.isnan(real) else float(real),
+                        "model_version": version,
+                    })
+        self.metrics.record_batch(len(keys), len(by_model))
+        return results
+
+
+class MicroBatcher:
+    """Junta las claves de las peticiones que llegan dentro de `window` segundos en una sola llamada a `predict`."""
+
+    def __init__(self, service, window=BATCH_WINDOW, max_keys=MAX_BATCH_KEYS):
+        self.service = service
+        self.window = window
+        self.max_keys = max_keys
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="forecast-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, keys):
+        """Encola las claves de una petición y devuelve un Future con sus resultados."""
+        future = Future()
+        self._queue.put((list(keys), future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            if pending[0] is None:
+                return
+            n_keys = len(pending[0][0])
+            deadline = time.perf_counter() + self.window
+            while n_keys < self.max_keys:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                pending.append(item)
+                n_keys += len(item[0])
+
+            keys = [key for request_keys, _ in pending for key in request_keys]
+            try:
+                results = self.service.predict(keys)
+            except Exception as e:
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            start = 0
+            for request_keys, future in pending:
+                future.set_result(results[start:start + len(request_keys)])
+                start += len(request_keys)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class _ForecastHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = LISTEN_BACKLOG
+
+
+def _make_handler(service, batcher):
+    class ForecastHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass  # sin una línea de log por petición
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _forecast(self, keys):
+            start = time.perf_counter()
+            try:
+                results = batcher.submit(keys).result()
+            except Exception as e:
+                service.metrics.record_request(len(keys), time.perf_counter() - start, failed=True)
+                self._send(500, {"error": str(e)})
+                return
+            service.metrics.record_request(len(keys), time.perf_counter() - start)
+            self._send(200, {"forecasts": results})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/health":
+                self._send(200, {"status": "ok", "models": len(service.registry)})
+            elif url.path == "/metrics":
+                self._send(200, {**service.metrics.snapshot(), "model_cache": service.models.stats()})
+            elif url.path == "/forecast":
+                params = {name: values[0] for name, values in parse_qs(url.query).items()}
+                missing = [name for name in ("item_id", "store_id", "month") if name not in params]
+                if missing:
+                    self._send(400, {"error": f"Faltan los parámetros: {missing}"})
+                    return
+                self._forecast([(params["item_id"], params["store_id"], params["month"])])
+            else:
+                self._send(404, {"error": "Ruta no encontrada"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/forecast":
+                self._send(404, {"error": "Ruta no encontrada"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                keys = [(key["item_id"], key["store_id"], key["month"]) for key in body["keys"]]
+            except (ValueError, KeyError, TypeError):
+                self._send(400, {"error": 'El cuerpo debe ser {"keys": [{"item_id", "store_id", "month"}, ...]}'})
+                return
+            self._forecast(keys)
+
+    return ForecastHandler
+
+
+class ForecastServer:
+    """Servidor HTTP de predicción que se puede arrancar en un hilo del propio proceso.
+
+    `port=0` elige un puerto libre; la URL queda en `url`. También se puede
+    usar como gestor de contexto (`with ForecastServer() as server: ...`).
+    """
+
+    def __init__(self, service=None, host=DEFAULT_HOST, port=DEFAULT_PORT, batch_window=BATCH_WINDOW):
+        self.service = service or ForecastService()
+        self.batcher = MicroBatcher(self.service, batch_window)
+        self.httpd = _ForecastHTTPServer((host, port), _make_handler(self.service, self.batcher))
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="forecast-http", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.batcher.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servicio HTTP local de predicción de demanda.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--batch-window", type=float, default=BATCH_WINDOW, help="Segundos para agrupar peticiones")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH)
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_MAX_BYTES / 2**20, help="Presupuesto de la caché de modelos")
+    parser.add_argument("--cache-policy", choices=["lru", "lfu"], default="lru")
+    args = parser.parse_args()
+
+    from pipeline.registry import open_registry
+
+    registry = open_registry()
+    cache = ModelCache(registry.load_predictor, int(args.cache_mb * 2**20), args.cache_policy,
+                       sizeof=registry_footprint(registry), usage_path=MODEL_USAGE_PATH)
+    warmed = cache.warm()
+    service = ForecastService(registry=registry, data_path=args.data, model_cache=cache)
+    server = ForecastServer(service, args.host, args.port, args.batch_window)
+    print(f"Servicio de predicción en {server.url} ({warmed} modelos precargados; Ctrl+C para parar)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        cache.save_usage()
@@ -0,0 +1,242 @@
+"""Almacén columnar de `total_data.csv`.
+
+`convert_total_data` transforma una sola vez el CSV unido (ventas + calendario +
+precios) en un dataset Parquet tipado y particionado por `store_id` (y
+opcionalmente por `year`). Después, `read_sales` / `iter_sales` leen solo las
+columnas y particiones necesarias, empujando los filtros de tienda, producto y
+fechas al lector en lugar de volver a parsear los ~58M de filas del CSV.
+`append_sales` añade un periodo nuevo como ficheros adicionales de cada
+partición, sin reescribir los anteriores.
+"""
+import argparse
+import os
+import shutil
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from pipeline.paths import SALES_STORE_DIR, TOTAL_DATA_PATH
+from pipeline.schema import TOTAL_DATA_SCHEMA, iter_typed
+
+# Tipos de cada columna de total_data.csv dentro del almacén
+SALES_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("item_id", pa.string()),
+    ("dept_id", pa.string()),
+    ("cat_id", pa.string()),
+    ("store_id", pa.string()),
+    ("state_id", pa.string()),
+    ("d", pa.string()),
+    ("sales", pa.int16()),
+    ("date", pa.date32()),
+    ("wm_yr_wk", pa.int16()),
+    ("weekday", pa.string()),
+    ("wday", pa.int8()),
+    ("month", pa.int8()),
+    ("year", pa.int16()),
+    ("event_name_1", pa.string()),
+    ("event_type_1", pa.string()),
+    ("event_name_2", pa.string()),
+    ("event_type_2", pa.string()),
+    ("snap_CA", pa.int8()),
+    ("snap_TX", pa.int8()),
+    ("snap_WI", pa.int8()),
+    ("sell_price", pa.float32()),
+])
+
+# Columnas que se devuelven como category al leer (pocos valores distintos)
+CATEGORICAL_COLUMNS = [
+    "id", "item_id", "dept_id", "cat_id", "store_id", "state_id", "d", "weekday",
+    "event_name_1", "event_type_1", "event_name_2", "event_type_2",
+]
+
+
+def _partition_fields(partition_by_year):
+    return ["store_id", "year"] if partition_by_year else ["store_id"]
+
+
+def _chunk_to_table(chunk, file_schema):
+    # Convertir un chunk a una tabla Arrow con el esquema del almacén
+    chunk = chunk.copy()
+    chunk["date"] = pd.to_datetime(chunk["date"]).dt.date
+    chunk["sales"] = chunk["sales"].round().astype("int64")
+    for col in CATEGORICAL_COLUMNS:
+        if col in chunk.columns and chunk[col].dtype == "category":
+            chunk[col] = chunk[col].astype(object)
+    return pa.Table.from_pandas(chunk[file_schema.names], schema=file_schema, preserve_index=False)
+
+
+class SalesStoreWriter:
+    """Escribe DataFrames con las columnas de total_data en el almacén particionado.
+
+    Mantiene un `ParquetWriter` abierto por partición, así que se puede alimentar
+    bloque a bloque (chunks del CSV o bloques del builder) sin acumular datos en memoria.
+    """
+
+    def __init__(self, store_dir=SALES_STORE_DIR, partition_by_year=False, overwrite=True):
+        if os.path.exists(store_dir):
+            if not overwrite:
+                raise FileExistsError(f"Ya existe el almacén en: {store_dir}")
+            shutil.rmtree(store_dir)
+        os.makedirs(store_dir, exist_ok=True)
+        self.store_dir = store_dir
+        self.partition_fields = _partition_fields(partition_by_year)
+        self.file_schema = pa.schema([field for field in SALES_SCHEMA if field.name not in self.partition_fields])
+        self.writers = {}
+        self.rows = 0
+
+    def write(self, df):
+        for keys, group in df.groupby(self.partition_fields, sort=False, observed=True):
+            keys = keys if isinstance(keys, tuple) else (keys,)
+            if keys not in self.writers:
+                partition_dir = os.path.join(
+                    self.store_dir, *[f"{field}={value}" for field, value in zip(self.partition_fields, keys)]
+                )
+                os.makedirs(partition_dir, exist_ok=True)
+                self.writers[keys] = pq.ParquetWriter(
+                    os.path.join(partition_dir, "part-0.parquet"), self.file_schema, compression="zstd"
+                )
+            self.writers[keys].write_table(_chunk_to_table(group, self.file_schema))
+        self.rows += len(df)
+
+    def close(self):
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def convert_total_data(csv_path=TOTAL_DATA_PATH, store_dir=SALES_STORE_DIR, chunk_size=1_000_000,
+                       partition_by_year=False, overwrite=True):
+    """Convierte `total_data.csv` en el dataset Parquet particionado.
+
+    Se lee el CSV en chunks ya tipados (`pipeline.schema`) y cada partición (`store_id=CA_1/` o
+    `store_id=CA_1/year=2011/`) se escribe con su propio `ParquetWriter`, de modo
+    que la memoria queda acotada por `chunk_size`. Devuelve el número de filas escritas.
+    """
+    with SalesStoreWriter(store_dir, partition_by_year=partition_by_year, overwrite=overwrite) as writer:
+        for chunk in iter_typed(csv_path, TOTAL_DATA_SCHEMA, chunksize=chunk_size):
+            writer.write(chunk)
+    return writer.rows
+
+
+def _open_dataset(store_dir):
+    if not os.path.isdir(store_dir):
+        raise FileNotFoundError(
+            f"No se encontró el almacén columnar en: {store_dir}. Ejecuta antes convert_total_data()."
+        )
+    return ds.dataset(store_dir, format="parquet", partitioning="hive")
+
+
+def _build_filter(stores=None, items=None, start=None, end=None):
+    # Construir la expresión de filtrado que pyarrow empuja al lector
+    expression = None
+    conditions = []
+    if stores is not None:
+        conditions.append(ds.field("store_id").isin(list(stores)))
+    if items is not None:
+        conditions.append(ds.field("item_id").isin(list(items)))
+    if start is not None:
+        conditions.append(ds.field("date") >= pa.scalar(pd.Timestamp(start).date(), pa.date32()))
+    if end is not None:
+        conditions.append(ds.field("date") <= pa.scalar(pd.Timestamp(end).date(), pa.date32()))
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def _to_pandas(table):
+    df = table.to_pandas(date_as_object=False)
+    if "date" in df.columns:
+        df["date"] = df["date"].astype("datetime64[ns]")
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and df[col].dtype != "category":
+            df[col] = df[col].astype("category")
+    if "year" in df.columns:
+        df["year"] = df["year"].astype("int16")
+    return df
+
+
+def read_sales(columns=None, stores=None, items=None, start=None, end=None, store_dir=SALES_STORE_DIR):
+    """Lee del almacén solo las columnas y particiones pedidas.
+
+    `stores` e `items` son listas de `store_id` / `item_id`; `start` y `end`
+    delimitan el rango de fechas (ambos incluidos).
+    """
+    dataset = _open_dataset(store_dir)
+    table = dataset.to_table(columns=columns, filter=_build_filter(stores, items, start, end))
+    return _to_pandas(table)
+
+
+def iter_sales(columns=None, stores=None, items=None, start=None, end=None, batch_size=1_000_000,
+               store_dir=SALES_STORE_DIR):
+    """Igual que `read_sales` pero devolviendo DataFrames de como mucho `batch_size` filas."""
+    dataset = _open_dataset(store_dir)
+    scanner = dataset.scanner(
+        columns=columns, filter=_build_filter(stores, items, start, end), batch_size=batch_size
+    )
+    for batch in scanner.to_batches():
+        if batch.num_rows:
+            yield _to_pandas(pa.Table.from_batches([batch]))
+
+
+def append_sales(df, store_dir=SALES_STORE_DIR):
+    """Añade al almacén las filas diarias de un periodo nuevo sin reescribir las existentes.
+
+    `df` tiene las columnas de total_data. Las filas de cada partición se
+    escriben en un fichero nuevo `part-<fecha inicial>.parquet` (temporal y
+    renombrado, de forma atómica) junto a los ya existentes; la partición por
+    año se detecta en las carpetas del almacén. Devuelve las rutas escritas.
+    """
+    if not os.path.isdir(store_dir):
+        raise FileNotFoundError(f"No se encontró el almacén columnar en: {store_dir}")
+    stores = list_stores(store_dir)
+    partition_by_year = bool(stores) and any(
+        name.startswith("year=") for name in os.listdir(os.path.join(store_dir, f"store_id={stores[0]}"))
+    )
+    partition_fields = _partition_fields(partition_by_year)
+    file_schema = pa.schema([field for field in SALES_SCHEMA if field.name not in partition_fields])
+    name = f"part-{pd.to_datetime(df['date']).min():%Y%m%d}.parquet"
+
+    written = []
+    for keys, group in df.groupby(partition_fields, sort=True, observed=True):
+        keys = keys if isinstance(keys, tuple) else (keys,)
+        partition_dir = os.path.join(store_dir, *[f"{field}={value}" for field, value in zip(partition_fields, keys)])
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, name)
+        if os.path.exists(path):
+            raise FileExistsError(f"El periodo ya está en el almacén: {path}")
+        # El temporal empieza por "." para que pyarrow lo ignore si queda a medias
+        tmp_path = os.path.join(partition_dir, f".{name}.tmp")
+        pq.write_table(_chunk_to_table(group, file_schema), tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+        written.append(path)
+    return written
+
+
+def list_stores(store_dir=SALES_STORE_DIR):
+    """Devuelve las tiendas disponibles leyendo solo los nombres de las particiones."""
+    if not os.path.isdir(store_dir):
+        raise FileNotFoundError(f"No se encontró el almacén columnar en: {store_dir}")
+    return sorted(
+        name.split("=", 1)[1] for name in os.listdir(store_dir) if name.startswith("store_id=")
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convierte total_data.csv en un dataset Parquet particionado.")
+    parser.add_argument("--csv", default=TOTAL_DATA_PATH, help="Ruta de total_data.csv")
+    parser.add_argument("--out", default=SALES_STORE_DIR, help="Directorio de salida del almacén")
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--by-year", action="store_true", help="Particionar también por año")
+    args = parser.parse_args()
+
+    rows = convert_total_data(args.csv, args.out, chunk_size=args.chunk_size, partition_by_year=args.by_year)
+    print(f"Almacén creado en {args.out} con {rows:,} filas")
@@ -0,0 +1,316 @@
+"""Entrenamiento paralelo y reanudable de los modelos XGBoost por serie.
+
+Sustituye al bucle de `models_data_monthly.ipynb` que, serie a serie, lanzaba
+`GridSearchCV(XGBRegressor(n_jobs=-1), ..., n_jobs=-1)`: dos pools con todos
+los núcleos anidados y, por fuera, un bucle de 200 series en un solo hilo.
+
+- Las series se reparten entre `workers` procesos y cada proceso usa como mucho
+  `threads_per_worker` hilos (XGBoost, OpenMP y BLAS), sin paralelismo anidado.
+- Al terminar cada serie se guarda el modelo (`Final_model_XGBOOST_<item>_<store>.sav`)
+  y, después, su estado (métricas, mejores parámetros y huellas) en
+  `MODELS_DIR/training_state/`, ambos con escritura atómica.
+- Si la huella de los datos de la serie y la de la configuración no han
+  cambiado desde la última ejecución, la serie se salta; así, tras un fallo
+  basta con volver a lanzar el entrenamiento para continuar donde se quedó.
+
+Con `search='grid'` se usa la rejilla completa con `GridSearchCV`, como hasta
+ahora; con `search='halving'` la búsqueda con presupuesto de
+`pipeline.search`, sembrada con las mejores configuraciones de otras series
+del mismo departamento y tienda.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from pipeline.features import FEATURE_COLUMNS
+from pipeline.paths import MODELS_DIR, PROCESSED_DATA_PATH
+from pipeline.schema import read_processed
+from pipeline.search import (
+    DEFAULT_BUDGET, DEFAULT_ETA, EARLY_STOPPING_ROUNDS, TOP_CONFIGS, budgeted_search, series_cluster,
+)
+
+# Misma rejilla que usaba el notebook
+PARAM_GRID = {
+    "n_estimators": [100, 200],
+    "max_depth": [5, 10],
+    "learning_rate": [0.01, 0.1],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+
+DEFAULT_CONFIG = {
+    "param_grid": PARAM_GRID,
+    "cv": 3,
+    "scoring": "neg_mean_squared_error",
+    "features": FEATURE_COLUMNS,
+    "holdout_last": True,  # entrenar sin el último mes y evaluarlo, como en el notebook
+    "random_state": 42,
+    "search": "grid",  # 'grid' (rejilla completa) o 'halving' (búsqueda con presupuesto)
+    "budget": DEFAULT_BUDGET,
+    "eta": DEFAULT_ETA,
+    "early_stopping_rounds": EARLY_STOPPING_ROUNDS,
+}
+
+SEARCH_MODES = ("grid", "halving")
+
+STATE_DIRNAME = "training_state"
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]
+
+
+def model_path(item_id, store_id, models_dir=MODELS_DIR):
+    return os.path.join(models_dir, f"Final_model_XGBOOST_{item_id}_{store_id}.sav")
+
+
+def _state_path(item_id, store_id, models_dir):
+    return os.path.join(models_dir, STATE_DIRNAME, f"{item_id}_{store_id}.json")
+
+
+def config_fingerprint(config):
+    """Huella de la configuración de entrenamiento."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def data_fingerprint(group, columns):
+    """Huella del contenido de una serie (las columnas usadas para entrenar).
+
+    Los valores se pasan a float32 (la precisión con la que entrena XGBoost y
+    la de `pipeline.schema.read_processed`) antes de calcular la huella, así que
+    no depende de cómo se haya leído el CSV (`pd.read_csv` o `read_processed`).
+    """
+    values = np.ascontiguousarray(group[columns].to_numpy(dtype=np.float32))
+    return hashlib.sha256(values.tobytes()).hexdigest()
+
+
+def load_state(item_id, store_id, models_dir=MODELS_DIR):
+    """Estado guardado de una serie o None si no se ha entrenado nunca."""
+    path = _state_path(item_id, store_id, models_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _atomic_write(path, write):
+    # Escribir en un temporal y renombrar: un fallo a mitad nunca deja un fichero corrupto
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _limit_threads(threads):
+    # Inicializador de cada proceso: fija el presupuesto de hilos antes de que se cree cualquier pool
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+
+def _grid_search(X_train, y_train, config, threads):
+    from sklearn.model_selection import GridSearchCV
+    from xgboost import XGBRegressor
+
+    model = XGBRegressor(random_state=config["random_state"], n_jobs=threads)
+    search = GridSearchCV(model, config["param_grid"], cv=config["cv"], scoring=config["scoring"], n_jobs=1)
+    search.fit(X_train, y_train)
+    ranking = np.argsort(search.cv_results_["rank_test_score"], kind="stable")
+    metrics = {"best_params": search.best_params_, "cv_score": float(search.best_score_),
+               "fits": int(len(search.cv_results_["params"]) * config["cv"]),
+               "top_params": [search.cv_results_["params"][i] for i in ranking[:TOP_CONFIGS]]}
+    return search.best_estimator_, metrics
+
+
+def _budgeted_search(X_train, y_train, config, threads, seeds):
+    from xgboost import XGBRegressor
+
+    metrics = budgeted_search(
+        X_train, y_train, config["param_grid"], budget=config["budget"], eta=config["eta"], n_splits=config["cv"],
+        seeds=seeds, early_stopping_rounds=config["early_stopping_rounds"], random_state=config["random_state"],
+        threads=threads,
+    )
+    model = XGBRegressor(**metrics["best_params"], random_state=config["random_state"], n_jobs=threads)
+    model.fit(X_train, y_train)
+    return model, metrics
+
+
+def fit_series(group, config, threads=1, seeds=None):
+    """Ajusta el modelo de una serie en un solo nivel de paralelismo.
+
+    La búsqueda de hiperparámetros depende de `config['search']` ('grid' o
+    'halving'; `seeds` solo se usa con 'halving'). Devuelve `(modelo,
+    métricas)`. Con `holdout_last` el último mes queda fuera del entrenamiento
+    y se usa para calcular el error, igual que en el notebook.
+    """
+    if config["search"] not in SEARCH_MODES:
+        raise ValueError(f"Modo de búsqueda no válido: {config['search']}. Opciones: {SEARCH_MODES}")
+
+    X = group[config["features"]]
+    y = np.log1p(group["sales"].to_numpy(dtype=np.float64))
+    if config["holdout_last"]:
+        X_train, y_train, X_test, y_test = X.iloc[:-1], y[:-1], X.iloc[-1:], y[-1]
+    else:
+        X_train, y_train, X_test, y_test = X, y, None, None
+
+    if config["search"] == "grid":
+        model, metrics = _grid_search(X_train, y_train, config, threads)
+    else:
+        model, metrics = _budgeted_search(X_train, y_train, config, threads, seeds)
+
+    if X_test is not None:
+        real = float(np.expm1(y_test))
+        predicted = float(np.expm1(model.predict(X_test)[0]))
+        metrics.update({"real_sales": real, "predicted_sales": predicted, "abs_error": abs(real - predicted)})
+    return model, metrics
+
+
+def _train_task(item_id, store_id, group, config, config_hash, data_hash, models_dir, threads, seeds=None):
+    # Trabajo de cada proceso: entrenar, guardar el modelo y después el estado
+    start = time.perf_counter()
+    state = {
+        "item_id": item_id, "store_id": store_id,
+        "config_fingerprint": config_hash, "data_fingerprint": data_hash,
+        "month": str(group["month"].iloc[-1]) if "month" in group.columns else None,
+    }
+    try:
+        model, metrics = fit_series(group, config, threads, seeds)
+        _atomic_write(model_path(item_id, store_id, models_dir), lambda path: joblib.dump(model, path))
+        state.update(metrics, status="ok")
+    except Exception as e:
+        state.update(status="failed", error=f"{type(e).__name__}: {e}")
+    state["seconds"] = round(time.perf_counter() - start, 3)
+    state["finished"] = datetime.now().isoformat(timespec="seconds")
+    _atomic_write(_state_path(item_id, store_id, models_dir), lambda path: _write_json(path, state))
+    return state
+
+
+def _write_json(path, data):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, default=str)
+
+
+def _is_up_to_date(state, config_hash, data_hash, models_dir):
+    return (
+        state is not None
+        and state.get("status") == "ok"
+        and state.get("config_fingerprint") == config_hash
+        and state.get("data_fingerprint") == data_hash
+        and os.path.exists(model_path(state["item_id"], state["store_id"], models_dir))
+    )
+
+
+def _run_tasks(tasks, config, config_hash, models_dir, workers, threads_per_worker, seeds, verbose):
+    # Entrena `tasks` en el pool de procesos; `seeds` es cluster -> configuraciones con las que sembrar
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_threads,
+                             initargs=(threads_per_worker,)) as pool:
+        futures = [
+            pool.submit(_train_task, item_id, store_id, group, config, config_hash, data_hash,
+                        models_dir, threads_per_worker, seeds.get(series_cluster(item_id, store_id)))
+            for item_id, store_id, group, data_hash in tasks
+        ]
+        for done, future in enumerate(as_completed(futures), 1):
+            state = future.result()
+            results.append(state)
+            if verbose and state["status"] == "failed":
+                print(f"No se pudo entrenar {state['item_id']}_{state['store_id']}: {state['error']}")
+            if verbose and (done % 20 == 0 or done == len(futures)):
+                print(f"  {done}/{len(futures)} series entrenadas ({time.perf_counter() - start:.1f}s)")
+    return results
+
+
+def _add_seeds(seeds, state):
+    # Acumula las mejores configuraciones de una serie en las semillas de su cluster
+    if state is None or state.get("status") not in ("ok", "skipped"):
+        return
+    cluster = seeds.setdefault(series_cluster(state["item_id"], state["store_id"]), [])
+    for params in state.get("top_params") or []:
+        if params not in cluster:
+            cluster.append(params)
+    del cluster[:-TOP_CONFIGS]  # quedarse con las más recientes
+
+
+def train_all_series(df, config=None, models_dir=MODELS_DIR, workers=None, threads_per_worker=1,
+                     force=False, verbose=True):
+    """Entrena (o reutiliza) el modelo de cada serie de `df` en paralelo.
+
+    `df` es la salida de `build_features` (una fila por serie y mes). Las series
+    cuyo estado guardado tiene la misma huella de datos y de configuración se
+    saltan salvo que `force` sea True. `workers` es el número de procesos (por
+    defecto, núcleos // `threads_per_worker`).
+
+    Con `config['search'] == 'halving'` el entrenamiento va en dos fases: primero
+    una serie por cluster (departamento y tienda) y después el resto, sembradas
+    con las mejores configuraciones de su cluster (de esta ejecución o de los
+    estados guardados). Devuelve un DataFrame con el estado de cada serie
+    (`status` es 'ok', 'skipped' o 'failed').
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    if config["search"] not in SEARCH_MODES:
+        raise ValueError(f"Modo de búsqueda no válido: {config['search']}. Opciones: {SEARCH_MODES}")
+    config_hash = config_fingerprint(config)
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+    columns = ["sales"] + list(config["features"])
+    pending, results, seeds = [], [], {}
+    for (item_id, store_id), group in df.sort_values("month").groupby(["item_id", "store_id"], observed=True):
+        data_hash = data_fingerprint(group, columns)
+        state = load_state(item_id, store_id, models_dir)
+        if not force and _is_up_to_date(state, config_hash, data_hash, models_dir):
+            results.append({**state, "status": "skipped"})
+        else:
+            pending.append((item_id, store_id, group.reset_index(drop=True), data_hash))
+        _add_seeds(seeds, state)
+
+    if verbose:
+        print(f"Series: {len(pending) + len(results)} | por entrenar: {len(pending)} | "
+              f"sin cambios: {len(results)} | procesos: {workers} x {threads_per_worker} hilos")
+
+    if config["search"] == "halving":
+        # Fase 1: una serie por cluster sin semillas previas
+        leaders, followers, seen = [], [], set(seeds)
+        for task in pending:
+            cluster = series_cluster(task[0], task[1])
+            (followers if cluster in seen else leaders).append(task)
+            seen.add(cluster)
+        phases = [leaders, followers]
+    else:
+        phases = [pending]
+
+    for tasks in phases:
+        if not tasks:
+            continue
+        states = _run_tasks(tasks, config, config_hash, models_dir, workers, threads_per_worker, seeds, verbose)
+        for state in states:
+            _add_seeds(seeds, state)
+        results.extend(states)
+
+    summary = pd.DataFrame(results)
+    return summary.sort_values(["item_id", "store_id"]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Entrena en paralelo los modelos XGBoost por serie.")
+    parser.add_argument("--data", default=PROCESSED_DATA_PATH, help="CSV con las características mensuales")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=1)
+    parser.add_argument("--force", action="store_true", help="Reentrenar aunque no haya cambios")
+    parser.add_argument("--search", choices=SEARCH_MODES, default="grid")
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET, help="Ajustes por serie con --search halving")
+    args = parser.parse_args()
+
+    data = read_processed(args.data)
+    summary = train_all_series(
+        data, config={"search": args.search, "budget": args.budget}, models_dir=args.models_dir, workers=args.workers,
+        threads_per_worker=args.threads_per_worker, force=args.force,
+    )
+    print(summary["status"].value_counts().to_string())
+    print(f"Ajustes totales: {int(summary['fits'].sum())}")